@@ -1,8 +1,18 @@
-from django.contrib import admin
+from django.conf import settings
+from django.contrib import admin, messages
+from django.contrib.admin.widgets import AutocompleteSelect, AutocompleteSelectMultiple
+from django.contrib.auth import get_user_model
+from django.contrib.auth.admin import UserAdmin
+from django.core.paginator import Paginator
+from django.forms.models import BaseInlineFormSet
 from django.db.models import ManyToManyRel
+from django.http import FileResponse, Http404
+from django.template.response import TemplateResponse
 from import_export import resources
 from import_export.admin import ImportExportModelAdmin
-from .models import Author, Genre, Book, BookInstance, BookLang
+from .models import ArchivedBookInstance, Author, Genre, Book, BookInstance, BookLang, LoanEvent
+from .profiling import list_profiles, profile_path
+from .services import BLOCKED, DELETED, bulk_delete_authors, bulk_delete_books, bulk_update_copies
 
 
 
@@ -29,15 +39,185 @@ class BookLangResource(resources.ModelResource):
 
 
 
-class BookInline(admin.TabularInline):
+def _report_bulk_delete(modeladmin, request, report, blocked_reason):
+    deleted = [pk for pk, outcome in report.items() if outcome == DELETED]
+    blocked = [pk for pk, outcome in report.items() if outcome == BLOCKED]
+    if deleted:
+        modeladmin.message_user(request, f'Deleted {len(deleted)} record(s).', messages.SUCCESS)
+    if blocked:
+        shown = ', '.join(str(pk) for pk in blocked[:20])
+        more = f' and {len(blocked) - 20} more' if len(blocked) > 20 else ''
+        modeladmin.message_user(
+            request, f'Kept {len(blocked)} record(s) {blocked_reason}: {shown}{more}.', messages.WARNING,
+        )
+
+
+@admin.action(description='Delete selected books without copies', permissions=['delete'])
+def delete_books_without_copies(modeladmin, request, queryset):
+    report = bulk_delete_books(queryset.values_list('pk', flat=True))
+    _report_bulk_delete(modeladmin, request, report, 'that still have copies')
+
+
+@admin.action(description='Delete selected authors without books', permissions=['delete'])
+def delete_authors_without_books(modeladmin, request, queryset):
+    report = bulk_delete_authors(queryset.values_list('pk', flat=True))
+    _report_bulk_delete(modeladmin, request, report, 'that still have books')
+
+
+def _copy_status_action(name, description, **changes):
+    """Admin action that applies `changes` to the selected copies with one UPDATE."""
+    @admin.action(description=description, permissions=['change'])
+    def action(modeladmin, request, queryset):
+        updated = bulk_update_copies(queryset.values_list('pk', flat=True), **changes)
+        modeladmin.message_user(request, f'Updated {updated} copy(ies).', messages.SUCCESS)
+
+    action.__name__ = name
+    return action
+
+
+mark_available = _copy_status_action(
+    'mark_available', 'Mark selected copies as Available', status='a', due_back=None, borrower=None,
+)
+mark_maintenance = _copy_status_action(
+    'mark_maintenance', 'Send selected copies to Maintenance', status='m', borrower=None,
+)
+mark_reserved = _copy_status_action('mark_reserved', 'Mark selected copies as Reserved', status='r')
+
+
+class PreloadedOptionsMixin:
+    """Admin autocomplete widget that renders its selected options from objects already loaded.
+
+    The stock admin widget runs one ``pk IN (...)`` query per widget, which
+    in an inline is one query per row and field.  PaginatedInlineFormSet
+    sets ``selected_objects`` from the rows it fetched with
+    select_related/prefetch_related; when the submitted value differs (a
+    bound form after an edit) the widget falls back to the query.
+    """
+    selected_objects = None
+
+    def optgroups(self, name, value, attr=None):
+        selected = {str(item) for item in value if str(item) not in self.choices.field.empty_values}
+        if self.selected_objects is None or selected != {str(obj.pk) for obj in self.selected_objects}:
+            return super().optgroups(name, value, attr)
+        options = []
+        if not self.is_required and not self.allow_multiple_selected:
+            options.append(self.create_option(name, '', '', False, 0))
+        for obj in self.selected_objects:
+            options.append(self.create_option(
+                name, obj.pk, self.choices.field.label_from_instance(obj), True, len(options),
+            ))
+        return [(None, options, 0)]
+
+
+class PreloadedAutocompleteSelect(PreloadedOptionsMixin, AutocompleteSelect):
+    pass
+
+
+class PreloadedAutocompleteSelectMultiple(PreloadedOptionsMixin, AutocompleteSelectMultiple):
+    pass
+
+
+class PaginatedInlineFormSet(BaseInlineFormSet):
+    """Inline formset that only builds forms for one page of the related rows.
+
+    The page comes from ``?<prefix>-page=`` on the change page URL; the admin
+    form posts back to the same URL, so a save validates and writes only
+    the rows of that page (and, as usual, only the forms that changed).
+    """
+    per_page = 25
+    page_number = 1
+    request_query = None
+
+    def get_queryset(self):
+        if not hasattr(self, '_page'):
+            queryset = super().get_queryset()
+            self.page = Paginator(queryset, self.per_page).get_page(self.page_number)
+            self._page = list(self.page.object_list)
+        return self._page
+
+    def _construct_form(self, i, **kwargs):
+        form = super()._construct_form(i, **kwargs)
+        # the parent is already loaded; without this, str(row) fetches it again per row
+        self.fk.set_cached_value(form.instance, self.instance)
+        if form.instance.pk is not None:
+            for name, field in form.fields.items():
+                widget = getattr(field.widget, 'widget', field.widget)
+                if isinstance(widget, PreloadedAutocompleteSelectMultiple):
+                    widget.selected_objects = list(getattr(form.instance, name).all())
+                elif isinstance(widget, PreloadedAutocompleteSelect):
+                    related = getattr(form.instance, name)
+                    widget.selected_objects = [related] if related is not None else []
+        return form
+
+    def _page_query(self, number):
+        query = self.request_query.copy()
+        query[f'{self.prefix}-page'] = number
+        return query.urlencode()
+
+    def previous_page_query(self):
+        return self._page_query(self.page.previous_page_number())
+
+    def next_page_query(self):
+        return self._page_query(self.page.next_page_number())
+
+
+class PaginatedInlineMixin:
+    """Tabular inline showing `per_page` rows at a time with their related labels preloaded."""
+    per_page = 25
+    formset = PaginatedInlineFormSet
+    template = 'admin/catalog/edit_inline/paginated_tabular.html'
+    list_select_related = ()
+    list_prefetch_related = ()
+
+    def get_queryset(self, request):
+        return (
+            super().get_queryset(request)
+            .select_related(*self.list_select_related)
+            .prefetch_related(*self.list_prefetch_related)
+        )
+
+    def get_formset(self, request, obj=None, **kwargs):
+        formset = super().get_formset(request, obj, **kwargs)
+        return type(formset.__name__, (formset,), {
+            'per_page': self.per_page,
+            'page_number': request.GET.get(f'{formset.get_default_prefix()}-page', 1),
+            'request_query': request.GET,
+        })
+
+    def formfield_for_foreignkey(self, db_field, request, **kwargs):
+        if db_field.name in self.get_autocomplete_fields(request):
+            kwargs.setdefault('widget', PreloadedAutocompleteSelect(db_field, self.admin_site, using=kwargs.get('using')))
+        return super().formfield_for_foreignkey(db_field, request, **kwargs)
+
+    def formfield_for_manytomany(self, db_field, request, **kwargs):
+        if db_field.name in self.get_autocomplete_fields(request):
+            kwargs.setdefault(
+                'widget', PreloadedAutocompleteSelectMultiple(db_field, self.admin_site, using=kwargs.get('using')),
+            )
+        return super().formfield_for_manytomany(db_field, request, **kwargs)
+
+
+class BookInline(PaginatedInlineMixin, admin.TabularInline):
     model = Book
     extra = 0
+    autocomplete_fields = ('genre',)
+    ordering = ('title', 'pk')
+    list_prefetch_related = ('genre',)
 
 @admin.register(Author)
 class AuthorAdmin(ImportExportModelAdmin):
     fields = [('first_name', 'last_name'), ('date_of_birth', 'date_of_death')]
     list_display = ('id','first_name', 'last_name', 'date_of_birth', 'date_of_death',)
     resource_class = AuthorResource
+    actions = [delete_authors_without_books]
+    search_fields = ('last_name',)
+
+    def get_search_results(self, request, queryset, search_term):
+        # case-insensitive prefix match that an index can serve (see prefix_filter),
+        # instead of icontains over every row
+        if not search_term:
+            return queryset, False
+        return queryset.last_name_startswith(search_term), False
 
     inlines = [BookInline]
 
@@ -46,27 +226,44 @@ class AuthorAdmin(ImportExportModelAdmin):
 class GenreAdmin(ImportExportModelAdmin):
     list_display = ['id','name']
     resource_class = GenreResource
+    search_fields = ('name',)
 
 
-class BooksInstanceInline(admin.TabularInline):
+class BooksInstanceInline(PaginatedInlineMixin, admin.TabularInline):
     model = BookInstance
     extra = 0
+    autocomplete_fields = ('borrower', 'booklang')
+    ordering = ('copy_no', 'pk')
+    list_select_related = ('borrower', 'booklang')
 
 @admin.register(Book)
 class BookAdmin(ImportExportModelAdmin):
     list_display = ('id','title', 'author', 'isbn', 'display_genre',) #genre - NEED TO FIX!
     resource_class = BookResource
+    actions = [delete_books_without_copies]
+    search_fields = ('title',)
+    autocomplete_fields = ('author', 'genre')
+
+    def get_search_results(self, request, queryset, search_term):
+        # case-insensitive prefix match that an index can serve (see prefix_filter),
+        # instead of icontains over every row
+        if not search_term:
+            return queryset, False
+        return queryset.title_startswith(search_term), False
 
     inlines = [BooksInstanceInline]
 
 
 @admin.register(BookInstance)
 class BookInstanceAdmin(ImportExportModelAdmin):
-    list_display = ('book', 'status', 'borrower', 'due_back', 'id')
+    list_display = ('book', 'copy_no', 'status', 'borrower', 'due_back', 'id')
     list_filter = ('status', 'due_back')
+    readonly_fields = ('copy_no',)
+    actions = [mark_available, mark_maintenance, mark_reserved]
+    autocomplete_fields = ('book', 'borrower')
 
     fieldsets = (
-        (None, {'fields': ('book', 'imprint', 'id')}),
+        (None, {'fields': ('book', 'copy_no', 'imprint', 'id')}),
         ('Availability', {'fields': ('status', 'due_back', 'borrower')}),
     )
     resource_class = BookInstanceResource
@@ -74,4 +271,81 @@ class BookInstanceAdmin(ImportExportModelAdmin):
 @admin.register(BookLang)
 class BookLangAdmin(ImportExportModelAdmin):
     list_display = ['id', 'booklang']
-    resource_class = BookLangResource
\ No newline at end of file
+    resource_class = BookLangResource
+    search_fields = ('booklang',)
+
+
+@admin.register(LoanEvent)
+class LoanEventAdmin(admin.ModelAdmin):
+    """Read-only view of the append-only loan log."""
+    list_display = ('created_at', 'book', 'book_instance_id', 'borrower', 'from_status', 'to_status', 'due_back')
+    list_filter = ('to_status',)
+    list_select_related = ('book', 'borrower')
+    date_hierarchy = 'created_at'
+    raw_id_fields = ('book', 'book_instance', 'borrower')
+    show_full_result_count = False
+
+    def has_add_permission(self, request):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
+
+    def has_delete_permission(self, request, obj=None):
+        return False
+
+
+@admin.register(ArchivedBookInstance)
+class ArchivedBookInstanceAdmin(admin.ModelAdmin):
+    """Read-only view of copies moved out by `manage.py archive_bookinstances`."""
+    list_display = ('id', 'book', 'copy_no', 'status', 'archived_at')
+    list_filter = ('status',)
+    list_select_related = ('book',)
+    date_hierarchy = 'archived_at'
+    raw_id_fields = ('book', 'booklang')
+    show_full_result_count = False
+
+    def has_add_permission(self, request):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
+
+    def has_delete_permission(self, request, obj=None):
+        return False
+
+
+User = get_user_model()
+if admin.site.is_registered(User):
+    admin.site.unregister(User)
+
+
+@admin.register(User)
+class LibraryUserAdmin(UserAdmin):
+    """The stock user admin; the borrower autocomplete searches by username prefix so it uses the index."""
+
+    def get_search_results(self, request, queryset, search_term):
+        match = request.resolver_match
+        if not search_term or match is None or match.url_name != 'autocomplete':
+            # the changelist keeps the stock search over username, names and email
+            return super().get_search_results(request, queryset, search_term)
+        return queryset.filter(username__startswith=search_term), False
+
+
+def profile_list(request):
+    """Request profiles written by ProfilingMiddleware, newest first."""
+    context = {
+        **admin.site.each_context(request),
+        'title': 'Request profiles',
+        'profiles': list_profiles(),
+        'sample_rate': settings.PROFILE_SAMPLE_RATE,
+        'header': settings.PROFILE_HEADER,
+    }
+    return TemplateResponse(request, 'admin/catalog/profiles.html', context)
+
+
+def profile_download(request, name):
+    path = profile_path(name)
+    if path is None:
+        raise Http404('No such profile')
+    return FileResponse(open(path, 'rb'), as_attachment=True, filename=name)
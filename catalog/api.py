@@ -0,0 +1,285 @@
+"""Read-only JSON API for the catalog.
+
+Rows are built straight from ``values_list()`` queries; no model instances
+are created.  Every list endpoint supports:
+
+* ``?fields=a,b`` - sparse fieldsets (unknown names are rejected with 400),
+* ``?limit=`` and ``?cursor=`` - keyset pagination on the primary key,
+* ``ETag`` / ``If-None-Match`` - 304 responses for unchanged payloads.
+"""
+import base64
+import hashlib
+import json
+from functools import wraps
+
+from django.core.serializers.json import DjangoJSONEncoder
+from django.http import HttpResponse, HttpResponseNotModified, JsonResponse
+from django.urls import reverse
+from django.views.decorators.csrf import csrf_exempt
+from django.views.decorators.http import require_http_methods
+
+from .facets import parse_id
+from .isbn import canonical_isbns
+from .models import Author, Book, BookInstance, Genre
+
+DEFAULT_LIMIT = 50
+MAX_LIMIT = 200
+MAX_ISBNS_PER_LOOKUP = 500
+
+# public field name -> ORM lookup
+BOOK_FIELDS = {
+    'id': 'id',
+    'title': 'title',
+    'isbn': 'isbn',
+    'summary': 'summary',
+    'author_id': 'author_id',
+    'author_first_name': 'author__first_name',
+    'author_last_name': 'author__last_name',
+    'copies_total': 'copies_total',
+    'copies_available': 'copies_available',
+    'next_due_back': 'next_due_back',
+}
+BOOK_DEFAULT_FIELDS = ('id', 'title', 'isbn', 'author_id', 'copies_total', 'copies_available')
+
+AUTHOR_FIELDS = {
+    'id': 'id',
+    'first_name': 'first_name',
+    'last_name': 'last_name',
+    'date_of_birth': 'date_of_birth',
+    'date_of_death': 'date_of_death',
+}
+AUTHOR_DEFAULT_FIELDS = ('id', 'first_name', 'last_name')
+
+GENRE_FIELDS = {'id': 'id', 'name': 'name'}
+
+COPY_FIELDS = {
+    'id': 'id',
+    'book_id': 'book_id',
+    'copy_no': 'copy_no',
+    'imprint': 'imprint',
+    'status': 'status',
+    'due_back': 'due_back',
+    'language': 'booklang__booklang',
+}
+COPY_DEFAULT_FIELDS = ('id', 'copy_no', 'status', 'due_back', 'language')
+
+LOAN_FIELDS = {
+    'id': 'id',
+    'book_id': 'book_id',
+    'title': 'book__title',
+    'due_back': 'due_back',
+}
+
+
+class ApiError(Exception):
+    status = 400
+
+
+def _json_response(request, payload, status=200):
+    """Serialize once, derive a strong ETag from the bytes and honour If-None-Match."""
+    body = json.dumps(payload, cls=DjangoJSONEncoder, separators=(',', ':'), ensure_ascii=False).encode()
+    etag = '"%s"' % hashlib.md5(body, usedforsecurity=False).hexdigest()
+    if_none_match = request.headers.get('If-None-Match', '')
+    if status == 200 and etag in [tag.strip() for tag in if_none_match.split(',')]:
+        response = HttpResponseNotModified()
+    else:
+        response = HttpResponse(body, status=status, content_type='application/json')
+    response['ETag'] = etag
+    return response
+
+
+def _error(message, status=400):
+    return JsonResponse({'error': message}, status=status)
+
+
+def _selected_fields(request, available, default):
+    requested = request.GET.get('fields')
+    if not requested:
+        return tuple(default)
+    fields = tuple(dict.fromkeys(name.strip() for name in requested.split(',') if name.strip()))
+    unknown = [name for name in fields if name not in available]
+    if unknown:
+        raise ApiError(f"Unknown field(s): {', '.join(unknown)}")
+    return fields
+
+
+def serialize_rows(queryset, fields, available):
+    """Fetch only the selected columns and zip them into dicts."""
+    paths = [available[name] for name in fields]
+    return [dict(zip(fields, row)) for row in queryset.values_list(*paths)]
+
+
+def _encode_cursor(pk):
+    return base64.urlsafe_b64encode(str(pk).encode()).decode().rstrip('=')
+
+
+def _decode_cursor(cursor, pk_field):
+    try:
+        padded = cursor + '=' * (-len(cursor) % 4)
+        return pk_field.to_python(base64.urlsafe_b64decode(padded.encode()).decode())
+    except Exception:
+        raise ApiError('Invalid cursor')
+
+
+def _limit(request):
+    try:
+        limit = int(request.GET.get('limit', DEFAULT_LIMIT))
+    except ValueError:
+        raise ApiError('limit must be an integer')
+    return max(1, min(limit, MAX_LIMIT))
+
+
+def _paginated(request, queryset, fields, available):
+    """Keyset pagination ordered by pk: `WHERE pk > cursor ORDER BY pk LIMIT n+1`."""
+    limit = _limit(request)
+    cursor = request.GET.get('cursor')
+    queryset = queryset.order_by('pk')
+    if cursor:
+        queryset = queryset.filter(pk__gt=_decode_cursor(cursor, queryset.model._meta.pk))
+
+    select = fields if 'id' in fields else ('id', *fields)
+    rows = serialize_rows(queryset[:limit + 1], select, available)
+    next_url = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        query = request.GET.copy()
+        query['cursor'] = _encode_cursor(rows[-1]['id'])
+        next_url = f'{request.path}?{query.urlencode()}'
+    if select is not fields:
+        for row in rows:
+            del row['id']
+    return {'results': rows, 'next': next_url}
+
+
+def api_view(view, methods=('GET',)):
+    """Restrict the HTTP methods; ApiError becomes a JSON 400."""
+    @require_http_methods(list(methods))
+    @wraps(view)
+    def wrapper(request, *args, **kwargs):
+        try:
+            return view(request, *args, **kwargs)
+        except ApiError as error:
+            return _error(str(error), status=error.status)
+
+    return wrapper
+
+
+@api_view
+def book_list(request):
+    fields = _selected_fields(request, BOOK_FIELDS, BOOK_DEFAULT_FIELDS)
+    books = Book.objects.all()
+    author_id = parse_id(request.GET.get('author', ''))
+    if author_id is not None:
+        books = books.filter(author_id=author_id)
+    genre_id = parse_id(request.GET.get('genre', ''))
+    if genre_id is not None:
+        books = books.filter(genre__id=genre_id)
+    if request.GET.get('available') == '1':
+        books = books.available_now()
+    return _json_response(request, _paginated(request, books, fields, BOOK_FIELDS))
+
+
+@api_view
+def book_detail(request, pk):
+    fields = _selected_fields(request, BOOK_FIELDS, BOOK_FIELDS)
+    rows = serialize_rows(Book.objects.filter(pk=pk), fields, BOOK_FIELDS)
+    if not rows:
+        return _error('Not found', status=404)
+    book = rows[0]
+    book['genres'] = list(Book.genre.through.objects.filter(book_id=pk).values_list('genre_id', flat=True))
+    return _json_response(request, book)
+
+
+@api_view
+def book_copies(request, pk):
+    """Availability of every copy of one book."""
+    if not Book.objects.filter(pk=pk).exists():
+        return _error('Not found', status=404)
+    fields = _selected_fields(request, COPY_FIELDS, COPY_DEFAULT_FIELDS)
+    copies = BookInstance.objects.filter(book_id=pk)
+    if request.GET.get('status'):
+        copies = copies.filter(status=request.GET['status'])
+    return _json_response(request, _paginated(request, copies, fields, COPY_FIELDS))
+
+
+@api_view
+def author_list(request):
+    fields = _selected_fields(request, AUTHOR_FIELDS, AUTHOR_DEFAULT_FIELDS)
+    authors = Author.objects.all()
+    if request.GET.get('q'):
+        authors = authors.last_name_startswith(request.GET['q'])
+    return _json_response(request, _paginated(request, authors, fields, AUTHOR_FIELDS))
+
+
+@api_view
+def author_detail(request, pk):
+    fields = _selected_fields(request, AUTHOR_FIELDS, AUTHOR_FIELDS)
+    rows = serialize_rows(Author.objects.filter(pk=pk), fields, AUTHOR_FIELDS)
+    if not rows:
+        return _error('Not found', status=404)
+    author = rows[0]
+    author['books'] = reverse('api-books') + f'?author={pk}'
+    return _json_response(request, author)
+
+
+@api_view
+def genre_list(request):
+    fields = _selected_fields(request, GENRE_FIELDS, GENRE_FIELDS)
+    return _json_response(request, _paginated(request, Genre.objects.all(), fields, GENRE_FIELDS))
+
+
+@api_view
+def my_loans(request):
+    """Copies currently on loan to the logged-in user."""
+    if not request.user.is_authenticated:
+        return _error('Authentication required', status=401)
+    fields = _selected_fields(request, LOAN_FIELDS, LOAN_FIELDS)
+    loans = BookInstance.objects.filter(borrower=request.user, status='o')
+    response = _json_response(request, _paginated(request, loans, fields, LOAN_FIELDS))
+    response['Vary'] = 'Cookie'
+    response['Cache-Control'] = 'private'
+    return response
+
+
+ISBN_LOOKUP_FIELDS = ('id', 'isbn', 'title', 'author_id', 'copies_total', 'copies_available', 'next_due_back')
+
+
+def _requested_isbns(request):
+    if request.method == 'POST':
+        try:
+            isbns = json.loads(request.body or b'{}').get('isbns', [])
+        except (ValueError, AttributeError):
+            raise ApiError('Body must be a JSON object like {"isbns": [...]}')
+        if not isinstance(isbns, list):
+            raise ApiError('"isbns" must be a list')
+        isbns = [str(isbn) for isbn in isbns]
+    else:
+        isbns = [isbn for isbn in request.GET.get('isbn', '').split(',') if isbn.strip()]
+    if len(isbns) > MAX_ISBNS_PER_LOOKUP:
+        raise ApiError(f'At most {MAX_ISBNS_PER_LOOKUP} ISBNs per request')
+    return isbns
+
+
+def isbn_lookup(request):
+    """Resolve a batch of ISBNs (any spelling) with one ``isbn IN (...)`` query.
+
+    ``GET ?isbn=a,b,c`` or ``POST {"isbns": [...]}``.  Each input maps to its
+    book with availability, to null when unknown, or is listed as invalid.
+    """
+    isbns = _requested_isbns(request)
+    canonical = canonical_isbns(isbns)
+    wanted = {isbn for isbn in canonical if isbn}
+    books = {}
+    if wanted:
+        rows = serialize_rows(Book.objects.filter(isbn__in=wanted), ISBN_LOOKUP_FIELDS, BOOK_FIELDS)
+        books = {row['isbn']: row for row in rows}
+    return _json_response(request, {
+        'results': {
+            isbn: books.get(isbn13) for isbn, isbn13 in zip(isbns, canonical) if isbn13
+        },
+        'invalid': [isbn for isbn, isbn13 in zip(isbns, canonical) if not isbn13],
+    })
+
+
+# POST only carries the ISBN list; the endpoint never writes.
+isbn_lookup = csrf_exempt(api_view(isbn_lookup, methods=('GET', 'POST')))
@@ -0,0 +1,87 @@
+"""Autocomplete endpoints for the catalog's edit forms.
+
+Responses use the select2 format -- ``{"results": [{"id", "text"}],
+"pagination": {"more": bool}}`` -- and are paginated with ``?page=``.
+Every lookup is a prefix match that an index can serve, so the cost of a
+request does not grow with the size of the table.
+"""
+from django.contrib.auth import get_user_model
+from django.contrib.auth.decorators import login_required
+from django.http import HttpResponseForbidden, JsonResponse
+from django.views.decorators.http import require_GET
+
+from .models import Author, Book, BookLang, Genre, prefix_filter
+
+PAGE_SIZE = 20
+
+
+def _page(request):
+    try:
+        return max(1, int(request.GET.get('page', 1)))
+    except ValueError:
+        return 1
+
+
+def _results(request, rows, label=lambda row: row[1]):
+    """Slice one page (plus one row to detect more) out of (id, ...) rows."""
+    start = (_page(request) - 1) * PAGE_SIZE
+    rows = list(rows[start:start + PAGE_SIZE + 1])
+    return JsonResponse({
+        'results': [{'id': row[0], 'text': label(row)} for row in rows[:PAGE_SIZE]],
+        'pagination': {'more': len(rows) > PAGE_SIZE},
+    })
+
+
+def _term(request):
+    return request.GET.get('q', '').strip()
+
+
+@require_GET
+@login_required
+def books(request):
+    queryset = Book.objects.title_startswith(_term(request))
+    return _results(request, queryset.order_by('title_lower', 'pk').values_list('pk', 'title'))
+
+
+@require_GET
+@login_required
+def authors(request):
+    queryset = Author.objects.last_name_startswith(_term(request))
+    return _results(
+        request,
+        queryset.order_by('last_name_lower', 'first_name', 'pk').values_list('pk', 'last_name', 'first_name'),
+        label=lambda row: f'{row[1]}, {row[2]}',
+    )
+
+
+@require_GET
+@login_required
+def genres(request):
+    queryset = prefix_filter(Genre.objects.all(), 'name', _term(request))
+    return _results(request, queryset.order_by('name_lower', 'pk').values_list('pk', 'name'))
+
+
+@require_GET
+@login_required
+def languages(request):
+    labels = dict(BookLang.LANGUAGE)
+    term = _term(request).lower()
+    codes = [code for code, label in BookLang.LANGUAGE if label.lower().startswith(term) or code.startswith(term)]
+    return _results(
+        request,
+        BookLang.objects.filter(booklang__in=codes).order_by('booklang').values_list('pk', 'booklang'),
+        label=lambda row: labels.get(row[1], row[1]),
+    )
+
+
+@require_GET
+@login_required
+def users(request):
+    """Usernames for librarians; the id is the username (the forms look users up by it)."""
+    if not (request.user.is_staff or request.user.groups.filter(name='Librarians').exists()):
+        return HttpResponseForbidden("Access denied: Only librarians can look up users.")
+    return _results(
+        request,
+        get_user_model().objects.filter(username__startswith=_term(request))
+        .order_by('username').values_list('username', 'username'),
+    )
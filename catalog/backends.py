@@ -0,0 +1,69 @@
+"""Authentication backend that keeps the logged-in user in the shared cache.
+
+AuthenticationMiddleware loads the user on every request, and pages that
+show the staff menu then query the user's groups and permissions as
+well.  CachedModelBackend loads all of that once, with the groups
+prefetched and the permission caches filled in, and keeps the user in
+the cache for AUTH_USER_CACHE_TIMEOUT seconds.
+
+Entries are dropped by the signal handlers in signals.py whenever a
+user, its groups or its permissions change (a password change is a user
+save).  Changes to a group's permissions bump an auth version that is
+part of every key.  The short timeout bounds staleness from writes that
+send no signals, such as queryset.update() or bulk_create().
+"""
+import secrets
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.contrib.auth.backends import ModelBackend
+from django.core.cache import cache
+
+AUTH_VERSION_KEY = 'auth:version'
+
+
+def _new_version():
+    # random rather than incremented: a counter that restarts at 1 after an
+    # eviction would make keys of an earlier version match again
+    return secrets.token_hex(6)
+
+
+def _auth_version():
+    version = cache.get(AUTH_VERSION_KEY)
+    if version is None:
+        cache.add(AUTH_VERSION_KEY, _new_version(), timeout=None)
+        version = cache.get(AUTH_VERSION_KEY)
+    return version
+
+
+def bump_auth_version():
+    cache.set(AUTH_VERSION_KEY, _new_version(), timeout=None)
+
+
+def user_cache_key(user_id):
+    return f'auth:{_auth_version()}:user:{user_id}'
+
+
+def invalidate_users(user_ids):
+    cache.delete_many([user_cache_key(user_id) for user_id in user_ids])
+
+
+class CachedModelBackend(ModelBackend):
+    def get_user(self, user_id):
+        key = user_cache_key(user_id)
+        user = cache.get(key)
+        if user is None:
+            UserModel = get_user_model()
+            try:
+                user = UserModel._default_manager.prefetch_related('groups').get(pk=user_id)
+            except UserModel.DoesNotExist:
+                return None
+            # fills _user_perm_cache, _group_perm_cache and _perm_cache,
+            # which are cached along with the user
+            self.get_all_permissions(user)
+            cache.set(key, user, settings.AUTH_USER_CACHE_TIMEOUT)
+        return user if self.user_can_authenticate(user) else None
+
+    async def aget_user(self, user_id):
+        return await sync_to_async(self.get_user)(user_id)
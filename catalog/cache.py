@@ -0,0 +1,161 @@
+"""Versioned cache keys and a small caching API for data derived from the catalog tables.
+
+Every write to Book, Author, Genre, BookLang or BookInstance bumps a single
+catalog version, so cached pages and aggregates never need to be deleted
+one by one: keys built with :func:`catalog_key` simply stop matching.
+A bump stores a new random version rather than incrementing, since
+``incr`` is a get-and-set on the file and database backends and two
+workers bumping at once could otherwise write the same number.
+
+:func:`get_or_compute` (and :func:`cached_queryset` on top of it) adds
+stampede protection for expensive values:
+
+* a short lock key (``cache.add``) lets one caller recompute a missing
+  value while the others wait briefly for it instead of all hitting the
+  database at once.  Across workers this needs an atomic ``add``, i.e.
+  the db or redis backend, not file;
+* values are refreshed *early* with a probability that grows as expiry
+  nears and with how long the value took to compute ("XFetch"), so hot
+  keys are usually replaced before they expire at all.
+
+Hit, miss, early-refresh and eviction counts are kept per process; see
+:func:`cache_stats`.
+"""
+import math
+import random
+import secrets
+import threading
+import time
+from collections import Counter, OrderedDict
+
+from django.core.cache import cache
+
+CATALOG_VERSION_KEY = 'catalog:version'
+DEFAULT_TIMEOUT = 300
+LOCK_TIMEOUT = 10
+LOCK_WAIT = 2.0
+EARLY_REFRESH_BETA = 1.0
+MAX_QUERYSET_ROWS = 5000
+# keys set by this process, to tell evictions from expiries on a miss
+_TRACKED_KEYS = 10000
+
+_stats = Counter()
+_expiries = OrderedDict()
+_lock = threading.Lock()
+
+
+def catalog_version():
+    version = cache.get(CATALOG_VERSION_KEY)
+    if version is None:
+        # a fixed first version would match keys cached before the version was evicted
+        cache.add(CATALOG_VERSION_KEY, secrets.token_hex(6), timeout=None)
+        version = cache.get(CATALOG_VERSION_KEY)
+    return version
+
+
+def bump_catalog_version():
+    cache.set(CATALOG_VERSION_KEY, secrets.token_hex(6), timeout=None)
+
+
+def catalog_key(*parts):
+    return ':'.join(['catalog', str(catalog_version()), *(str(part) for part in parts)])
+
+
+def _count(name):
+    with _lock:
+        _stats[name] += 1
+
+
+def _remember(key, expires_at):
+    with _lock:
+        _expiries[key] = expires_at
+        _expiries.move_to_end(key)
+        while len(_expiries) > _TRACKED_KEYS:
+            _expiries.popitem(last=False)
+
+
+def _record_miss(key):
+    with _lock:
+        _stats['misses'] += 1
+        expires_at = _expiries.pop(key, None)
+        if expires_at is not None and expires_at > time.time():
+            # we stored it and it had not expired: the backend culled it
+            _stats['evictions'] += 1
+
+
+def cache_stats():
+    """Counters for this process since start (or the last reset_cache_stats)."""
+    with _lock:
+        stats = {name: _stats[name] for name in ('hits', 'misses', 'early_refreshes', 'lock_waits', 'evictions')}
+    lookups = stats['hits'] + stats['misses']
+    stats['hit_rate'] = stats['hits'] / lookups if lookups else 0.0
+    return stats
+
+
+def reset_cache_stats():
+    with _lock:
+        _stats.clear()
+        _expiries.clear()
+
+
+def _store(key, compute, timeout, cacheable):
+    started = time.monotonic()
+    value = compute()
+    delta = time.monotonic() - started
+    if cacheable is not None and not cacheable(value):
+        return value
+    expires_at = time.time() + timeout
+    cache.set(key, (value, expires_at, delta), timeout)
+    _remember(key, expires_at)
+    return value
+
+
+def get_or_compute(key, compute, timeout=DEFAULT_TIMEOUT, cacheable=None):
+    """Return the cached value for `key` under the current catalog version, computing it if needed.
+
+    `cacheable`, if given, is called with a freshly computed value and
+    decides whether it is stored.
+    """
+    key = catalog_key(key)
+    entry = cache.get(key)
+    if entry is not None:
+        value, expires_at, delta = entry
+        # XFetch: refresh early with probability rising as expiry nears
+        if time.time() - delta * EARLY_REFRESH_BETA * math.log(random.random() or 1e-12) < expires_at:
+            _count('hits')
+            return value
+        if cache.add(f'{key}:lock', 1, LOCK_TIMEOUT):
+            _count('early_refreshes')
+            try:
+                return _store(key, compute, timeout, cacheable)
+            finally:
+                cache.delete(f'{key}:lock')
+        # someone else is refreshing it; the current value is still valid
+        _count('hits')
+        return value
+
+    _record_miss(key)
+    if cache.add(f'{key}:lock', 1, LOCK_TIMEOUT):
+        try:
+            return _store(key, compute, timeout, cacheable)
+        finally:
+            cache.delete(f'{key}:lock')
+
+    _count('lock_waits')
+    deadline = time.monotonic() + LOCK_WAIT
+    while time.monotonic() < deadline:
+        time.sleep(0.05)
+        entry = cache.get(key)
+        if entry is not None:
+            return entry[0]
+    # the lock holder is slow or has died; compute it here
+    return _store(key, compute, timeout, cacheable)
+
+
+def cached_queryset(key, queryset, timeout=DEFAULT_TIMEOUT, max_rows=MAX_QUERYSET_ROWS):
+    """Evaluate `queryset` once per catalog version and return its rows as a list.
+
+    Results longer than `max_rows` are returned but not cached, so one
+    broad query cannot push everything else out of a size-bounded cache.
+    """
+    return get_or_compute(key, lambda: list(queryset), timeout, cacheable=lambda rows: len(rows) <= max_rows)
@@ -0,0 +1,118 @@
+"""Faceted browsing over Book: genre, language, author and availability.
+
+Each facet is counted with one GROUP BY over the books matching every
+*other* selected filter, so a request costs at most one query per
+dimension no matter how many values a facet has.
+"""
+from django.db.models import Count, Q
+
+from .cache import get_or_compute
+from .models import Book, BookInstance, BookLang
+
+FACET_CACHE_TIMEOUT = 300
+AUTHOR_FACET_LIMIT = 20
+
+
+def parse_id(value):
+    """The integer in a query-string id, or None; only ASCII digits count (isdigit() accepts '²')."""
+    if value.isascii() and value.isdigit():
+        return int(value)
+    return None
+
+
+def parse_filters(params):
+    """Read the selected facet values from a QueryDict, ignoring junk."""
+    def ids(name):
+        return tuple(sorted({pk for pk in map(parse_id, params.getlist(name)) if pk is not None}))
+
+    return {
+        'genre': ids('genre'),
+        'author': ids('author'),
+        'lang': tuple(sorted(set(params.getlist('lang')) & {code for code, _ in BookLang.LANGUAGE})),
+        'available': params.get('available') == '1',
+    }
+
+
+def filter_books(queryset, filters, skip=None):
+    """Apply the selected filters; values within a dimension are OR-ed."""
+    if filters['genre'] and skip != 'genre':
+        queryset = queryset.filter(
+            pk__in=Book.genre.through.objects.filter(genre_id__in=filters['genre']).values('book_id')
+        )
+    if filters['lang'] and skip != 'lang':
+        queryset = queryset.filter(
+            pk__in=BookInstance.objects.filter(booklang__booklang__in=filters['lang']).values('book_id')
+        )
+    if filters['author'] and skip != 'author':
+        queryset = queryset.filter(author_id__in=filters['author'])
+    if filters['available'] and skip != 'available':
+        queryset = queryset.available_now()
+    return queryset
+
+
+def _filters_key(filters):
+    return '|'.join(
+        ','.join(map(str, filters[name])) for name in ('genre', 'lang', 'author')
+    ) + f"|{int(filters['available'])}"
+
+
+def facet_counts(filters):
+    """Return the counts for every facet, cached per filter combination."""
+    return get_or_compute(
+        f'facets:{_filters_key(filters)}', lambda: _compute_facet_counts(filters), FACET_CACHE_TIMEOUT,
+    )
+
+
+def _compute_facet_counts(filters):
+    books = Book.objects.order_by()
+
+    genres = (
+        filter_books(books, filters, skip='genre')
+        .filter(genre__isnull=False)
+        .values('genre__id', 'genre__name')
+        .annotate(count=Count('pk', distinct=True))
+        .order_by('genre__name')
+    )
+    langs = (
+        filter_books(books, filters, skip='lang')
+        .filter(bookinstance__booklang__isnull=False)
+        .values('bookinstance__booklang__booklang')
+        .annotate(count=Count('pk', distinct=True))
+        .order_by('bookinstance__booklang__booklang')
+    )
+    authors = (
+        filter_books(books, filters, skip='author')
+        .filter(author__isnull=False)
+        .values('author__id', 'author__first_name', 'author__last_name')
+        .annotate(count=Count('pk'))
+        .order_by('-count', 'author__last_name', 'author__first_name')[:AUTHOR_FACET_LIMIT]
+    )
+    availability = filter_books(books, filters, skip='available').aggregate(
+        available=Count('pk', filter=Q(copies_available__gt=0)),
+        total=Count('pk'),
+    )
+
+    lang_names = dict(BookLang.LANGUAGE)
+    return {
+        'genre': [
+            {'value': row['genre__id'], 'label': row['genre__name'], 'count': row['count']}
+            for row in genres
+        ],
+        'lang': [
+            {
+                'value': row['bookinstance__booklang__booklang'],
+                'label': lang_names.get(row['bookinstance__booklang__booklang'], row['bookinstance__booklang__booklang']),
+                'count': row['count'],
+            }
+            for row in langs
+        ],
+        'author': [
+            {
+                'value': row['author__id'],
+                'label': f"{row['author__last_name']}, {row['author__first_name']}",
+                'count': row['count'],
+            }
+            for row in authors
+        ],
+        'available': availability,
+    }
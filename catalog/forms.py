@@ -1,8 +1,14 @@
 import datetime
+import re
+import uuid
 from django import forms
+from django.contrib.auth import get_user_model
 from django.core.exceptions import ValidationError
 from django.utils.translation import gettext_lazy as _
 
+from .models import Book, BookInstance
+from .widgets import AutocompleteSelect, AutocompleteSelectMultiple
+
 class RenewBookForm(forms.Form):
     renewal_date = forms.DateField(
         help_text="Enter a date between now and 4 weeks (default 3)."
@@ -21,3 +27,79 @@ class RenewBookForm(forms.Form):
 
         # יש תמיד להחזיר את הנתונים הנקיים
         return data
+
+
+class BookForm(forms.ModelForm):
+    """טופס ספר שבו המחבר והז׳אנרים נטענים בהשלמה אוטומטית ולא כרשימה מלאה."""
+
+    class Meta:
+        model = Book
+        fields = '__all__'
+        widgets = {
+            'author': AutocompleteSelect('autocomplete-authors'),
+            'genre': AutocompleteSelectMultiple('autocomplete-genres'),
+        }
+
+
+class BookInstanceBulkForm(forms.Form):
+    """עדכון של עותקים רבים בבת אחת - למשל עגלת החזרות שנסרקה."""
+
+    KEEP = ''
+    STATUS_CHOICES = [(KEEP, '---- ללא שינוי ----')]
+
+    copy_ids = forms.CharField(
+        widget=forms.Textarea(attrs={'rows': 6}),
+        help_text="Copy ids (UUID), separated by spaces, commas or new lines.",
+    )
+    status = forms.ChoiceField(required=False)
+    due_back = forms.DateField(required=False, help_text="Leave empty to keep the current date.")
+    clear_due_back = forms.BooleanField(required=False)
+    borrower = forms.ModelChoiceField(
+        queryset=get_user_model().objects.all(),
+        to_field_name='username',
+        required=False,
+        widget=AutocompleteSelect('autocomplete-users'),
+        help_text="Username of the new borrower.",
+    )
+    clear_borrower = forms.BooleanField(required=False)
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.fields['status'].choices = self.STATUS_CHOICES + list(BookInstance.LOAN_STATUS)
+
+    def clean_copy_ids(self):
+        ids = []
+        for token in re.split(r'[\s,]+', self.cleaned_data['copy_ids'].strip()):
+            if not token:
+                continue
+            try:
+                ids.append(uuid.UUID(token))
+            except ValueError:
+                raise ValidationError(_('Invalid copy id: %(token)s'), params={'token': token})
+        if not ids:
+            raise ValidationError(_('Enter at least one copy id'))
+        return list(dict.fromkeys(ids))
+
+    def clean(self):
+        cleaned_data = super().clean()
+        if cleaned_data.get('due_back') and cleaned_data.get('clear_due_back'):
+            raise ValidationError(_('Either set a due date or clear it, not both'))
+        if cleaned_data.get('borrower') and cleaned_data.get('clear_borrower'):
+            raise ValidationError(_('Either set a borrower or clear it, not both'))
+        return cleaned_data
+
+    def changes(self):
+        """The keyword arguments for services.bulk_update_copies."""
+        data = self.cleaned_data
+        changes = {}
+        if data['status'] != self.KEEP:
+            changes['status'] = data['status']
+        if data['clear_due_back']:
+            changes['due_back'] = None
+        elif data['due_back']:
+            changes['due_back'] = data['due_back']
+        if data['clear_borrower']:
+            changes['borrower'] = None
+        elif data['borrower']:
+            changes['borrower'] = data['borrower']
+        return changes
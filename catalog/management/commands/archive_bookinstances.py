@@ -0,0 +1,75 @@
+import datetime
+import statistics
+import time
+
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from catalog.models import BookInstance
+from catalog.services import archive_copies
+
+
+class Command(BaseCommand):
+    help = (
+        "Move lost, withdrawn and (optionally) long-idle maintenance copies from "
+        "BookInstance into ArchivedBookInstance in batched transactions."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--maintenance-days', type=int,
+                            help='Also archive copies that have been in maintenance for this many days '
+                                 '(copies with no logged move into maintenance are kept).')
+        parser.add_argument('--with-history', action='store_true',
+                            help="Move each copy's LoanEvents into the archive row as well.")
+        parser.add_argument('--chunk-size', type=int, default=1000)
+        parser.add_argument('--dry-run', action='store_true')
+        parser.add_argument('--benchmark', action='store_true',
+                            help='Time the hot loan queries before and after archiving.')
+        parser.add_argument('--repeat', type=int, default=20, help='Runs per benchmarked query.')
+
+    def handle(self, *args, **options):
+        maintenance_before = None
+        if options['maintenance_days'] is not None:
+            maintenance_before = timezone.now() - datetime.timedelta(days=options['maintenance_days'])
+        retired = BookInstance.objects.retired(maintenance_before)
+
+        if options['dry_run']:
+            self.stdout.write(f'Would archive {retired.count()} of {BookInstance.objects.count()} copies.')
+            return
+
+        before = self._benchmark(options['repeat']) if options['benchmark'] else None
+        started = time.perf_counter()
+        archived = archive_copies(retired, with_history=options['with_history'], chunk_size=options['chunk_size'])
+        self.stdout.write(self.style.SUCCESS(
+            f'Archived {archived} copies in {time.perf_counter() - started:.1f}s.'
+        ))
+        if before is not None:
+            after = self._benchmark(options['repeat'])
+            self.stdout.write(f"{'query':<24}{'before ms':>12}{'after ms':>12}")
+            for name in before:
+                self.stdout.write(f'{name:<24}{before[name]:>12.2f}{after[name]:>12.2f}')
+
+    def _hot_queries(self):
+        """The BookInstance reads behind the index page and the loan lists."""
+        on_loan = BookInstance.objects.filter(status='o')
+        borrower_id = on_loan.exclude(borrower=None).values_list('borrower_id', flat=True).first()
+        book_id = BookInstance.objects.values_list('book_id', flat=True).first()
+        return {
+            'count all copies': lambda: BookInstance.objects.count(),
+            'count available': lambda: BookInstance.objects.filter(status='a').count(),
+            'all borrowed': lambda: list(on_loan.order_by('due_back')[:10]),
+            'my borrowed': lambda: list(on_loan.filter(borrower_id=borrower_id).order_by('due_back')[:10]),
+            'copies of a book': lambda: list(BookInstance.objects.filter(book_id=book_id)),
+        }
+
+    def _benchmark(self, repeat):
+        """Median milliseconds per hot query."""
+        results = {}
+        for name, query in self._hot_queries().items():
+            timings = []
+            for _ in range(repeat):
+                started = time.perf_counter()
+                query()
+                timings.append((time.perf_counter() - started) * 1000)
+            results[name] = statistics.median(timings)
+        return results
@@ -0,0 +1,88 @@
+import datetime
+import gzip
+import json
+import os
+import re
+from pathlib import Path
+
+from django.core.management.base import BaseCommand, CommandError
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import transaction
+from django.utils import timezone
+
+from catalog.models import LoanEvent
+
+
+class Command(BaseCommand):
+    help = (
+        "Move LoanEvent rows older than a month boundary into gzipped JSONL files, "
+        "one file per chunk named by month and id range, and delete them from the table."
+    )
+
+    FIELDS = ('id', 'created_at', 'book_instance_id', 'book_id', 'borrower_id', 'from_status', 'to_status', 'due_back')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--before', required=True, help='First month to keep, as YYYY-MM.')
+        parser.add_argument('--output-dir', default='loan_event_archive')
+        parser.add_argument('--chunk-size', type=int, default=5000)
+        parser.add_argument('--dry-run', action='store_true')
+
+    def handle(self, *args, **options):
+        try:
+            cutoff = datetime.datetime.strptime(options['before'], '%Y-%m')
+        except ValueError:
+            raise CommandError('--before must look like 2025-01')
+        cutoff = timezone.make_aware(cutoff)
+        output_dir = Path(options['output_dir'])
+
+        oldest = LoanEvent.objects.filter(created_at__lt=cutoff).order_by('created_at').values_list('created_at', flat=True).first()
+        if oldest is None:
+            self.stdout.write('Nothing to archive.')
+            return
+
+        month = timezone.localtime(oldest).replace(day=1, hour=0, minute=0, second=0, microsecond=0)
+        while month < cutoff:
+            next_month = (month + datetime.timedelta(days=32)).replace(day=1)
+            self._archive_month(month, min(next_month, cutoff), output_dir, options)
+            month = next_month
+
+    def _archived_ranges(self, output_dir, start):
+        """(first id, last id) of the chunk files already written for this month."""
+        pattern = re.compile(rf'^loan_events_{start:%Y-%m}_(\d+)-(\d+)\.jsonl\.gz$')
+        matches = (pattern.match(path.name) for path in output_dir.glob(f'loan_events_{start:%Y-%m}_*'))
+        return [(int(match[1]), int(match[2])) for match in matches if match]
+
+    def _archive_month(self, start, end, output_dir, options):
+        events = LoanEvent.objects.between(start, end).order_by('id')
+        count = events.count()
+        if not count:
+            return
+        if options['dry_run']:
+            self.stdout.write(f'{start:%Y-%m}: would archive {count} event(s) to {output_dir}')
+            return
+
+        output_dir.mkdir(parents=True, exist_ok=True)
+        # A chunk file appears (by rename) only once it is complete, and its rows
+        # are deleted right after.  If a run died in between, the rerun finds
+        # the file and deletes those rows without writing them a second time.
+        archived = self._archived_ranges(output_dir, start)
+        deleted = files = 0
+        while True:
+            with transaction.atomic():
+                rows = list(events.values(*self.FIELDS)[:options['chunk_size']])
+                if not rows:
+                    break
+                fresh = [row for row in rows if not any(first <= row['id'] <= last for first, last in archived)]
+                if fresh:
+                    path = output_dir / f"loan_events_{start:%Y-%m}_{fresh[0]['id']}-{fresh[-1]['id']}.jsonl.gz"
+                    partial = path.with_name(f'{path.name}.tmp')
+                    with gzip.open(partial, 'wt', encoding='utf-8') as archive:
+                        for row in fresh:
+                            archive.write(json.dumps(row, cls=DjangoJSONEncoder) + '\n')
+                    os.replace(partial, path)
+                    archived.append((fresh[0]['id'], fresh[-1]['id']))
+                    files += 1
+                # LoanEvent.objects.delete() refuses on purpose; archiving is the one way out.
+                chunk = LoanEvent.objects.filter(id__in=[row['id'] for row in rows])
+                deleted += chunk._raw_delete(chunk.db)
+        self.stdout.write(f'{start:%Y-%m}: archived {deleted} event(s) to {files} new file(s) in {output_dir}')
@@ -0,0 +1,81 @@
+import time
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.contrib.auth.models import Group
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+from django.test import Client
+from django.test.utils import CaptureQueriesContext, override_settings
+from django.urls import reverse
+
+
+class Command(BaseCommand):
+    help = (
+        "Count the queries and time per request on the authenticated catalog pages "
+        "for each session store, with Django's ModelBackend and with CachedModelBackend."
+    )
+
+    PAGES = ['index', 'books', 'book-browse', 'authors', 'my-borrowed', 'my-loan-history', 'all-borrowed']
+    SESSION_ENGINES = {
+        'db': 'django.contrib.sessions.backends.db',
+        'cached_db': 'django.contrib.sessions.backends.cached_db',
+        'signed_cookies': 'django.contrib.sessions.backends.signed_cookies',
+    }
+    AUTH_BACKENDS = {
+        'model': 'django.contrib.auth.backends.ModelBackend',
+        'cached': 'catalog.backends.CachedModelBackend',
+    }
+
+    def add_arguments(self, parser):
+        parser.add_argument('--requests', type=int, default=20, help="Requests per page and configuration.")
+
+    def handle(self, *args, **options):
+        # the librarian is created for the run and rolled back afterwards
+        with transaction.atomic():
+            user = get_user_model().objects.create_user(
+                username='bench-auth-librarian', password='unused', is_staff=True,
+            )
+            user.groups.add(Group.objects.get_or_create(name='Librarians')[0])
+            results = {}
+            for session_name, session_engine in self.SESSION_ENGINES.items():
+                for backend_name, backend in self.AUTH_BACKENDS.items():
+                    with override_settings(
+                        SESSION_ENGINE=session_engine,
+                        AUTHENTICATION_BACKENDS=[backend],
+                        ALLOWED_HOSTS=[*settings.ALLOWED_HOSTS, 'testserver'],
+                    ):
+                        results[session_name, backend_name] = self._measure(user, options['requests'])
+            transaction.set_rollback(True)
+        self._report(results)
+
+    def _measure(self, user, requests):
+        client = Client()
+        client.force_login(user)
+        urls = {name: reverse(name) for name in self.PAGES}
+        for url in urls.values():
+            client.get(url)   # fill the session and user caches
+        measured = {}
+        for name, url in urls.items():
+            queries = 0
+            started = time.perf_counter()
+            for _ in range(requests):
+                with CaptureQueriesContext(connection) as captured:
+                    response = client.get(url)
+                if response.status_code != 200:
+                    raise RuntimeError(f'{url} returned {response.status_code}')
+                queries += len(captured)
+            measured[name] = (queries / requests, (time.perf_counter() - started) * 1000 / requests)
+        return measured
+
+    def _report(self, results):
+        configs = list(results)
+        self.stdout.write('Queries per request (session store / auth backend):')
+        self.stdout.write(f"{'page':<18}" + ''.join(f"{f'{s}/{b}':>22}" for s, b in configs))
+        for page in self.PAGES:
+            self.stdout.write(f'{page:<18}' + ''.join(f'{results[config][page][0]:>22.1f}' for config in configs))
+        for label, column in (('mean queries', 0), ('mean ms', 1)):
+            self.stdout.write(f'{label:<18}' + ''.join(
+                f'{sum(value[column] for value in results[config].values()) / len(self.PAGES):>22.1f}'
+                for config in configs
+            ))
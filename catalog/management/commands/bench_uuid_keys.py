@@ -0,0 +1,106 @@
+import random
+import time
+import uuid
+
+from django.core.management.base import BaseCommand
+from django.db import connections, models, transaction
+
+from catalog.models import uuid7
+
+
+class Command(BaseCommand):
+    help = (
+        "Compare uuid4 and time-ordered uuid7 primary keys: insert throughput, "
+        "point lookup throughput and primary-key index size."
+    )
+
+    STRATEGIES = {
+        'uuid4': uuid.uuid4,
+        'uuid7': uuid7,
+    }
+
+    def add_arguments(self, parser):
+        parser.add_argument('--rows', type=int, default=1_000_000)
+        parser.add_argument('--batch-size', type=int, default=10_000)
+        parser.add_argument('--lookups', type=int, default=100_000)
+        parser.add_argument('--database', default='default')
+
+    def handle(self, *args, **options):
+        connection = connections[options['database']]
+        field = models.UUIDField(primary_key=True)
+        column_type = field.db_type(connection)
+
+        self.stdout.write(
+            f"{connection.vendor}: {options['rows']:,} rows, "
+            f"{options['lookups']:,} lookups per strategy"
+        )
+        for name, factory in self.STRATEGIES.items():
+            table = f'catalog_bench_{name}'
+            quoted = connection.ops.quote_name(table)
+            with connection.cursor() as cursor:
+                cursor.execute(f'DROP TABLE IF EXISTS {quoted}')
+                cursor.execute(
+                    f'CREATE TABLE {quoted} (id {column_type} PRIMARY KEY, imprint varchar(200))'
+                )
+            try:
+                result = self._run(connection, field, quoted, factory, options)
+                result['index_bytes'] = self._index_size(connection, table)
+            finally:
+                with connection.cursor() as cursor:
+                    cursor.execute(f'DROP TABLE IF EXISTS {quoted}')
+            self._report(name, result)
+
+    def _run(self, connection, field, quoted, factory, options):
+        rows, batch_size = options['rows'], options['batch_size']
+        per_batch = max(1, options['lookups'] * batch_size // rows)
+        sample = []
+        insert_sql = f'INSERT INTO {quoted} (id, imprint) VALUES (%s, %s)'
+
+        started = time.perf_counter()
+        for offset in range(0, rows, batch_size):
+            keys = [factory() for _ in range(min(batch_size, rows - offset))]
+            sample.extend(random.sample(keys, min(len(keys), per_batch)))
+            params = [(field.get_db_prep_value(key, connection), 'Bench imprint') for key in keys]
+            with transaction.atomic(using=connection.alias), connection.cursor() as cursor:
+                cursor.executemany(insert_sql, params)
+        insert_seconds = time.perf_counter() - started
+
+        random.shuffle(sample)
+        select_sql = f'SELECT imprint FROM {quoted} WHERE id = %s'
+        started = time.perf_counter()
+        with connection.cursor() as cursor:
+            for key in sample:
+                cursor.execute(select_sql, [field.get_db_prep_value(key, connection)])
+                cursor.fetchone()
+        lookup_seconds = time.perf_counter() - started
+
+        return {
+            'inserts_per_second': rows / insert_seconds,
+            'lookups_per_second': len(sample) / lookup_seconds if sample else 0,
+        }
+
+    def _index_size(self, connection, table):
+        with connection.cursor() as cursor:
+            if connection.vendor == 'postgresql':
+                cursor.execute('SELECT pg_relation_size(%s)', [f'{table}_pkey'])
+            elif connection.vendor == 'sqlite':
+                try:
+                    cursor.execute(
+                        'SELECT SUM(pgsize) FROM dbstat WHERE name = %s',
+                        [f'sqlite_autoindex_{table}_1'],
+                    )
+                except Exception:
+                    # dbstat is an optional SQLite compile-time extension
+                    return None
+            else:
+                return None
+            row = cursor.fetchone()
+        return row[0] if row else None
+
+    def _report(self, name, result):
+        index_bytes = result['index_bytes']
+        index_size = f'{index_bytes / 1024 / 1024:.1f} MiB' if index_bytes else 'n/a'
+        self.stdout.write(
+            f"{name}: {result['inserts_per_second']:,.0f} inserts/s, "
+            f"{result['lookups_per_second']:,.0f} lookups/s, pk index {index_size}"
+        )
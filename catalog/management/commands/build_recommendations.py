@@ -0,0 +1,32 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from catalog.recommendations import DEFAULT_WEIGHTS, rebuild_similarities
+
+
+class Command(BaseCommand):
+    help = (
+        "Rebuild the BookSimilarity table: top-k similar books per book from "
+        "shared genres, the same author and co-borrowing."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--top-k', type=int, default=10)
+        parser.add_argument('--block-size', type=int, default=1000, help='Books scored per sparse product.')
+        parser.add_argument('--max-df', type=int, default=500,
+                            help='Features shared by more books only contribute their most popular books as candidates.')
+        for name, weight in DEFAULT_WEIGHTS.items():
+            parser.add_argument(f'--{name}-weight', type=float, default=weight)
+
+    def handle(self, *args, **options):
+        started = time.perf_counter()
+        written = rebuild_similarities(
+            k=options['top_k'],
+            block_size=options['block_size'],
+            max_df=options['max_df'],
+            weights={name: options[f'{name}_weight'] for name in DEFAULT_WEIGHTS},
+        )
+        self.stdout.write(self.style.SUCCESS(
+            f'Wrote {written} similarities in {time.perf_counter() - started:.1f}s.'
+        ))
@@ -0,0 +1,139 @@
+import json
+import os
+import subprocess
+import sys
+from collections import defaultdict
+
+from django.core.management.base import BaseCommand, CommandError
+
+# Runs in a fresh interpreter under ``python -X importtime``: the phases a
+# gunicorn worker goes through before it serves its first public page.
+CHILD = r'''
+import json, os, sys, time
+
+def rss_kb():
+    try:
+        with open('/proc/self/status') as status:
+            for line in status:
+                if line.startswith('VmRSS:'):
+                    return int(line.split()[1])
+    except OSError:
+        pass
+    import resource
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak // 1024 if sys.platform == 'darwin' else peak
+
+options = json.loads(sys.argv[1])
+phases = []
+
+def phase(name, func):
+    started = time.perf_counter()
+    func()
+    phases.append({
+        'name': name,
+        'seconds': time.perf_counter() - started,
+        'rss_kb': rss_kb(),
+        'modules': len(sys.modules),
+    })
+
+def setup():
+    import django
+    django.setup()
+
+def public_urls():
+    from django.urls import resolve, reverse
+    for path in options['paths']:
+        resolve(path)
+    reverse('index')
+
+def admin_urls():
+    from django.urls import resolve
+    resolve('/admin/')
+
+phases.append({'name': 'interpreter', 'seconds': 0.0, 'rss_kb': rss_kb(), 'modules': len(sys.modules)})
+phase('django.setup()', setup)
+for module in options['imports']:
+    phase(f'import {module}', lambda: __import__(module))
+phase('public urls', public_urls)
+request_path = sorted(sys.modules)
+if options['admin']:
+    phase('admin urls', admin_urls)
+print(json.dumps({'phases': phases, 'request_path': request_path}))
+'''
+
+
+def parse_importtime(stderr):
+    """``-X importtime`` lines as (module, self_us, cumulative_us), in import order."""
+    rows = []
+    for line in stderr.splitlines():
+        if not line.startswith('import time:'):
+            continue
+        own, cumulative, name = line[len('import time:'):].split('|')
+        if not own.strip().isdigit():
+            continue   # the header line
+        rows.append((name.strip(), int(own), int(cumulative)))
+    return rows
+
+
+class Command(BaseCommand):
+    help = (
+        "Start a fresh interpreter the way a worker does and report the time and RSS "
+        "of each startup phase plus the slowest imports."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--import', dest='imports', action='append', metavar='MODULE',
+            help="Module to import after django.setup() (repeatable; default: catalog.views).",
+        )
+        parser.add_argument(
+            '--path', dest='paths', action='append', metavar='PATH',
+            help="Public URL path to resolve (repeatable; default: /catalog/).",
+        )
+        parser.add_argument('--admin', action='store_true', help="Also load the admin afterwards.")
+        parser.add_argument('--top', type=int, default=20, help="Number of modules and packages to list.")
+        parser.add_argument(
+            '--check', action='append', default=[], metavar='MODULE',
+            help="Fail if MODULE is imported before the admin is loaded (repeatable).",
+        )
+
+    def handle(self, *args, **options):
+        child_options = {
+            'imports': options['imports'] or ['catalog.views'],
+            'paths': options['paths'] or ['/catalog/'],
+            'admin': options['admin'],
+        }
+        env = {**os.environ, 'PYTHONDONTWRITEBYTECODE': '1'}
+        env.setdefault('DJANGO_SETTINGS_MODULE', 'locallibary.settings')
+        result = subprocess.run(
+            [sys.executable, '-X', 'importtime', '-c', CHILD, json.dumps(child_options)],
+            capture_output=True, text=True, env=env,
+        )
+        if result.returncode:
+            raise CommandError(result.stderr.strip().splitlines()[-1])
+        profile = json.loads(result.stdout)
+        imports = parse_importtime(result.stderr)
+
+        self.stdout.write(f"{'phase':<28}{'seconds':>10}{'RSS MiB':>10}{'modules':>10}")
+        for phase in profile['phases']:
+            self.stdout.write(
+                f"{phase['name']:<28}{phase['seconds']:>10.3f}"
+                f"{phase['rss_kb'] / 1024:>10.1f}{phase['modules']:>10}"
+            )
+
+        top = options['top']
+        self.stdout.write(f"\nSlowest modules (self time, of {len(imports)} imported):")
+        for name, own, cumulative in sorted(imports, key=lambda row: -row[1])[:top]:
+            self.stdout.write(f"  {own / 1000:>8.1f} ms  {cumulative / 1000:>8.1f} ms cumulative  {name}")
+
+        packages = defaultdict(int)
+        for name, own, _ in imports:
+            packages[name.split('.')[0]] += own
+        self.stdout.write("\nSlowest packages (total self time):")
+        for name, own in sorted(packages.items(), key=lambda item: -item[1])[:top]:
+            self.stdout.write(f"  {own / 1000:>8.1f} ms  {name}")
+
+        request_path = set(profile['request_path'])
+        loaded = [module for module in options['check'] if module in request_path]
+        if loaded:
+            raise CommandError(f"Loaded on the public request path: {', '.join(loaded)}")
@@ -0,0 +1,77 @@
+import datetime
+import json
+from collections import Counter, defaultdict
+from pathlib import Path
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+
+class Command(BaseCommand):
+    help = "Summarize the slow-query log: statements grouped by fingerprint, worst total time first."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--log', default=None, help="Log file (default: settings.SLOW_QUERY_LOG).")
+        parser.add_argument('--top', type=int, default=20)
+        parser.add_argument('--hours', type=float, default=None, help="Only records from the last N hours.")
+        parser.add_argument('--view', default=None, help="Only queries issued by this URL name.")
+        parser.add_argument('--no-rotated', action='store_true', help="Skip the rotated .1, .2, ... files.")
+        parser.add_argument('--plans', action='store_true', help="Print the slowest captured plan of each.")
+
+    def handle(self, *args, **options):
+        path = Path(options['log'] or settings.SLOW_QUERY_LOG)
+        files = [path] if options['no_rotated'] else sorted(
+            path.parent.glob(f'{path.name}*'), key=lambda file: file.name,
+        )
+        files = [file for file in files if not file.name.endswith('.lock') and file.is_file()]
+        if not files:
+            raise CommandError(f'No slow-query log at {path}')
+
+        since = None
+        if options['hours'] is not None:
+            since = datetime.datetime.now(datetime.timezone.utc) - datetime.timedelta(hours=options['hours'])
+
+        groups = defaultdict(lambda: {'durations': [], 'views': Counter(), 'roles': Counter(), 'plan': None})
+        skipped = 0
+        for file in files:
+            with open(file, encoding='utf-8') as lines:
+                for line in lines:
+                    try:
+                        record = json.loads(line)
+                    except ValueError:
+                        skipped += 1   # a line cut short by a crash
+                        continue
+                    if since and datetime.datetime.fromisoformat(record['time']) < since:
+                        continue
+                    if options['view'] and record['view'] != options['view']:
+                        continue
+                    group = groups[record['fingerprint']]
+                    group['sql'] = record['sql']
+                    group['views'][record['view']] += 1
+                    group['roles'][record['role']] += 1
+                    if record.get('plan') and record['duration_ms'] >= max(group['durations'], default=0):
+                        group['plan'] = record['plan']
+                    group['durations'].append(record['duration_ms'])
+
+        ranked = sorted(groups.items(), key=lambda item: -sum(item[1]['durations']))
+        total = sum(sum(group['durations']) for group in groups.values())
+        self.stdout.write(
+            f"{sum(len(group['durations']) for group in groups.values())} slow queries, "
+            f"{len(groups)} distinct statements, {total / 1000:.1f} s in total"
+            + (f" ({skipped} unreadable lines skipped)" if skipped else '')
+        )
+        for fingerprint, group in ranked[:options['top']]:
+            durations = sorted(group['durations'])
+            p95 = durations[min(len(durations) - 1, int(len(durations) * 0.95))]
+            views = ', '.join(f'{view} ({count})' for view, count in group['views'].most_common(3))
+            roles = ', '.join(f'{role} ({count})' for role, count in group['roles'].most_common())
+            self.stdout.write(
+                f"\n{fingerprint}  total {sum(durations):.0f} ms  count {len(durations)}  "
+                f"mean {sum(durations) / len(durations):.1f} ms  p95 {p95:.1f} ms  max {durations[-1]:.1f} ms"
+            )
+            self.stdout.write(f"  views: {views}")
+            self.stdout.write(f"  roles: {roles}")
+            self.stdout.write(f"  {group['sql'][:300]}")
+            if options['plans'] and group['plan']:
+                for line in group['plan'].splitlines():
+                    self.stdout.write(f"    {line}")
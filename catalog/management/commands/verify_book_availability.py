@@ -0,0 +1,47 @@
+from django.core.management.base import BaseCommand
+from django.db.models import Min, Q
+
+from catalog.models import Book, refresh_book_availability
+
+
+class Command(BaseCommand):
+    help = (
+        "Compare Book.copies_total/copies_available/next_due_back with the "
+        "BookInstance rows and optionally repair the books that drifted."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--repair', action='store_true', help='Rewrite the columns of drifted books.')
+        parser.add_argument('--chunk-size', type=int, default=2000)
+
+    def handle(self, *args, **options):
+        expected = (
+            Book.objects.with_availability()
+            .annotate(expected_next_due_back=Min('bookinstance__due_back', filter=Q(bookinstance__status='o')))
+            .order_by('pk')
+            .values_list(
+                'pk', 'copies_total', 'copies_available', 'next_due_back',
+                'num_copies', 'num_available', 'expected_next_due_back',
+            )
+        )
+
+        drifted = []
+        for pk, total, available, next_due, num_copies, num_available, expected_next in expected.iterator(
+            chunk_size=options['chunk_size']
+        ):
+            if (total, available, next_due) != (num_copies, num_available, expected_next):
+                drifted.append(pk)
+                if options['verbosity'] > 1:
+                    self.stdout.write(
+                        f'book {pk}: stored ({total}, {available}, {next_due}) '
+                        f'expected ({num_copies}, {num_available}, {expected_next})'
+                    )
+
+        if not drifted:
+            self.stdout.write(self.style.SUCCESS('Book availability columns are consistent.'))
+            return
+
+        self.stdout.write(self.style.WARNING(f'{len(drifted)} book(s) drifted.'))
+        if options['repair']:
+            refresh_book_availability(drifted)
+            self.stdout.write(self.style.SUCCESS(f'Repaired {len(drifted)} book(s).'))
@@ -0,0 +1,152 @@
+"""Prometheus metrics: a request middleware and the /metrics endpoint.
+
+Under gunicorn every worker writes its samples to files in
+PROMETHEUS_MULTIPROC_DIR (gunicorn.conf.py sets it and cleans it up), and
+/metrics merges the files of all workers, so whichever worker answers
+the scrape reports totals for the whole server.  Without that variable,
+e.g. under runserver, the metrics of the current process are reported.
+
+The cache counters already kept in catalog.cache and catalog.search are
+per process; the middleware adds their increase since the previous request
+to the shared counters.  The copy gauges are computed when scraped, from
+index range scans on bookinstance_status_due_idx, and cached briefly.
+"""
+import datetime
+import os
+import threading
+import time
+
+from django.conf import settings
+from django.db import connection
+from django.db.models import Count
+from django.http import HttpResponse, HttpResponseForbidden
+from prometheus_client import (
+    CONTENT_TYPE_LATEST, REGISTRY, CollectorRegistry, Counter, Histogram, generate_latest, multiprocess,
+)
+from prometheus_client.core import GaugeMetricFamily
+
+from . import search
+from .cache import cache_stats, get_or_compute
+from .models import BookInstance
+
+COPY_GAUGE_TIMEOUT = 30
+
+REQUEST_LATENCY = Histogram(
+    'catalog_request_duration_seconds', 'Time to produce a response, by URL name.', ['view', 'method'],
+)
+REQUESTS = Counter('catalog_requests_total', 'Responses by URL name and status code.', ['view', 'method', 'status'])
+DB_QUERIES = Counter('catalog_db_queries_total', 'Database queries run while handling requests.', ['view'])
+DB_TIME = Counter('catalog_db_query_seconds_total', 'Time spent in database queries.', ['view'])
+SESSION_WRITES = Counter('catalog_session_writes_total', 'Requests that saved the session.', ['view'])
+CACHE_EVENTS = Counter('catalog_cache_events_total', 'Cache lookups by cache and outcome.', ['cache', 'event'])
+
+_CACHE_COUNTERS = {
+    'catalog': ('hits', 'misses', 'early_refreshes', 'lock_waits', 'evictions'),
+    'search': ('hits', 'misses', 'evictions'),
+}
+_last_seen = {}
+_last_seen_lock = threading.Lock()
+
+
+def _view_name(request):
+    match = getattr(request, 'resolver_match', None)
+    if match is None:
+        return 'unmatched'
+    return match.view_name
+
+
+class _QueryTimer:
+    def __init__(self):
+        self.count = 0
+        self.seconds = 0.0
+
+    def __call__(self, execute, sql, params, many, context):
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.count += 1
+            self.seconds += time.perf_counter() - started
+
+
+def _record_cache_counters():
+    current = {'catalog': cache_stats(), 'search': search.results.stats()}
+    with _last_seen_lock:
+        for cache_name, events in _CACHE_COUNTERS.items():
+            for event in events:
+                value = current[cache_name].get(event, 0)
+                previous = _last_seen.get((cache_name, event), 0)
+                # a reset of the in-process stats starts counting again from zero
+                increase = value - previous if value >= previous else value
+                if increase:
+                    CACHE_EVENTS.labels(cache_name, event).inc(increase)
+                _last_seen[cache_name, event] = value
+
+
+class MetricsMiddleware:
+    """Times each request and counts its queries; install it first in MIDDLEWARE."""
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        queries = _QueryTimer()
+        started = time.perf_counter()
+        with connection.execute_wrapper(queries):
+            response = self.get_response(request)
+        elapsed = time.perf_counter() - started
+
+        view = _view_name(request)
+        REQUEST_LATENCY.labels(view, request.method).observe(elapsed)
+        REQUESTS.labels(view, request.method, response.status_code).inc()
+        if queries.count:
+            DB_QUERIES.labels(view).inc(queries.count)
+            DB_TIME.labels(view).inc(queries.seconds)
+        session = getattr(request, 'session', None)
+        if session is not None and session.modified and response.status_code != 500:
+            SESSION_WRITES.labels(view).inc()
+        _record_cache_counters()
+        return response
+
+
+def copy_counts():
+    """Copies per status plus overdue loans, from two index scans."""
+    counts = {status: 0 for status, _ in BookInstance.LOAN_STATUS}
+    counts.update(BookInstance.objects.order_by().values_list('status').annotate(n=Count('pk')))
+    overdue = BookInstance.objects.filter(status='o', due_back__lt=datetime.date.today()).count()
+    return counts, overdue
+
+
+class CopyCollector:
+    def collect(self):
+        counts, overdue = get_or_compute('metrics:copies', copy_counts, timeout=COPY_GAUGE_TIMEOUT)
+        copies = GaugeMetricFamily('catalog_copies', 'Book copies by status.', labels=['status'])
+        for status, count in sorted(counts.items()):
+            copies.add_metric([status], count)
+        yield copies
+        yield GaugeMetricFamily('catalog_copies_overdue', 'Copies on loan past their due date.', value=overdue)
+
+
+def _allowed(request):
+    if request.user.is_authenticated and request.user.is_staff:
+        return True
+    if not settings.TRUSTED_PROXY_COUNT and 'HTTP_X_FORWARDED_FOR' in request.META:
+        # relayed by a proxy that is not configured as trusted, e.g. one on the
+        # same host: REMOTE_ADDR is the proxy's address, not the client's
+        return False
+    return search.client_ip(request) in settings.METRICS_ALLOWED_IPS
+
+
+_copies_registry = CollectorRegistry()
+_copies_registry.register(CopyCollector())
+
+
+def metrics_view(request):
+    if not _allowed(request):
+        return HttpResponseForbidden("Access denied: metrics are for monitoring hosts and staff.")
+    registry = REGISTRY
+    if 'PROMETHEUS_MULTIPROC_DIR' in os.environ:
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+    output = generate_latest(registry) + generate_latest(_copies_registry)
+    return HttpResponse(output, content_type=CONTENT_TYPE_LATEST)
@@ -0,0 +1,29 @@
+# Generated by Django 5.2.18 on 2026-10-19 13:05
+
+import catalog.models
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("catalog", "0006_bookinstance_borrower"),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name="author",
+            name="date_of_death",
+            field=models.DateField(blank=True, null=True, verbose_name="died"),
+        ),
+        migrations.AlterField(
+            model_name="bookinstance",
+            name="id",
+            field=models.UUIDField(
+                default=catalog.models.uuid7,
+                help_text="Unique ID for this particular book across whole library",
+                primary_key=True,
+                serialize=False,
+            ),
+        ),
+    ]
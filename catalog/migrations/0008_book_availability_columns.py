@@ -0,0 +1,60 @@
+# Generated by Django 5.2.18 on 2026-10-19 13:07
+
+from django.db import migrations, models
+from django.db.models.functions import Coalesce
+
+
+def backfill_availability(apps, schema_editor):
+    Book = apps.get_model("catalog", "Book")
+    BookInstance = apps.get_model("catalog", "BookInstance")
+    copies = (
+        BookInstance.objects.filter(book=models.OuterRef("pk"))
+        .order_by()
+        .values("book")
+    )
+    Book.objects.update(
+        copies_total=Coalesce(
+            models.Subquery(copies.annotate(n=models.Count("pk")).values("n")), 0
+        ),
+        copies_available=Coalesce(
+            models.Subquery(
+                copies.filter(status="a").annotate(n=models.Count("pk")).values("n")
+            ),
+            0,
+        ),
+        next_due_back=models.Subquery(
+            copies.filter(status="o").annotate(d=models.Min("due_back")).values("d")
+        ),
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("catalog", "0007_bookinstance_uuid7"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="book",
+            name="copies_available",
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name="book",
+            name="copies_total",
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name="book",
+            name="next_due_back",
+            field=models.DateField(blank=True, editable=False, null=True),
+        ),
+        migrations.AddIndex(
+            model_name="book",
+            index=models.Index(
+                fields=["copies_available"], name="book_copies_available_idx"
+            ),
+        ),
+        migrations.RunPython(backfill_availability, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,27 @@
+# Generated by Django 5.2.18 on 2026-10-19 13:10
+
+import django.db.models.functions.text
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("catalog", "0008_book_availability_columns"),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name="author",
+            index=models.Index(
+                fields=["last_name", "first_name"], name="author_name_idx"
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="author",
+            index=models.Index(
+                django.db.models.functions.text.Lower("last_name"),
+                name="author_last_name_lower_idx",
+            ),
+        ),
+    ]
@@ -0,0 +1,39 @@
+# Generated by Django 5.2.18 on 2026-10-19 13:12
+
+import catalog.isbn
+import catalog.models
+from django.db import migrations
+
+
+def canonicalize_isbns(apps, schema_editor):
+    Book = apps.get_model("catalog", "Book")
+    rows = list(Book.objects.values_list("pk", "isbn"))
+    canonical = catalog.isbn.canonical_isbns([isbn for _, isbn in rows])
+    taken = {isbn for _, isbn in rows}
+    for (pk, isbn), new_isbn in zip(rows, canonical):
+        # leave non-ISBNs and values whose canonical form already exists alone
+        if new_isbn and new_isbn != isbn and new_isbn not in taken:
+            Book.objects.filter(pk=pk).update(isbn=new_isbn)
+            taken.add(new_isbn)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("catalog", "0009_author_indexes"),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name="book",
+            name="isbn",
+            field=catalog.models.ISBNField(
+                help_text='ISBN-10 or ISBN-13, stored as 13 Character <a href="https://www.isbn-international.org/content/what-isbn">ISBN number</a>',
+                max_length=13,
+                unique=True,
+                validators=[catalog.isbn.validate_isbn],
+                verbose_name="ISBN",
+            ),
+        ),
+        migrations.RunPython(canonicalize_isbns, migrations.RunPython.noop),
+    ]
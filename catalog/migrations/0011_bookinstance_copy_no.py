@@ -0,0 +1,54 @@
+# Generated by Django 5.2.18 on 2026-10-19 13:15
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+def number_existing_copies(apps, schema_editor):
+    BookInstance = apps.get_model("catalog", "BookInstance")
+    Sequence = apps.get_model("sequences", "Sequence")
+    last_numbers = {}
+    for pk, book_id in (
+        BookInstance.objects.filter(book__isnull=False)
+        .order_by("book_id", "pk")
+        .values_list("pk", "book_id")
+        .iterator()
+    ):
+        last_numbers[book_id] = last_numbers.get(book_id, 0) + 1
+        BookInstance.objects.filter(pk=pk).update(copy_no=last_numbers[book_id])
+    Sequence.objects.bulk_create(
+        [
+            Sequence(name=f"catalog.bookinstance.copy_no.{book_id}", last=last)
+            for book_id, last in last_numbers.items()
+        ]
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("catalog", "0010_book_isbn_canonical"),
+        ("sequences", "0002_alter_sequence_last"),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="bookinstance",
+            name="copy_no",
+            field=models.PositiveIntegerField(
+                blank=True,
+                editable=False,
+                help_text="Sequential number of this copy among the copies of its book",
+                null=True,
+                verbose_name="copy number",
+            ),
+        ),
+        migrations.RunPython(number_existing_copies, migrations.RunPython.noop),
+        migrations.AddConstraint(
+            model_name="bookinstance",
+            constraint=models.UniqueConstraint(
+                fields=("book", "copy_no"), name="bookinstance_book_copy_no_unique"
+            ),
+        ),
+    ]
@@ -0,0 +1,110 @@
+# Generated by Django 5.2.18 on 2026-10-19 13:17
+
+import django.db.models.deletion
+import django.utils.timezone
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("catalog", "0011_bookinstance_copy_no"),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="LoanEvent",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                (
+                    "created_at",
+                    models.DateTimeField(
+                        default=django.utils.timezone.now, editable=False
+                    ),
+                ),
+                (
+                    "from_status",
+                    models.CharField(
+                        blank=True,
+                        choices=[
+                            ("m", "Maintenance"),
+                            ("o", "On loan"),
+                            ("a", "Available"),
+                            ("r", "Reserved"),
+                        ],
+                        max_length=1,
+                    ),
+                ),
+                (
+                    "to_status",
+                    models.CharField(
+                        choices=[
+                            ("m", "Maintenance"),
+                            ("o", "On loan"),
+                            ("a", "Available"),
+                            ("r", "Reserved"),
+                        ],
+                        max_length=1,
+                    ),
+                ),
+                ("due_back", models.DateField(blank=True, null=True)),
+                (
+                    "book",
+                    models.ForeignKey(
+                        db_constraint=False,
+                        null=True,
+                        on_delete=django.db.models.deletion.DO_NOTHING,
+                        related_name="loan_events",
+                        to="catalog.book",
+                    ),
+                ),
+                (
+                    "book_instance",
+                    models.ForeignKey(
+                        db_constraint=False,
+                        on_delete=django.db.models.deletion.DO_NOTHING,
+                        related_name="loan_events",
+                        to="catalog.bookinstance",
+                    ),
+                ),
+                (
+                    "borrower",
+                    models.ForeignKey(
+                        blank=True,
+                        db_constraint=False,
+                        null=True,
+                        on_delete=django.db.models.deletion.DO_NOTHING,
+                        related_name="loan_events",
+                        to=settings.AUTH_USER_MODEL,
+                    ),
+                ),
+            ],
+            options={
+                "ordering": ["-created_at"],
+                "indexes": [
+                    models.Index(
+                        fields=["borrower", "created_at"],
+                        name="loanevent_borrower_time_idx",
+                    ),
+                    models.Index(
+                        fields=["book", "created_at"], name="loanevent_book_time_idx"
+                    ),
+                    models.Index(
+                        fields=["book_instance", "created_at"],
+                        name="loanevent_copy_time_idx",
+                    ),
+                    models.Index(fields=["created_at"], name="loanevent_time_idx"),
+                ],
+            },
+        ),
+    ]
@@ -0,0 +1,54 @@
+# Generated by Django 5.2.18 on 2026-10-19 13:20
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("catalog", "0012_loanevent"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="BookSimilarity",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("score", models.FloatField()),
+                ("rank", models.PositiveSmallIntegerField()),
+                (
+                    "book",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="similarities",
+                        to="catalog.book",
+                    ),
+                ),
+                (
+                    "similar",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="+",
+                        to="catalog.book",
+                    ),
+                ),
+            ],
+            options={
+                "ordering": ["book", "rank"],
+                "constraints": [
+                    models.UniqueConstraint(
+                        fields=("book", "rank"), name="booksimilarity_book_rank_uniq"
+                    )
+                ],
+            },
+        ),
+    ]
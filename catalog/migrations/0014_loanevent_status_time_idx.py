@@ -0,0 +1,21 @@
+# Generated by Django 5.2.18 on 2026-10-19 13:23
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("catalog", "0013_booksimilarity"),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name="loanevent",
+            index=models.Index(
+                fields=["to_status", "created_at"], name="loanevent_status_time_idx"
+            ),
+        ),
+    ]
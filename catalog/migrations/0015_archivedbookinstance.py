@@ -0,0 +1,134 @@
+# Generated by Django 5.2.18 on 2026-10-19 13:25
+
+import django.core.serializers.json
+import django.db.models.deletion
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("catalog", "0014_loanevent_status_time_idx"),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name="bookinstance",
+            name="status",
+            field=models.CharField(
+                blank=True,
+                choices=[
+                    ("m", "Maintenance"),
+                    ("o", "On loan"),
+                    ("a", "Available"),
+                    ("r", "Reserved"),
+                    ("l", "Lost"),
+                    ("w", "Withdrawn"),
+                ],
+                default="m",
+                help_text="Book availability",
+                max_length=1,
+            ),
+        ),
+        migrations.AlterField(
+            model_name="loanevent",
+            name="from_status",
+            field=models.CharField(
+                blank=True,
+                choices=[
+                    ("m", "Maintenance"),
+                    ("o", "On loan"),
+                    ("a", "Available"),
+                    ("r", "Reserved"),
+                    ("l", "Lost"),
+                    ("w", "Withdrawn"),
+                ],
+                max_length=1,
+            ),
+        ),
+        migrations.AlterField(
+            model_name="loanevent",
+            name="to_status",
+            field=models.CharField(
+                choices=[
+                    ("m", "Maintenance"),
+                    ("o", "On loan"),
+                    ("a", "Available"),
+                    ("r", "Reserved"),
+                    ("l", "Lost"),
+                    ("w", "Withdrawn"),
+                ],
+                max_length=1,
+            ),
+        ),
+        migrations.CreateModel(
+            name="ArchivedBookInstance",
+            fields=[
+                ("id", models.UUIDField(primary_key=True, serialize=False)),
+                (
+                    "copy_no",
+                    models.PositiveIntegerField(
+                        blank=True, null=True, verbose_name="copy number"
+                    ),
+                ),
+                ("imprint", models.CharField(max_length=200)),
+                (
+                    "status",
+                    models.CharField(
+                        choices=[
+                            ("m", "Maintenance"),
+                            ("o", "On loan"),
+                            ("a", "Available"),
+                            ("r", "Reserved"),
+                            ("l", "Lost"),
+                            ("w", "Withdrawn"),
+                        ],
+                        max_length=1,
+                    ),
+                ),
+                ("due_back", models.DateField(blank=True, null=True)),
+                (
+                    "archived_at",
+                    models.DateTimeField(default=django.utils.timezone.now),
+                ),
+                (
+                    "history",
+                    models.JSONField(
+                        blank=True,
+                        encoder=django.core.serializers.json.DjangoJSONEncoder,
+                        help_text="LoanEvents moved with the copy, oldest first",
+                        null=True,
+                    ),
+                ),
+                (
+                    "book",
+                    models.ForeignKey(
+                        db_constraint=False,
+                        null=True,
+                        on_delete=django.db.models.deletion.DO_NOTHING,
+                        related_name="archived_copies",
+                        to="catalog.book",
+                    ),
+                ),
+                (
+                    "booklang",
+                    models.ForeignKey(
+                        db_constraint=False,
+                        null=True,
+                        on_delete=django.db.models.deletion.DO_NOTHING,
+                        related_name="+",
+                        to="catalog.booklang",
+                    ),
+                ),
+            ],
+            options={
+                "ordering": ["book", "copy_no"],
+                "indexes": [
+                    models.Index(
+                        fields=["book", "copy_no"], name="archivedcopy_book_idx"
+                    )
+                ],
+            },
+        ),
+    ]
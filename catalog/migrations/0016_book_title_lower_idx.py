@@ -0,0 +1,21 @@
+# Generated by Django 5.2.18 on 2026-10-19 13:28
+
+import django.db.models.functions.text
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("catalog", "0015_archivedbookinstance"),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name="book",
+            index=models.Index(
+                django.db.models.functions.text.Lower("title"),
+                name="book_title_lower_idx",
+            ),
+        ),
+    ]
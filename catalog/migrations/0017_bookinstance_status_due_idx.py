@@ -0,0 +1,21 @@
+# Generated by Django 5.2.18 on 2026-10-19 13:48
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("catalog", "0016_book_title_lower_idx"),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name="bookinstance",
+            index=models.Index(
+                fields=["status", "due_back"], name="bookinstance_status_due_idx"
+            ),
+        ),
+    ]
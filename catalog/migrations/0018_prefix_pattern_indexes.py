@@ -0,0 +1,37 @@
+from django.db import migrations
+
+# PostgreSQL only: a plain index on LOWER(col) cannot serve LIKE 'prefix%'
+# unless the database collation is C, while a text_pattern_ops index can.
+# SQLite answers prefix searches from the Lower() indexes with a range
+# (see catalog.models.prefix_filter), so it needs nothing more.
+PATTERN_INDEXES = (
+    ('book_title_lower_pattern_idx', 'catalog_book', 'title'),
+    ('author_last_name_lower_pattern_idx', 'catalog_author', 'last_name'),
+)
+
+
+def create_pattern_indexes(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    for name, table, column in PATTERN_INDEXES:
+        schema_editor.execute(
+            f'CREATE INDEX IF NOT EXISTS {name} ON {table} (LOWER({column}) text_pattern_ops)'
+        )
+
+
+def drop_pattern_indexes(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    for name, _, _ in PATTERN_INDEXES:
+        schema_editor.execute(f'DROP INDEX IF EXISTS {name}')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("catalog", "0017_bookinstance_status_due_idx"),
+    ]
+
+    operations = [
+        migrations.RunPython(create_pattern_indexes, drop_pattern_indexes),
+    ]
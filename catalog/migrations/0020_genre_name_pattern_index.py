@@ -0,0 +1,27 @@
+from django.db import migrations
+
+# PostgreSQL only, like 0018: lets the genre autocomplete's LIKE 'prefix%'
+# on LOWER(name) use an index.  SQLite uses the unique Lower(name) index.
+
+
+def create_pattern_index(apps, schema_editor):
+    if schema_editor.connection.vendor == 'postgresql':
+        schema_editor.execute(
+            'CREATE INDEX IF NOT EXISTS genre_name_lower_pattern_idx ON catalog_genre (LOWER(name) text_pattern_ops)'
+        )
+
+
+def drop_pattern_index(apps, schema_editor):
+    if schema_editor.connection.vendor == 'postgresql':
+        schema_editor.execute('DROP INDEX IF EXISTS genre_name_lower_pattern_idx')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("catalog", "0019_create_cache_table"),
+    ]
+
+    operations = [
+        migrations.RunPython(create_pattern_index, drop_pattern_index),
+    ]
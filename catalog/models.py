@@ -1,16 +1,48 @@
 from datetime import date
-from itertools import count
-from wsgiref.util import request_uri
 import uuid
-from django.contrib.admin import display
-from django.contrib.admin.utils import help_text_for_field
-from django.db import models
+from django.db import connections, models, transaction
 from django.urls import reverse
-from django.db.models import UniqueConstraint, Model
-from django.db.models.functions import Lower
-from django.utils.functional import empty
+from django.db.models import UniqueConstraint
+from django.db.models.functions import Coalesce, Lower
 from django.conf import settings
-
+from django.core.serializers.json import DjangoJSONEncoder
+from django.utils import timezone
+from .cache import bump_catalog_version
+from .isbn import canonical_isbn, validate_isbn
+from sequences import get_next_values
+import os
+import threading
+import time
+
+
+_uuid7_lock = threading.Lock()
+_uuid7_last = [0, 0]  # [timestamp_ms, 12-bit counter]
+
+
+def uuid7():
+    """Return a time-ordered UUID (RFC 9562 version 7).
+
+    The first 48 bits hold the Unix time in milliseconds, so new keys are
+    appended to the right edge of the primary-key index instead of landing
+    on random pages like ``uuid4``.  Keys generated in the same millisecond
+    by one process use the 12 ``rand_a`` bits as a counter, which keeps
+    them strictly increasing.
+    """
+    with _uuid7_lock:
+        timestamp_ms = time.time_ns() // 1_000_000
+        if timestamp_ms > _uuid7_last[0]:
+            counter = int.from_bytes(os.urandom(2), 'big') & 0x7FF
+        else:
+            timestamp_ms = _uuid7_last[0]
+            counter = _uuid7_last[1] + 1
+            if counter > 0xFFF:
+                timestamp_ms += 1
+                counter = 0
+        _uuid7_last[0], _uuid7_last[1] = timestamp_ms, counter
+
+    rand_b = int.from_bytes(os.urandom(8), 'big') & ((1 << 62) - 1)
+    value = (timestamp_ms << 80) | (0x7 << 76) | (counter << 64) | (0x2 << 62) | rand_b
+    return uuid.UUID(int=value)
 
 
 class Genre(models.Model):
@@ -36,17 +68,129 @@ class Genre(models.Model):
             ),
         ]
 
+class ISBNField(models.CharField):
+    """CharField that stores, and looks up by, the canonical ISBN-13.
+
+    ISBN-10, hyphenated and spaced input is converted on save, in form
+    cleaning and in lookups such as ``isbn=`` and ``isbn__in=``, so all
+    spellings of one ISBN hit the same unique index.  Values that are not
+    ISBNs are passed through unchanged and left to ``validate_isbn``.
+    """
+
+    # room for "978-0-306-40615-7" in forms, the column itself stays 13 wide
+    FORM_MAX_LENGTH = 17
+
+    @staticmethod
+    def _canonical(value):
+        if not value:
+            return value
+        try:
+            return canonical_isbn(value)
+        except ValueError:
+            return value
+
+    def to_python(self, value):
+        return self._canonical(super().to_python(value))
+
+    def get_prep_value(self, value):
+        return self._canonical(super().get_prep_value(value))
+
+    def pre_save(self, model_instance, add):
+        value = self._canonical(getattr(model_instance, self.attname))
+        setattr(model_instance, self.attname, value)
+        return value
+
+    def formfield(self, **kwargs):
+        return super().formfield(**{'max_length': self.FORM_MAX_LENGTH, **kwargs})
+
+
+def prefix_filter(queryset, field, prefix):
+    """Case-insensitive prefix filter on `field` that its lower-case index can serve.
+
+    ``__startswith`` compiles to ``LIKE ... ESCAPE``, which SQLite never
+    answers from an index, so there the prefix becomes a range on
+    LOWER(field), in binary order like the Lower() index.  PostgreSQL
+    compares text in the database collation, where such a range is not
+    exact, so there the LIKE stays and is served by the text_pattern_ops
+    index from migration 0018 (0020 for Genre.name).
+    """
+    prefix = prefix.lower()
+    queryset = queryset.alias(**{f'{field}_lower': Lower(field)})
+    if connections[queryset.db].vendor == 'postgresql':
+        return queryset.filter(**{f'{field}_lower__startswith': prefix})
+    return queryset.filter(**{f'{field}_lower__gte': prefix, f'{field}_lower__lt': prefix + '\U0010ffff'})
+
+
+class BookQuerySet(models.QuerySet):
+
+    def with_availability(self):
+        """Annotate each book with copy counts per status in the same query."""
+        return self.annotate(
+            num_copies=models.Count('bookinstance'),
+            num_available=models.Count('bookinstance', filter=models.Q(bookinstance__status='a')),
+            num_on_loan=models.Count('bookinstance', filter=models.Q(bookinstance__status='o')),
+            num_reserved=models.Count('bookinstance', filter=models.Q(bookinstance__status='r')),
+        )
+
+    def title_startswith(self, prefix):
+        """Case-insensitive prefix search served by an index on LOWER(title) (see prefix_filter)."""
+        return prefix_filter(self, 'title', prefix)
+
+    def available_now(self):
+        """Books with at least one copy on the shelf, served by the copies_available index."""
+        return self.filter(copies_available__gt=0)
+
+    def refresh_availability(self):
+        """Recompute the denormalized availability columns from BookInstance in one UPDATE."""
+        copies = BookInstance.objects.filter(book=models.OuterRef('pk')).order_by().values('book')
+        return self.update(
+            copies_total=Coalesce(
+                models.Subquery(copies.annotate(n=models.Count('pk')).values('n')), 0
+            ),
+            copies_available=Coalesce(
+                models.Subquery(copies.filter(status='a').annotate(n=models.Count('pk')).values('n')), 0
+            ),
+            next_due_back=models.Subquery(
+                copies.filter(status='o').annotate(d=models.Min('due_back')).values('d')
+            ),
+        )
+
+
+def refresh_book_availability(book_ids, batch_size=500):
+    """Refresh the availability columns of the given books (None ids are ignored)."""
+    book_ids = sorted({book_id for book_id in book_ids if book_id is not None})
+    for start in range(0, len(book_ids), batch_size):
+        Book.objects.filter(pk__in=book_ids[start:start + batch_size]).refresh_availability()
+    # after the commit, or a reader could cache the old rows under the new version
+    transaction.on_commit(bump_catalog_version)
+
+
 class Book(models.Model):
     title = models.CharField(max_length=200)
     author = models.ForeignKey('Author', on_delete=models.RESTRICT, null=True)
 
     summary = models.CharField(max_length=1000, help_text="bring a brief to the book")
-    isbn = models.CharField('ISBN', max_length=13,
+    isbn = ISBNField('ISBN', max_length=13,
                             unique=True,
-                            help_text='13 Character <a href="https://www.isbn-international.org/content/what-isbn'
+                            validators=[validate_isbn],
+                            help_text='ISBN-10 or ISBN-13, stored as 13 Character <a href="https://www.isbn-international.org/content/what-isbn'
                                       '">ISBN number</a>')
     genre = models.ManyToManyField(Genre, help_text="select a genre for this book")
 
+    # Denormalized from BookInstance; kept in sync by BookInstance.save/delete
+    # and BookInstanceQuerySet, and checked by `manage.py verify_book_availability`.
+    copies_total = models.PositiveIntegerField(default=0, editable=False)
+    copies_available = models.PositiveIntegerField(default=0, editable=False)
+    next_due_back = models.DateField(null=True, blank=True, editable=False)
+
+    objects = BookQuerySet.as_manager()
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['copies_available'], name='book_copies_available_idx'),
+            models.Index(Lower('title'), name='book_title_lower_idx'),
+        ]
+
     def __str__(self):
         return self.title
 
@@ -59,17 +203,129 @@ class Book(models.Model):
 
     display_genre.short_description = 'Genre'
 
+def copy_number_sequence(book_id):
+    return f'catalog.bookinstance.copy_no.{book_id}'
+
+
+def allocate_copy_numbers(instances, using=None):
+    """Give every unnumbered copy the next copy number of its book.
+
+    One sequence row per book keeps contention to concurrent intake of the
+    same title; numbers are reserved in batches, and because the sequence
+    row is updated in the caller's transaction a rollback leaves no gaps.
+    """
+    by_book = {}
+    for instance in instances:
+        if instance.copy_no is None and instance.book_id is not None:
+            by_book.setdefault(instance.book_id, []).append(instance)
+    for book_id, copies in by_book.items():
+        numbers = get_next_values(len(copies), copy_number_sequence(book_id), using=using)
+        for instance, number in zip(copies, numbers):
+            instance.copy_no = number
+
+
+class BookInstanceQuerySet(models.QuerySet):
+    """Bulk write paths that keep Book's availability columns and the LoanEvent log in sync.
+
+    bulk_update goes through update(), so it is covered as well.
+    """
+
+    def retired(self, maintenance_before=None):
+        """Lost and withdrawn copies, plus copies in maintenance since before `maintenance_before`.
+
+        Copies with no logged move into maintenance are left alone: their
+        time in maintenance is unknown, and 'm' is also the default status.
+        """
+        condition = models.Q(status__in=BookInstance.RETIRED_STATUSES)
+        if maintenance_before is not None:
+            entered = LoanEvent.objects.filter(book_instance=models.OuterRef('pk'), to_status='m')
+            condition |= (
+                models.Q(status='m')
+                & models.Exists(entered.filter(created_at__lt=maintenance_before))
+                & ~models.Exists(entered.filter(created_at__gte=maintenance_before))
+            )
+        return self.filter(condition)
+
+    AVAILABILITY_FIELDS = {'book', 'book_id', 'status', 'due_back'}
+
+    def update(self, **kwargs):
+        if not self.AVAILABILITY_FIELDS.intersection(kwargs):
+            rows = super().update(**kwargs)
+            transaction.on_commit(bump_catalog_version, using=self.db)
+            return rows
+        with transaction.atomic(using=self.db):
+            before = {
+                pk: (book_id, status)
+                for pk, book_id, status in self.order_by().values_list('pk', 'book_id', 'status')
+            }
+            rows = super().update(**kwargs)
+            book_ids = {book_id for book_id, _ in before.values()}
+            if {'status', 'book', 'book_id'}.intersection(kwargs):
+                book_ids.update(self._log_status_changes(before))
+            refresh_book_availability(book_ids)
+        return rows
+
+    update.alters_data = True
+
+    def _log_status_changes(self, before, chunk_size=1000):
+        """Write LoanEvents for rows whose status differs from `before`; return their current book ids.
+
+        The rows are re-read after the UPDATE, so expression updates such as
+        the CASE statements generated by bulk_update are logged correctly.
+        """
+        pks = list(before)
+        book_ids = set()
+        for start in range(0, len(pks), chunk_size):
+            after = (
+                self.model._base_manager.using(self.db)
+                .filter(pk__in=pks[start:start + chunk_size])
+                .values_list('pk', 'book_id', 'status', 'borrower_id', 'due_back')
+            )
+            events = []
+            for pk, book_id, status, borrower_id, due_back in after:
+                book_ids.add(book_id)
+                if before[pk][1] != status:
+                    events.append(LoanEvent(
+                        book_instance_id=pk, book_id=book_id, borrower_id=borrower_id,
+                        from_status=before[pk][1], to_status=status, due_back=due_back,
+                    ))
+            LoanEvent.objects.bulk_create(events)
+        return book_ids
+
+    def delete(self):
+        with transaction.atomic(using=self.db):
+            book_ids = set(self.order_by().values_list('book_id', flat=True).distinct())
+            result = super().delete()
+            refresh_book_availability(book_ids)
+        return result
+
+    delete.alters_data = True
+
+    def bulk_create(self, objs, *args, **kwargs):
+        objs = list(objs)
+        with transaction.atomic(using=self.db):
+            allocate_copy_numbers(objs, using=self.db)
+            objs = super().bulk_create(objs, *args, **kwargs)
+            LoanEvent.objects.bulk_create([LoanEvent.for_copy(obj, from_status='') for obj in objs])
+            refresh_book_availability(obj.book_id for obj in objs)
+        return objs
+
+
 class BookInstance(models.Model):
     x = 0
 
     """Model representing a specific copy of a book (i.e. that can be borrowed from the library)."""
-    id = models.UUIDField(primary_key=True, default=uuid.uuid4,
+    id = models.UUIDField(primary_key=True, default=uuid7,
                           help_text="Unique ID for this particular book across whole library")
     book = models.ForeignKey('Book', on_delete=models.RESTRICT, null=True)
     imprint = models.CharField(max_length=200)
     due_back = models.DateField(null=True, blank=True)
     borrower = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.SET_NULL, null=True, blank=True)
     booklang = models.ForeignKey('BookLang', on_delete=models.RESTRICT, help_text='Book Lang', null=True)
+    copy_no = models.PositiveIntegerField(
+        'copy number', null=True, blank=True, editable=False,
+        help_text='Sequential number of this copy among the copies of its book',
+    )
 
 
     LOAN_STATUS = (
@@ -77,7 +333,11 @@ class BookInstance(models.Model):
         ('o', 'On loan'),
         ('a', 'Available'),
         ('r', 'Reserved'),
+        ('l', 'Lost'),
+        ('w', 'Withdrawn'),
     )
+    # copies that will not circulate again; `manage.py archive_bookinstances` moves them out
+    RETIRED_STATUSES = ('l', 'w')
 
     status = models.CharField(
         max_length=1,
@@ -87,6 +347,41 @@ class BookInstance(models.Model):
         help_text='Book availability',
     )
 
+    objects = BookInstanceQuerySet.as_manager()
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        instance._loaded_availability = instance._availability_state()
+        return instance
+
+    def _availability_state(self):
+        return (self.__dict__.get('book_id'), self.__dict__.get('status'), self.__dict__.get('due_back'))
+
+    def save(self, *args, **kwargs):
+        loaded = getattr(self, '_loaded_availability', None)
+        with transaction.atomic(using=kwargs.get('using')):
+            if loaded and loaded[0] != self.book_id:
+                # moved to another book: number it among that book's copies
+                self.copy_no = None
+            if self.copy_no is None and self.book_id is not None:
+                allocate_copy_numbers([self], using=kwargs.get('using'))
+                if kwargs.get('update_fields') is not None:
+                    kwargs['update_fields'] = {*kwargs['update_fields'], 'copy_no'}
+            super().save(*args, **kwargs)
+            current = self._availability_state()
+            if loaded is None or loaded[1] != current[1]:
+                LoanEvent.for_copy(self, from_status=loaded[1] if loaded else '').save()
+            if loaded != current:
+                refresh_book_availability({current[0], loaded[0] if loaded else None})
+        self._loaded_availability = current
+
+    def delete(self, *args, **kwargs):
+        with transaction.atomic(using=kwargs.get('using')):
+            result = super().delete(*args, **kwargs)
+            refresh_book_availability({self.book_id})
+        return result
+
 
     def __str__(self):
         match self.status:
@@ -98,6 +393,8 @@ class BookInstance(models.Model):
                 return f"name: {self.book}\n status: {self.get_status_display()}\n id: {self.id}"
             case "r":
                 return f"name: {self.book}\n status: {self.get_status_display()}\n id: {self.id} "
+            case "l" | "w":
+                return f"name: {self.book}\n status: {self.get_status_display()}\n id: {self.id} "
 
 
     
@@ -108,13 +405,39 @@ class BookInstance(models.Model):
 
 
 
+    @property
+    def copy_label(self):
+        return f'copy {self.copy_no} of {self.book}' if self.copy_no else str(self.id)
+
     class Meta:
         ordering = ['due_back']
+        constraints = [
+            UniqueConstraint(fields=['book', 'copy_no'], name='bookinstance_book_copy_no_unique'),
+        ]
+        indexes = [
+            # status counts and "on loan, due before today" (overdue) are index range scans
+            models.Index(fields=['status', 'due_back'], name='bookinstance_status_due_idx'),
+        ]
 
         def __str__(self):
             """String for representing the Model object."""
             return f'{self.id} ({self.book.title})'
 
+class AuthorQuerySet(models.QuerySet):
+
+    def with_counts(self):
+        """Annotate titles, copies and copies on loan per author in one aggregate query."""
+        return self.annotate(
+            num_titles=models.Count('book', distinct=True),
+            num_copies=models.Count('book__bookinstance'),
+            num_on_loan=models.Count('book__bookinstance', filter=models.Q(book__bookinstance__status='o')),
+        )
+
+    def last_name_startswith(self, prefix):
+        """Case-insensitive prefix search served by an index on LOWER(last_name) (see prefix_filter)."""
+        return prefix_filter(self, 'last_name', prefix)
+
+
 class Author(models.Model):
     """Model representing an author."""
     first_name = models.CharField(max_length=100)
@@ -122,8 +445,14 @@ class Author(models.Model):
     date_of_birth = models.DateField(null=True, blank=True)
     date_of_death = models.DateField('died', null=True, blank=True)
 
+    objects = AuthorQuerySet.as_manager()
+
     class Meta:
         ordering = ['last_name', 'first_name']
+        indexes = [
+            models.Index(fields=['last_name', 'first_name'], name='author_name_idx'),
+            models.Index(Lower('last_name'), name='author_last_name_lower_idx'),
+        ]
 
     def get_absolute_url(self):
         """Returns the URL to access a particular author instance."""
@@ -157,4 +486,147 @@ class BookLang(models.Model):
 
     def __str__(self):
         return self.get_booklang_display()
-        
\ No newline at end of file
+        
+
+
+class LoanEventQuerySet(models.QuerySet):
+
+    def between(self, start=None, end=None):
+        """Events with start <= created_at < end; either bound may be omitted."""
+        queryset = self
+        if start is not None:
+            queryset = queryset.filter(created_at__gte=start)
+        if end is not None:
+            queryset = queryset.filter(created_at__lt=end)
+        return queryset
+
+    def for_user(self, user, start=None, end=None):
+        return self.filter(borrower=user).between(start, end).order_by('-created_at')
+
+    def for_book(self, book, start=None, end=None):
+        return self.filter(book=book).between(start, end).order_by('-created_at')
+
+    def loans(self):
+        return self.filter(to_status='o')
+
+    def update(self, **kwargs):
+        raise TypeError('LoanEvent rows are append-only.')
+
+    def delete(self):
+        raise TypeError('LoanEvent rows are append-only; use `manage.py archive_loan_events`.')
+
+
+class LoanEvent(models.Model):
+    """Append-only log of BookInstance status transitions.
+
+    Written by BookInstance.save and by the BookInstance queryset's bulk
+    paths.  The foreign keys carry no database constraint, so copies and
+    users can be deleted or archived while their history stays, and the
+    table can be range-partitioned or archived by month on ``created_at``;
+    every index ends with ``created_at`` for per-user, per-book and
+    per-copy time-range scans.
+    """
+    created_at = models.DateTimeField(default=timezone.now, editable=False)
+    book_instance = models.ForeignKey(
+        BookInstance, on_delete=models.DO_NOTHING, db_constraint=False, related_name='loan_events',
+    )
+    book = models.ForeignKey(
+        Book, on_delete=models.DO_NOTHING, db_constraint=False, null=True, related_name='loan_events',
+    )
+    borrower = models.ForeignKey(
+        settings.AUTH_USER_MODEL, on_delete=models.DO_NOTHING, db_constraint=False,
+        null=True, blank=True, related_name='loan_events',
+    )
+    from_status = models.CharField(max_length=1, blank=True, choices=BookInstance.LOAN_STATUS)
+    to_status = models.CharField(max_length=1, choices=BookInstance.LOAN_STATUS)
+    due_back = models.DateField(null=True, blank=True)
+
+    objects = LoanEventQuerySet.as_manager()
+
+    class Meta:
+        ordering = ['-created_at']
+        indexes = [
+            models.Index(fields=['borrower', 'created_at'], name='loanevent_borrower_time_idx'),
+            models.Index(fields=['book', 'created_at'], name='loanevent_book_time_idx'),
+            models.Index(fields=['book_instance', 'created_at'], name='loanevent_copy_time_idx'),
+            models.Index(fields=['created_at'], name='loanevent_time_idx'),
+            # loans per month / per borrower in reports.py
+            models.Index(fields=['to_status', 'created_at'], name='loanevent_status_time_idx'),
+        ]
+
+    def __str__(self):
+        return f'{self.created_at:%Y-%m-%d %H:%M} {self.book_instance_id}: {self.from_status or "-"} -> {self.to_status}'
+
+    @classmethod
+    def for_copy(cls, book_instance, from_status):
+        return cls(
+            book_instance_id=book_instance.pk,
+            book_id=book_instance.book_id,
+            borrower_id=book_instance.borrower_id,
+            from_status=from_status,
+            to_status=book_instance.status,
+            due_back=book_instance.due_back,
+        )
+
+    def save(self, *args, **kwargs):
+        if not self._state.adding:
+            raise TypeError('LoanEvent rows are append-only.')
+        super().save(*args, **kwargs)
+
+    def delete(self, *args, **kwargs):
+        raise TypeError('LoanEvent rows are append-only.')
+
+
+class BookSimilarity(models.Model):
+    """Precomputed top-k "similar books" for each Book.
+
+    Rebuilt wholesale by ``manage.py build_recommendations``; the detail page
+    reads one book's neighbours through the (book, rank) unique index.
+    """
+    book = models.ForeignKey(Book, on_delete=models.CASCADE, related_name='similarities')
+    similar = models.ForeignKey(Book, on_delete=models.CASCADE, related_name='+')
+    score = models.FloatField()
+    rank = models.PositiveSmallIntegerField()
+
+    class Meta:
+        ordering = ['book', 'rank']
+        constraints = [
+            UniqueConstraint(fields=['book', 'rank'], name='booksimilarity_book_rank_uniq'),
+        ]
+
+    def __str__(self):
+        return f'{self.book_id} -> {self.similar_id} ({self.score:.3f})'
+
+
+class ArchivedBookInstance(models.Model):
+    """A retired BookInstance moved out of the hot table.
+
+    Rows are written by ``manage.py archive_bookinstances`` with the
+    copy's original id, and optionally its LoanEvent history as JSON.
+    Like LoanEvent, the foreign keys carry no database constraint.
+    """
+    id = models.UUIDField(primary_key=True)
+    book = models.ForeignKey(
+        Book, on_delete=models.DO_NOTHING, db_constraint=False, null=True, related_name='archived_copies',
+    )
+    copy_no = models.PositiveIntegerField('copy number', null=True, blank=True)
+    imprint = models.CharField(max_length=200)
+    booklang = models.ForeignKey(
+        BookLang, on_delete=models.DO_NOTHING, db_constraint=False, null=True, related_name='+',
+    )
+    status = models.CharField(max_length=1, choices=BookInstance.LOAN_STATUS)
+    due_back = models.DateField(null=True, blank=True)
+    archived_at = models.DateTimeField(default=timezone.now)
+    history = models.JSONField(
+        null=True, blank=True, encoder=DjangoJSONEncoder,
+        help_text='LoanEvents moved with the copy, oldest first',
+    )
+
+    class Meta:
+        ordering = ['book', 'copy_no']
+        indexes = [
+            models.Index(fields=['book', 'copy_no'], name='archivedcopy_book_idx'),
+        ]
+
+    def __str__(self):
+        return f'{self.id} ({self.get_status_display()}, archived {self.archived_at:%Y-%m-%d})'
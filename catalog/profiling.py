@@ -0,0 +1,173 @@
+"""Opt-in request profiling for production traffic.
+
+ProfilingMiddleware profiles a request when it is sampled, which happens
+with probability PROFILE_SAMPLE_RATE (0 by default).  A staff user can
+also ask for it by sending the PROFILE_HEADER header (``X-Profile``).
+Every other request costs one header lookup and one random() call.
+
+Two formats are available, from PROFILE_FORMAT or from the header value:
+
+* ``collapsed`` (the default): a sampling profiler.  A helper thread
+  records the request thread's stack every PROFILE_INTERVAL_MS and the
+  result is written as collapsed stacks (``frame;frame;frame count``),
+  the input format of flamegraph.pl and speedscope.  Overhead is one
+  sys._current_frames() call per interval, whatever the code does.
+* ``pstats``: cProfile.  It is deterministic and gives exact call
+  counts, but slows the request down noticeably; load the file with
+  ``pstats.Stats(path)``.
+
+Profiles are written to PROFILE_DIR and named after the time, URL name,
+method, duration and process id.  Only the newest PROFILE_MAX_FILES are
+kept.  Staff can list and download them at /admin/profiles/; responses
+to staff name the file in an X-Profile-Id header.
+"""
+import cProfile
+import datetime
+import os
+import random
+import re
+import sys
+import threading
+import time
+from collections import Counter
+from pathlib import Path
+
+from django.conf import settings
+
+FORMATS = {'collapsed': '.collapsed', 'pstats': '.pstats'}
+PROFILE_NAME = re.compile(
+    r'^(?P<time>\d{8}T\d{6}\.\d{6}Z)__(?P<view>[\w.-]+)__(?P<method>[A-Z]+)__(?P<ms>\d+)ms__(?P<pid>\d+)'
+    r'(?P<ext>\.collapsed|\.pstats)$'
+)
+
+
+class StackSampler(threading.Thread):
+    """Samples another thread's stack at a fixed interval into collapsed-stack counts."""
+
+    def __init__(self, thread_id, interval):
+        super().__init__(name='profile-sampler', daemon=True)
+        self.thread_id = thread_id
+        self.interval = interval
+        self.stacks = Counter()
+        self._done = threading.Event()
+        self._labels = {}
+
+    def _label(self, code):
+        label = self._labels.get(code)
+        if label is None:
+            filename = code.co_filename
+            for prefix in (str(settings.BASE_DIR) + os.sep, 'site-packages' + os.sep):
+                _, found, rest = filename.rpartition(prefix)
+                if found:
+                    filename = rest
+                    break
+            label = self._labels[code] = f'{code.co_name} ({filename}:{code.co_firstlineno})'
+        return label
+
+    def run(self):
+        while not self._done.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            stack = []
+            while frame is not None:
+                stack.append(self._label(frame.f_code))
+                frame = frame.f_back
+            if stack:
+                self.stacks[';'.join(reversed(stack))] += 1
+
+    def stop(self):
+        self._done.set()
+        self.join()
+
+
+def profile_dir():
+    return Path(settings.PROFILE_DIR)
+
+
+def _profile_path(request, started, elapsed, fmt):
+    match = getattr(request, 'resolver_match', None)
+    view = re.sub(r'[^\w.-]', '-', match.view_name if match else 'unmatched')
+    stamp = started.strftime('%Y%m%dT%H%M%S.%fZ')
+    name = f'{stamp}__{view}__{request.method}__{round(elapsed * 1000)}ms__{os.getpid()}{FORMATS[fmt]}'
+    return profile_dir() / name
+
+
+def _prune():
+    profiles = sorted(path for path in profile_dir().iterdir() if PROFILE_NAME.match(path.name))
+    for path in profiles[:max(0, len(profiles) - settings.PROFILE_MAX_FILES)]:
+        path.unlink(missing_ok=True)
+
+
+def list_profiles():
+    """Stored profiles, newest first, as dicts parsed from their file names."""
+    if not profile_dir().is_dir():
+        return []
+    profiles = []
+    for path in profile_dir().iterdir():
+        match = PROFILE_NAME.match(path.name)
+        if match:
+            profiles.append({
+                'name': path.name,
+                'time': datetime.datetime.strptime(match['time'], '%Y%m%dT%H%M%S.%fZ').replace(
+                    tzinfo=datetime.timezone.utc,
+                ),
+                'view': match['view'],
+                'method': match['method'],
+                'duration_ms': int(match['ms']),
+                'pid': int(match['pid']),
+                'format': match['ext'][1:],
+                'size': path.stat().st_size,
+            })
+    return sorted(profiles, key=lambda profile: profile['name'], reverse=True)
+
+
+def profile_path(name):
+    """Path of a stored profile by file name, or None; names are never used as paths unchecked."""
+    if not PROFILE_NAME.match(name):
+        return None
+    path = profile_dir() / name
+    return path if path.is_file() else None
+
+
+class ProfilingMiddleware:
+    """Install after AuthenticationMiddleware, so the header can be limited to staff."""
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.header = 'HTTP_' + settings.PROFILE_HEADER.upper().replace('-', '_')
+
+    def __call__(self, request):
+        requested = request.META.get(self.header)
+        if requested is not None and request.user.is_staff:
+            fmt = requested if requested in FORMATS else settings.PROFILE_FORMAT
+        elif settings.PROFILE_SAMPLE_RATE and random.random() < settings.PROFILE_SAMPLE_RATE:
+            fmt = settings.PROFILE_FORMAT
+        else:
+            return self.get_response(request)
+        return self.profile(request, fmt)
+
+    def profile(self, request, fmt):
+        started = datetime.datetime.now(datetime.timezone.utc)
+        clock = time.perf_counter()
+        if fmt == 'pstats':
+            profiler = cProfile.Profile()
+            response = profiler.runcall(self.get_response, request)
+        else:
+            sampler = StackSampler(threading.get_ident(), settings.PROFILE_INTERVAL_MS / 1000)
+            sampler.start()
+            try:
+                response = self.get_response(request)
+            finally:
+                sampler.stop()
+        elapsed = time.perf_counter() - clock
+
+        path = _profile_path(request, started, elapsed, fmt)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        if fmt == 'pstats':
+            profiler.dump_stats(path)
+        else:
+            path.write_text(''.join(f'{stack} {count}\n' for stack, count in sampler.stacks.most_common()))
+        _prune()
+        if request.user.is_staff:
+            # file names are internal; only staff can download them anyway
+            response['X-Profile-Id'] = path.name
+        return response
@@ -0,0 +1,132 @@
+"""Librarian reports, each computed by a single GROUP BY query.
+
+A report is a title, column headings and a function returning the rows as
+tuples.  Results are cached under the catalog version (see cache.py), so
+they are recomputed only after a write to the catalog tables -- every
+loan status change bumps it, and LoanEvent is written in the same
+transaction.
+"""
+import datetime
+from dataclasses import dataclass
+from typing import Callable
+
+from django.db.models import Case, CharField, Count, DateTimeField, OuterRef, Q, Subquery, Value, When
+from django.db.models.functions import TruncMonth
+from django.utils import timezone
+
+from .cache import get_or_compute
+from .models import BookInstance, BookLang, Genre, LoanEvent
+
+REPORT_CACHE_TIMEOUT = 60 * 60
+TOP_BORROWERS_LIMIT = 50
+
+# (label, minimum age in days) from the youngest bucket to the oldest
+MAINTENANCE_AGE_BUCKETS = (
+    ('< 7 days', 0),
+    ('7-30 days', 7),
+    ('30-90 days', 30),
+    ('90-365 days', 90),
+    ('> 1 year', 365),
+)
+
+
+@dataclass(frozen=True)
+class Report:
+    slug: str
+    title: str
+    columns: tuple
+    rows: Callable[[], list]
+
+
+def loans_by_genre():
+    return list(
+        Genre.objects.annotate(loans=Count('book__loan_events', filter=Q(book__loan_events__to_status='o')))
+        .order_by('-loans', 'name')
+        .values_list('name', 'loans')
+    )
+
+
+def loans_by_language():
+    labels = dict(BookLang.LANGUAGE)
+    rows = (
+        LoanEvent.objects.loans()
+        .order_by()
+        .values_list('book_instance__booklang__booklang')
+        .annotate(loans=Count('pk'))
+        .order_by('-loans')
+    )
+    return [(labels.get(code, code or '—'), loans) for code, loans in rows]
+
+
+def loans_by_month():
+    rows = (
+        LoanEvent.objects.loans()
+        .annotate(month=TruncMonth('created_at'))
+        .order_by()
+        .values_list('month')
+        .annotate(loans=Count('pk'))
+        .order_by('month')
+    )
+    return [(f'{month:%Y-%m}', loans) for month, loans in rows]
+
+
+def maintenance_by_age():
+    """Copies in maintenance, bucketed by how long ago they entered it.
+
+    The entry time is the latest LoanEvent into 'm' for the copy, read
+    through the (book_instance, created_at) index.  Copies with no such
+    event (created before the log existed) are reported as unknown.
+    """
+    now = timezone.now()
+    entered = Subquery(
+        LoanEvent.objects.filter(book_instance=OuterRef('pk'), to_status='m')
+        .order_by('-created_at')
+        .values('created_at')[:1],
+        output_field=DateTimeField(),
+    )
+    bucket = Case(
+        *[
+            When(entered_at__lte=now - datetime.timedelta(days=days), then=Value(label))
+            for label, days in reversed(MAINTENANCE_AGE_BUCKETS)
+        ],
+        default=Value('unknown'),
+        output_field=CharField(),
+    )
+    counts = dict(
+        BookInstance.objects.filter(status='m')
+        .annotate(entered_at=entered)
+        .annotate(bucket=bucket)
+        .order_by()
+        .values_list('bucket')
+        .annotate(copies=Count('pk'))
+    )
+    labels = [label for label, _ in MAINTENANCE_AGE_BUCKETS] + ['unknown']
+    return [(label, counts.get(label, 0)) for label in labels]
+
+
+def top_borrowers():
+    return list(
+        LoanEvent.objects.loans()
+        .filter(borrower__isnull=False)
+        .order_by()
+        .values_list('borrower__username')
+        .annotate(loans=Count('pk'))
+        .order_by('-loans', 'borrower__username')[:TOP_BORROWERS_LIMIT]
+    )
+
+
+REPORTS = {
+    report.slug: report
+    for report in (
+        Report('loans-by-genre', 'Loans per genre', ('Genre', 'Loans'), loans_by_genre),
+        Report('loans-by-language', 'Loans per language', ('Language', 'Loans'), loans_by_language),
+        Report('loans-by-month', 'Loans per month', ('Month', 'Loans'), loans_by_month),
+        Report('maintenance-by-age', 'Copies in maintenance by age', ('Time in maintenance', 'Copies'), maintenance_by_age),
+        Report('top-borrowers', 'Top borrowers', ('Borrower', 'Loans'), top_borrowers),
+    )
+}
+
+
+def report_rows(report):
+    """Return the report's rows, from the cache when the catalog has not changed."""
+    return get_or_compute(f'report:{report.slug}', report.rows, REPORT_CACHE_TIMEOUT)
@@ -0,0 +1,127 @@
+"""Title search for the index page: throttling and an in-process result cache.
+
+Throttling is a token bucket per client IP and per signed-in user, kept in
+the Django cache so all workers sharing that cache share the budget.
+Behind TRUSTED_PROXY_COUNT proxies the client IP is read from
+X-Forwarded-For, otherwise every client would share the proxy's bucket.  The
+read-modify-write is not atomic, so concurrent requests can occasionally
+spend the same token; that is fine for shedding scripted load.
+
+Results are cached in each process in a small LRU with a TTL, keyed on the
+normalized term and the catalog version, so any write to Book (or the
+other catalog tables) makes the old entries unreachable.
+"""
+import threading
+import time
+from collections import OrderedDict
+
+from django.conf import settings
+from django.core.cache import cache
+
+from .cache import catalog_version
+from .models import Book
+
+MAX_TERM_LENGTH = 100
+
+
+def normalize_term(term):
+    """Lower-case, trim and collapse whitespace so equivalent searches share a cache entry."""
+    return ' '.join(term.split()).lower()[:MAX_TERM_LENGTH]
+
+
+def client_ip(request):
+    """The client address, taken from the right end of X-Forwarded-For behind trusted proxies."""
+    proxies = settings.TRUSTED_PROXY_COUNT
+    forwarded = request.META.get('HTTP_X_FORWARDED_FOR')
+    if proxies and forwarded:
+        # each proxy appends the address it saw; entries further left are client-supplied
+        addresses = [address.strip() for address in forwarded.split(',')]
+        return addresses[max(0, len(addresses) - proxies)]
+    return request.META.get('REMOTE_ADDR', '')
+
+
+def _take_token(key, rate, burst, now):
+    """Spend one token from the bucket at `key`; return seconds to wait, or 0 if allowed."""
+    tokens, updated = cache.get(key, (burst, now))
+    tokens = min(burst, tokens + (now - updated) * rate)
+    if tokens < 1:
+        cache.set(key, (tokens, now), int(burst / rate) + 1)
+        return (1 - tokens) / rate
+    cache.set(key, (tokens - 1, now), int(burst / rate) + 1)
+    return 0
+
+
+def throttle_search(request):
+    """Return the seconds the client must wait before searching again, or 0."""
+    rate, burst = settings.SEARCH_THROTTLE_RATE, settings.SEARCH_THROTTLE_BURST
+    now = time.time()
+    buckets = [f'search:throttle:ip:{client_ip(request)}']
+    if request.user.is_authenticated:
+        buckets.append(f'search:throttle:user:{request.user.pk}')
+    return max(_take_token(key, rate, burst, now) for key in buckets)
+
+
+class ResultCache:
+    """Thread-safe LRU mapping with a per-entry TTL and hit/miss counters."""
+
+    def __init__(self, max_entries, ttl):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = self.misses = self.evictions = 0
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or entry[0] < time.monotonic():
+                if entry is not None:
+                    del self._entries[key]
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[1]
+
+    def set(self, key, value):
+        with self._lock:
+            self._entries[key] = (time.monotonic() + self.ttl, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self.hits = self.misses = self.evictions = 0
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'entries': len(self._entries),
+                'max_entries': self.max_entries,
+                'hits': self.hits,
+                'misses': self.misses,
+                'evictions': self.evictions,
+                'hit_rate': self.hits / lookups if lookups else 0.0,
+            }
+
+
+results = ResultCache(settings.SEARCH_CACHE_MAX_ENTRIES, settings.SEARCH_CACHE_TTL)
+
+
+def search_books(term):
+    """Books whose title contains `term` (already normalized), at most SEARCH_RESULT_LIMIT."""
+    key = (catalog_version(), term)
+    books = results.get(key)
+    if books is None:
+        books = list(
+            Book.objects.filter(title__icontains=term)
+            .select_related('author')
+            .prefetch_related('genre')
+            .order_by('title', 'pk')[:settings.SEARCH_RESULT_LIMIT]
+        )
+        results.set(key, books)
+    return books
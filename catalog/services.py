@@ -0,0 +1,142 @@
+"""Set-based write operations on the catalog."""
+from django.db import transaction
+from django.db.models import Q
+
+from . import typeahead
+from .cache import bump_catalog_version
+from .models import (
+    ArchivedBookInstance, Author, Book, BookInstance, BookSimilarity, LoanEvent, refresh_book_availability,
+)
+
+DELETED = 'deleted'
+BLOCKED = 'blocked'
+MISSING = 'missing'
+UNCHANGED = object()
+
+
+def _bulk_delete(model, ids, blocking_queryset, blocking_field, before_delete=None, chunk_size=1000):
+    """Delete the rows of `model` that nothing RESTRICTs, in chunks, in one transaction.
+
+    For each chunk one query finds the blocked ids, then the remaining rows
+    are removed with plain ``DELETE ... WHERE id IN (...)`` statements.
+    Returns ``{id: 'deleted' | 'blocked' | 'missing'}``.
+    """
+    ids = sorted(set(ids))
+    report = {}
+    with transaction.atomic():
+        for start in range(0, len(ids), chunk_size):
+            chunk = ids[start:start + chunk_size]
+            existing = set(model.objects.filter(pk__in=chunk).values_list('pk', flat=True))
+            blocked = set(
+                blocking_queryset.filter(**{f'{blocking_field}__in': existing})
+                .order_by()
+                .values_list(blocking_field, flat=True)
+                .distinct()
+            )
+            deletable = existing - blocked
+            if deletable:
+                if before_delete:
+                    before_delete(deletable)
+                # _raw_delete issues a single DELETE without loading instances;
+                # RESTRICT references were ruled out above.
+                queryset = model.objects.filter(pk__in=deletable)
+                queryset._raw_delete(queryset.db)
+            report.update(
+                (pk, DELETED if pk in deletable else BLOCKED if pk in blocked else MISSING)
+                for pk in chunk
+            )
+    if DELETED in report.values():
+        transaction.on_commit(bump_catalog_version)
+        kind = {Book: typeahead.BOOK, Author: typeahead.AUTHOR}.get(model)
+        if kind is not None:
+            typeahead.removed(kind, [pk for pk, outcome in report.items() if outcome == DELETED])
+    return report
+
+
+def _delete_book_dependents(book_ids):
+    # _raw_delete skips Django's CASCADE, so the CASCADE rows go first.
+    Book.genre.through.objects.filter(book_id__in=book_ids).delete()
+    similarities = BookSimilarity.objects.filter(Q(book_id__in=book_ids) | Q(similar_id__in=book_ids))
+    similarities._raw_delete(similarities.db)
+
+
+def bulk_delete_books(book_ids, chunk_size=1000):
+    """Delete books that have no copies; books with copies are reported as blocked."""
+    return _bulk_delete(
+        Book, book_ids, BookInstance.objects.all(), 'book_id',
+        before_delete=_delete_book_dependents, chunk_size=chunk_size,
+    )
+
+
+def bulk_delete_authors(author_ids, chunk_size=1000):
+    """Delete authors that have no books; authors with books are reported as blocked."""
+    return _bulk_delete(Author, author_ids, Book.objects.all(), 'author_id', chunk_size=chunk_size)
+
+
+def bulk_update_copies(copy_ids, status=UNCHANGED, due_back=UNCHANGED, borrower=UNCHANGED, chunk_size=1000):
+    """Apply status/due_back/borrower to many copies with one UPDATE per chunk.
+
+    Goes through BookInstanceQuerySet.update, so the Book availability
+    columns are refreshed and LoanEvents written in the same transaction.
+    Returns the number of copies updated.
+    """
+    changes = {
+        name: value
+        for name, value in (('status', status), ('due_back', due_back), ('borrower', borrower))
+        if value is not UNCHANGED
+    }
+    copy_ids = list(dict.fromkeys(copy_ids))
+    if not changes or not copy_ids:
+        return 0
+    updated = 0
+    with transaction.atomic():
+        for start in range(0, len(copy_ids), chunk_size):
+            updated += BookInstance.objects.filter(pk__in=copy_ids[start:start + chunk_size]).update(**changes)
+    return updated
+
+
+ARCHIVED_COPY_FIELDS = ('pk', 'book_id', 'copy_no', 'imprint', 'booklang_id', 'status', 'due_back')
+HISTORY_FIELDS = ('book_instance_id', 'created_at', 'from_status', 'to_status', 'borrower_id', 'due_back')
+
+
+def archive_copies(queryset, with_history=False, chunk_size=1000):
+    """Move the copies selected by `queryset` into ArchivedBookInstance.
+
+    Works through the copies in primary-key order, one transaction per
+    chunk: lock the chunk, copy it (and with `with_history` its
+    LoanEvents) into the archive, delete the originals with plain
+    DELETEs and refresh the affected books' availability.  Without
+    `with_history` the LoanEvents stay in the log.  Returns the number of
+    copies archived.
+    """
+    archived = 0
+    last_pk = None
+    while True:
+        with transaction.atomic():
+            chunk = queryset.order_by('pk').select_for_update()
+            if last_pk is not None:
+                chunk = chunk.filter(pk__gt=last_pk)
+            rows = list(chunk.values_list(*ARCHIVED_COPY_FIELDS)[:chunk_size])
+            if not rows:
+                break
+            ids = [row[0] for row in rows]
+            histories = {}
+            if with_history:
+                events = LoanEvent.objects.filter(book_instance_id__in=ids)
+                for event in events.order_by('created_at', 'pk').values(*HISTORY_FIELDS):
+                    histories.setdefault(event.pop('book_instance_id'), []).append(event)
+                # LoanEvent refuses delete(); the rows now live in `history`.
+                events._raw_delete(events.db)
+            ArchivedBookInstance.objects.bulk_create([
+                ArchivedBookInstance(
+                    id=pk, book_id=book_id, copy_no=copy_no, imprint=imprint, booklang_id=booklang_id,
+                    status=status, due_back=due_back, history=histories.get(pk, []) if with_history else None,
+                )
+                for pk, book_id, copy_no, imprint, booklang_id, status, due_back in rows
+            ])
+            originals = BookInstance.objects.filter(pk__in=ids)
+            originals._raw_delete(originals.db)
+            refresh_book_availability(row[1] for row in rows)
+        archived += len(rows)
+        last_pk = ids[-1]
+    return archived
@@ -0,0 +1,75 @@
+from django.contrib.auth import get_user_model
+from django.contrib.auth.models import Group, Permission
+from django.db import transaction
+from django.db.models.signals import m2m_changed, post_delete, post_save
+
+from . import typeahead
+from .backends import bump_auth_version, invalidate_users
+from .cache import bump_catalog_version
+from .models import Author, Book, BookInstance, BookLang, Genre
+
+
+def catalog_changed(sender, using=None, **kwargs):
+    transaction.on_commit(bump_catalog_version, using=using)
+
+
+def book_saved(sender, instance, update_fields=None, using=None, **kwargs):
+    if update_fields is None or 'title' in update_fields:
+        typeahead.book_changed(instance, using=using)
+
+
+def author_saved(sender, instance, update_fields=None, using=None, **kwargs):
+    if update_fields is None or {'first_name', 'last_name'} & set(update_fields):
+        typeahead.author_changed(instance, using=using)
+
+
+def book_deleted(sender, instance, using=None, **kwargs):
+    typeahead.removed(typeahead.BOOK, [instance.pk], using=using)
+
+
+def author_deleted(sender, instance, using=None, **kwargs):
+    typeahead.removed(typeahead.AUTHOR, [instance.pk], using=using)
+
+
+def user_changed(sender, instance, **kwargs):
+    invalidate_users([instance.pk])
+
+
+def user_relations_changed(sender, instance, action, reverse, pk_set, **kwargs):
+    if not action.startswith('post_'):
+        return
+    if not reverse:
+        invalidate_users([instance.pk])
+    elif pk_set is not None:
+        invalidate_users(pk_set)
+    else:
+        # group.user_set.clear() does not say which users it removed
+        bump_auth_version()
+
+
+def auth_changed(sender, **kwargs):
+    bump_auth_version()
+
+
+def connect_signals():
+    for model in (Author, Book, BookInstance, BookLang, Genre):
+        post_save.connect(catalog_changed, sender=model, dispatch_uid=f'catalog_changed_save_{model.__name__}')
+        post_delete.connect(catalog_changed, sender=model, dispatch_uid=f'catalog_changed_delete_{model.__name__}')
+    m2m_changed.connect(catalog_changed, sender=Book.genre.through, dispatch_uid='catalog_changed_book_genre')
+
+    post_save.connect(book_saved, sender=Book, dispatch_uid='typeahead_book_saved')
+    post_save.connect(author_saved, sender=Author, dispatch_uid='typeahead_author_saved')
+    post_delete.connect(book_deleted, sender=Book, dispatch_uid='typeahead_book_deleted')
+    post_delete.connect(author_deleted, sender=Author, dispatch_uid='typeahead_author_deleted')
+
+    User = get_user_model()
+    post_save.connect(user_changed, sender=User, dispatch_uid='auth_user_changed_save')
+    post_delete.connect(user_changed, sender=User, dispatch_uid='auth_user_changed_delete')
+    m2m_changed.connect(user_relations_changed, sender=User.groups.through, dispatch_uid='auth_user_groups')
+    m2m_changed.connect(
+        user_relations_changed, sender=User.user_permissions.through, dispatch_uid='auth_user_permissions',
+    )
+    m2m_changed.connect(auth_changed, sender=Group.permissions.through, dispatch_uid='auth_group_permissions')
+    for model in (Group, Permission):
+        post_save.connect(auth_changed, sender=model, dispatch_uid=f'auth_changed_save_{model.__name__}')
+        post_delete.connect(auth_changed, sender=model, dispatch_uid=f'auth_changed_delete_{model.__name__}')
@@ -0,0 +1,176 @@
+"""Slow-query log: statements above a threshold, attributed to the view that ran them.
+
+SlowQueryMiddleware wraps every request in a database execute wrapper.
+A statement that takes at least SLOW_QUERY_THRESHOLD_MS is written as one
+JSON line to SLOW_QUERY_LOG, with the URL name, the user's role, a
+fingerprint of the normalized SQL and the parameters reduced to their
+types.  Parameter values are never written.  With SLOW_QUERY_EXPLAIN the
+plan of slow SELECTs is captured too.  This uses plain EXPLAIN, which
+does not run the statement again.
+
+The file is rotated at SLOW_QUERY_LOG_MAX_BYTES, keeping
+SLOW_QUERY_LOG_BACKUPS old files.  Writes and rotation happen under an
+exclusive lock on a side file, so gunicorn workers can share one log.
+``manage.py slow_queries_report`` summarizes it.
+"""
+import datetime
+import hashlib
+import json
+import os
+import re
+import threading
+import time
+from pathlib import Path
+
+from django.conf import settings
+from django.db import DatabaseError, connection, transaction
+
+try:
+    import fcntl
+except ImportError:   # Windows: no cross-process lock, rotation may race
+    fcntl = None
+
+MAX_SQL_LENGTH = 4000
+
+_STRING = re.compile(r"'(?:[^']|'')*'")
+_NUMBER = re.compile(r'\b\d+(?:\.\d+)?\b')
+_PLACEHOLDER = re.compile(r'%s|\?')
+_IN_LIST = re.compile(r'\bIN\s*\(\s*\?(?:\s*,\s*\?)*\s*\)', re.IGNORECASE)
+_VALUES_LIST = re.compile(r'\bVALUES\s*\(.*?\)(?:\s*,\s*\(.*?\))*', re.IGNORECASE | re.DOTALL)
+_SPACE = re.compile(r'\s+')
+
+_local = threading.local()
+_write_lock = threading.Lock()
+
+
+def normalize_sql(sql):
+    """SQL with literals and placeholders replaced by ``?`` and lists collapsed."""
+    sql = _STRING.sub('?', sql)
+    sql = _NUMBER.sub('?', sql)
+    sql = _PLACEHOLDER.sub('?', sql)
+    sql = _IN_LIST.sub('IN (...)', sql)
+    sql = _VALUES_LIST.sub('VALUES (...)', sql)
+    return _SPACE.sub(' ', sql).strip()
+
+
+def fingerprint(normalized_sql):
+    return hashlib.sha1(normalized_sql.encode()).hexdigest()[:16]
+
+
+def redact(param):
+    if param is None or isinstance(param, bool):
+        return param
+    if isinstance(param, (str, bytes)):
+        return f'<{type(param).__name__}:{len(param)}>'
+    if isinstance(param, (list, tuple)):
+        return [redact(item) for item in param]
+    if isinstance(param, dict):
+        return {key: redact(value) for key, value in param.items()}
+    return f'<{type(param).__name__}>'
+
+
+def user_role(request):
+    user = getattr(request, 'user', None)
+    if user is None:
+        return 'unknown'
+    if not user.is_authenticated:
+        return 'anonymous'
+    if user.is_superuser:
+        return 'superuser'
+    # groups are prefetched by CachedModelBackend, so this is usually free
+    if any(group.name == 'Librarians' for group in user.groups.all()):
+        return 'librarian'
+    return 'staff' if user.is_staff else 'member'
+
+
+def explain(db, sql, params):
+    try:
+        with transaction.atomic(using=db.alias), db.cursor() as cursor:
+            cursor.execute(f'{db.ops.explain_query_prefix()} {sql}', params)
+            return '\n'.join(' '.join(str(column) for column in row) for row in cursor.fetchall())
+    except DatabaseError as exc:
+        return f'EXPLAIN failed: {exc}'
+
+
+def _rotate(path):
+    for index in range(settings.SLOW_QUERY_LOG_BACKUPS - 1, 0, -1):
+        older = path.with_name(f'{path.name}.{index}')
+        if older.exists():
+            older.replace(path.with_name(f'{path.name}.{index + 1}'))
+    if settings.SLOW_QUERY_LOG_BACKUPS:
+        path.replace(path.with_name(f'{path.name}.1'))
+    else:
+        path.unlink()
+
+
+def write_record(record):
+    path = Path(settings.SLOW_QUERY_LOG)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    line = json.dumps(record, default=str) + '\n'
+    with _write_lock, open(path.with_name(f'{path.name}.lock'), 'w') as lock:
+        if fcntl:
+            fcntl.flock(lock, fcntl.LOCK_EX)
+        if path.exists() and path.stat().st_size + len(line) > settings.SLOW_QUERY_LOG_MAX_BYTES:
+            _rotate(path)
+        with open(path, 'a', encoding='utf-8') as log:
+            log.write(line)
+
+
+class SlowQueryRecorder:
+    """Execute wrapper that logs statements slower than the threshold."""
+
+    def __init__(self, request):
+        self.request = request
+
+    def __call__(self, execute, sql, params, many, context):
+        if getattr(_local, 'active', False):
+            # our own EXPLAIN or role lookup
+            return execute(sql, params, many, context)
+        failed = True
+        started = time.perf_counter()
+        try:
+            result = execute(sql, params, many, context)
+            failed = False
+            return result
+        finally:
+            elapsed_ms = (time.perf_counter() - started) * 1000
+            if elapsed_ms >= settings.SLOW_QUERY_THRESHOLD_MS:
+                _local.active = True
+                try:
+                    self.record(sql, params, many, context, elapsed_ms, failed)
+                finally:
+                    _local.active = False
+
+    def record(self, sql, params, many, context, elapsed_ms, failed=False):
+        request = self.request
+        match = getattr(request, 'resolver_match', None)
+        normalized = normalize_sql(sql)
+        record = {
+            'time': datetime.datetime.now(datetime.timezone.utc).isoformat(timespec='milliseconds'),
+            'duration_ms': round(elapsed_ms, 2),
+            'view': match.view_name if match else 'unmatched',
+            'method': request.method,
+            'path': request.path,
+            'role': user_role(request),
+            'fingerprint': fingerprint(normalized),
+            'sql': normalized[:MAX_SQL_LENGTH],
+            'params': '<executemany>' if many else redact(params if params is not None else []),
+            'database': context['connection'].alias,
+            'pid': os.getpid(),
+        }
+        if failed:
+            record['failed'] = True
+        elif settings.SLOW_QUERY_EXPLAIN and not many and sql.lstrip().upper().startswith('SELECT'):
+            record['plan'] = explain(context['connection'], sql, params)
+        write_record(record)
+
+
+class SlowQueryMiddleware:
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        if settings.SLOW_QUERY_THRESHOLD_MS is None:
+            return self.get_response(request)
+        with connection.execute_wrapper(SlowQueryRecorder(request)):
+            return self.get_response(request)
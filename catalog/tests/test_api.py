@@ -0,0 +1,127 @@
+import datetime
+
+from django.contrib.auth import get_user_model
+from django.test import TestCase
+from django.urls import reverse
+
+from catalog.isbn import canonical_isbn
+from catalog.models import Author, Book, BookInstance, BookLang, Genre
+
+
+User = get_user_model()
+
+
+class CatalogApiTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(username='reader', password='Read&Pwd123')
+        cls.author = Author.objects.create(first_name='Frank', last_name='Herbert')
+        cls.genre = Genre.objects.create(name='Science Fiction')
+        language = BookLang.objects.create(booklang='en')
+        cls.books = []
+        for index in range(5):
+            book = Book.objects.create(
+                title=f'Dune {index}', summary='-', isbn=f'978044101359{index}', author=cls.author,
+            )
+            book.genre.add(cls.genre)
+            cls.books.append(book)
+        BookInstance.objects.create(book=cls.books[0], imprint='Ace', status='a', booklang=language)
+        BookInstance.objects.create(
+            book=cls.books[0], imprint='Ace', status='o', booklang=language, borrower=cls.user,
+            due_back=datetime.date.today() + datetime.timedelta(days=7),
+        )
+
+    def test_sparse_fields(self):
+        response = self.client.get(reverse('api-books'), {'fields': 'title,copies_available'})
+        self.assertEqual(response.status_code, 200)
+        first = response.json()['results'][0]
+        self.assertEqual(first, {'title': 'Dune 0', 'copies_available': 1})
+
+    def test_filters_ignore_non_ascii_digits(self):
+        response = self.client.get(reverse('api-books'), {'author': '\u00b2', 'fields': 'id'})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(response.json()['results']), 5)
+        response = self.client.get(reverse('api-books'), {'author': str(self.author.pk + 1), 'fields': 'id'})
+        self.assertEqual(response.json()['results'], [])
+
+    def test_unknown_field_is_rejected(self):
+        response = self.client.get(reverse('api-books'), {'fields': 'title,password'})
+        self.assertEqual(response.status_code, 400)
+
+    def test_cursor_pagination_walks_all_rows(self):
+        titles = []
+        url = reverse('api-books') + '?limit=2&fields=title'
+        pages = 0
+        while url:
+            payload = self.client.get(url).json()
+            titles.extend(row['title'] for row in payload['results'])
+            url = payload['next']
+            pages += 1
+        self.assertEqual(pages, 3)
+        self.assertEqual(titles, [f'Dune {index}' for index in range(5)])
+
+    def test_list_runs_one_query(self):
+        with self.assertNumQueries(1):
+            self.client.get(reverse('api-books'), {'fields': 'title,author_last_name'})
+
+    def test_etag_returns_not_modified(self):
+        response = self.client.get(reverse('api-genres'))
+        etag = response['ETag']
+        response = self.client.get(reverse('api-genres'), HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+
+        Genre.objects.create(name='Fantasy')
+        response = self.client.get(reverse('api-genres'), HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+
+    def test_book_detail_and_copies(self):
+        book = self.books[0]
+        payload = self.client.get(reverse('api-book-detail', args=[book.pk])).json()
+        self.assertEqual(payload['genres'], [self.genre.pk])
+        self.assertEqual(payload['copies_total'], 2)
+
+        copies = self.client.get(reverse('api-book-copies', args=[book.pk]), {'status': 'a'}).json()
+        self.assertEqual([copy['status'] for copy in copies['results']], ['a'])
+        self.assertEqual(self.client.get(reverse('api-book-copies', args=[999])).status_code, 404)
+
+    def test_my_loans_requires_login(self):
+        self.assertEqual(self.client.get(reverse('api-my-loans')).status_code, 401)
+        self.client.login(username='reader', password='Read&Pwd123')
+        payload = self.client.get(reverse('api-my-loans')).json()
+        self.assertEqual([loan['title'] for loan in payload['results']], ['Dune 0'])
+
+
+class IsbnLookupApiTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.book = Book.objects.create(title='Reference', summary='-', isbn='0-306-40615-2')
+
+    def test_isbn_stored_canonical(self):
+        self.book.refresh_from_db()
+        self.assertEqual(self.book.isbn, '9780306406157')
+        self.assertEqual(Book.objects.get(isbn='978-0-306-40615-7'), self.book)
+
+    def test_batch_lookup_resolves_any_spelling_in_one_query(self):
+        with self.assertNumQueries(1):
+            response = self.client.post(
+                reverse('api-isbn-lookup'),
+                data={'isbns': ['0306406152', '978-0-306-40615-7', '9780141439587', 'nope']},
+                content_type='application/json',
+            )
+        payload = response.json()
+        self.assertEqual(payload['results']['0306406152']['id'], self.book.pk)
+        self.assertEqual(payload['results']['978-0-306-40615-7']['title'], 'Reference')
+        self.assertIsNone(payload['results']['9780141439587'])
+        self.assertEqual(payload['invalid'], ['nope'])
+
+    def test_get_lookup(self):
+        response = self.client.get(reverse('api-isbn-lookup'), {'isbn': '0-306-40615-2'})
+        self.assertEqual(response.json()['results']['0-306-40615-2']['copies_total'], 0)
+
+    def test_non_ascii_digits_are_invalid(self):
+        arabic = '\u0669\u0667\u0668\u0660\u0664\u0664\u0661\u0660\u0661\u0663\u0665\u0669\u0663'
+        response = self.client.get(reverse('api-isbn-lookup'), {'isbn': arabic})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['invalid'], [arabic])
+        with self.assertRaises(ValueError):
+            canonical_isbn(arabic)
@@ -0,0 +1,77 @@
+from io import StringIO
+
+from django.contrib.auth import get_user_model
+from django.contrib.auth.models import Group, Permission
+from django.core.cache import cache
+from django.core.management import call_command
+from django.test import TestCase
+
+from catalog.backends import AUTH_VERSION_KEY, CachedModelBackend, bump_auth_version
+
+User = get_user_model()
+
+
+class CachedModelBackendTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(username='reader', password='Reader&Pwd123')
+        cls.group = Group.objects.create(name='Librarians')
+        cls.add_book = Permission.objects.get(codename='add_book')
+
+    def setUp(self):
+        cache.clear()
+        self.backend = CachedModelBackend()
+
+    def test_user_groups_and_permissions_come_from_the_cache(self):
+        self.user.groups.add(self.group)
+        self.backend.get_user(self.user.pk)
+        with self.assertNumQueries(0):
+            user = self.backend.get_user(self.user.pk)
+            self.assertEqual(list(user.groups.all()), [self.group])
+            self.assertFalse(user.has_perm('catalog.add_book'))
+
+    def test_invalidated_when_the_user_changes(self):
+        self.backend.get_user(self.user.pk)
+        self.user.set_password('Changed&Pwd456')
+        self.user.save()
+        self.assertTrue(self.backend.get_user(self.user.pk).check_password('Changed&Pwd456'))
+
+        self.user.is_active = False
+        self.user.save()
+        self.assertIsNone(self.backend.get_user(self.user.pk))
+
+    def test_invalidated_when_groups_or_permissions_change(self):
+        self.backend.get_user(self.user.pk)
+        self.group.user_set.add(self.user)
+        self.assertEqual(list(self.backend.get_user(self.user.pk).groups.all()), [self.group])
+
+        self.group.permissions.add(self.add_book)
+        self.assertTrue(self.backend.get_user(self.user.pk).has_perm('catalog.add_book'))
+
+        self.group.user_set.clear()
+        self.assertFalse(self.backend.get_user(self.user.pk).has_perm('catalog.add_book'))
+
+        self.user.user_permissions.add(self.add_book)
+        self.assertTrue(self.backend.get_user(self.user.pk).has_perm('catalog.add_book'))
+
+    def test_bump_after_the_version_was_evicted(self):
+        self.backend.get_user(self.user.pk)
+        cache.delete(AUTH_VERSION_KEY)
+        # no signal: only the version bump can hide the cached user
+        User.objects.filter(pk=self.user.pk).update(is_active=False)
+        bump_auth_version()
+        self.assertIsNone(self.backend.get_user(self.user.pk))
+
+    def test_missing_user(self):
+        self.assertIsNone(self.backend.get_user(self.user.pk + 1))
+
+
+class BenchAuthQueriesTest(TestCase):
+    def test_cached_backend_saves_queries(self):
+        out = StringIO()
+        call_command('bench_auth_queries', requests=1, stdout=out)
+        lines = out.getvalue().splitlines()
+        header = lines[1].split()
+        mean = [float(value) for value in lines[-2].split()[2:]]
+        self.assertLess(mean[header.index('db/cached') - 1], mean[header.index('db/model') - 1])
+        self.assertNotIn('bench-auth-librarian', User.objects.values_list('username', flat=True))
@@ -0,0 +1,120 @@
+import threading
+import time
+from unittest import mock
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.test import TestCase, override_settings
+from django.urls import reverse
+
+from catalog import cache as catalog_cache
+from catalog.cache import (
+    bump_catalog_version, cache_stats, cached_queryset, catalog_key, get_or_compute, reset_cache_stats,
+)
+from catalog.models import Genre
+
+
+class GetOrComputeTest(TestCase):
+    def setUp(self):
+        cache.clear()
+        reset_cache_stats()
+
+    def test_caches_until_the_catalog_changes(self):
+        compute = mock.Mock(side_effect=[1, 2])
+        self.assertEqual(get_or_compute('answer', compute), 1)
+        self.assertEqual(get_or_compute('answer', compute), 1)
+        bump_catalog_version()
+        self.assertEqual(get_or_compute('answer', compute), 2)
+        self.assertEqual(compute.call_count, 2)
+        self.assertEqual((cache_stats()['hits'], cache_stats()['misses']), (1, 2))
+
+    def test_bump_does_not_rely_on_an_atomic_incr(self):
+        before = catalog_key('x')
+        # on the file and db backends incr is a get-and-set, so concurrent bumps could write the same number
+        with mock.patch.object(cache, 'incr', side_effect=AssertionError('incr is not atomic everywhere')):
+            bump_catalog_version()
+            first = catalog_key('x')
+            bump_catalog_version()
+        self.assertEqual(len({before, first, catalog_key('x')}), 3)
+
+    def test_evicted_version_does_not_restart_at_a_used_value(self):
+        before = catalog_key('x')
+        cache.delete(catalog_cache.CATALOG_VERSION_KEY)
+        self.assertNotEqual(catalog_key('x'), before)
+
+    def test_catalog_writes_bump_the_version_on_commit(self):
+        before = catalog_key('x')
+        with self.captureOnCommitCallbacks() as callbacks:
+            Genre.objects.create(name='Poetry')
+            # a reader inside the transaction window still sees the old version
+            self.assertEqual(catalog_key('x'), before)
+        for callback in callbacks:
+            callback()
+        self.assertNotEqual(catalog_key('x'), before)
+
+    def test_waits_for_the_lock_holder_instead_of_recomputing(self):
+        key = catalog_key('slow')
+        cache.add(f'{key}:lock', 1)
+
+        def finish():
+            time.sleep(0.2)
+            cache.set(key, ('from the other worker', time.time() + 60, 0.1))
+
+        other = threading.Thread(target=finish)
+        other.start()
+        compute = mock.Mock(return_value='recomputed')
+        self.assertEqual(get_or_compute('slow', compute), 'from the other worker')
+        other.join()
+        compute.assert_not_called()
+        self.assertEqual(cache_stats()['lock_waits'], 1)
+
+    @mock.patch('catalog.cache.random.random', return_value=0.5)
+    def test_refreshes_early_near_expiry(self, _random):
+        key = catalog_key('hot')
+        # expires in a second but took ten to compute: XFetch refreshes now
+        cache.set(key, ('stale', time.time() + 1, 10.0))
+        self.assertEqual(get_or_compute('hot', lambda: 'fresh'), 'fresh')
+        self.assertEqual(cache_stats()['early_refreshes'], 1)
+        # while another worker holds the refresh lock, the current value is served
+        cache.set(key, ('current', time.time() + 1, 10.0))
+        cache.add(f'{key}:lock', 1)
+        self.assertEqual(get_or_compute('hot', lambda: 'fresh'), 'current')
+
+    @override_settings(CACHES={'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'eviction-test',
+        'OPTIONS': {'MAX_ENTRIES': 3, 'CULL_FREQUENCY': 2},
+    }})
+    def test_counts_evictions(self):
+        for index in range(5):
+            get_or_compute(f'value:{index}', lambda: index)
+        for index in range(5):
+            get_or_compute(f'value:{index}', lambda: index)
+        self.assertGreater(cache_stats()['evictions'], 0)
+
+
+class CachedQuerysetTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        Genre.objects.bulk_create(Genre(name=f'Genre {index}') for index in range(5))
+
+    def setUp(self):
+        cache.clear()
+
+    def test_caches_rows(self):
+        rows = cached_queryset('genres', Genre.objects.order_by('name'))
+        with self.assertNumQueries(0):
+            self.assertEqual(cached_queryset('genres', Genre.objects.order_by('name')), rows)
+
+    def test_large_results_are_not_cached(self):
+        cached_queryset('genres', Genre.objects.all(), max_rows=3)
+        with self.assertNumQueries(1):
+            self.assertEqual(len(cached_queryset('genres', Genre.objects.all(), max_rows=3)), 5)
+
+    def test_stats_view_is_staff_only(self):
+        user = get_user_model().objects.create_user(username='staff', password='Staff&Pwd123')
+        self.client.force_login(user)
+        self.assertEqual(self.client.get(reverse('cache-stats')).status_code, 403)
+        user.is_staff = True
+        user.save()
+        self.assertIn('hit_rate', self.client.get(reverse('cache-stats')).json())
@@ -1,7 +1,10 @@
 import datetime
 
-from django.test import SimpleTestCase
-from catalog.forms import RenewBookForm
+from django.core.exceptions import ValidationError
+from django.test import SimpleTestCase, TestCase
+from catalog.forms import BookForm, RenewBookForm
+from catalog.models import Author, Book, Genre
+from catalog.isbn import canonical_isbn, canonical_isbns, validate_isbn
 
 class RenewBookFormTest(SimpleTestCase):
     def test_renew_form_date_field_label(self):
@@ -37,3 +40,51 @@ class RenewBookFormTest(SimpleTestCase):
         date = datetime.date.today() + datetime.timedelta(weeks=4)
         form = RenewBookForm(data={'renewal_date': date})
         self.assertTrue(form.is_valid())
+
+
+class IsbnValidationTest(SimpleTestCase):
+    def test_canonical_isbn_converts_isbn10(self):
+        self.assertEqual(canonical_isbn('0-306-40615-2'), '9780306406157')
+        self.assertEqual(canonical_isbn('080442957x'), '9780804429573')
+
+    def test_validate_isbn_rejects_bad_checksum(self):
+        with self.assertRaises(ValidationError):
+            validate_isbn('9780306406158')
+
+    def test_bulk_canonicalization_matches_single(self):
+        values = ['0-306-40615-2', '978 0 306 40615 7', '9780306406158', '080442957X', 'ABCDEFGHIJKLM', '']
+        self.assertEqual(
+            canonical_isbns(values),
+            ['9780306406157', '9780306406157', None, '9780804429573', None, None],
+        )
+
+
+class BookFormAutocompleteTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.authors = [Author.objects.create(first_name=f'First {index}', last_name=f'Last {index}') for index in range(5)]
+        cls.genres = [Genre.objects.create(name=f'Genre {index}') for index in range(5)]
+        cls.book = Book.objects.create(title='Picked', summary='-', isbn='9780306406157', author=cls.authors[3])
+        cls.book.genre.add(cls.genres[1], cls.genres[4])
+
+    def test_renders_only_selected_options(self):
+        form = BookForm(instance=self.book)
+        # one `pk IN (...)` query per widget, whatever the size of the tables
+        with self.assertNumQueries(2):
+            html = str(form['author']) + str(form['genre'])
+        self.assertIn('Last 3, First 3', html)
+        self.assertNotIn('Last 0', html)
+        self.assertIn('Genre 1', html)
+        self.assertIn('Genre 4', html)
+        self.assertNotIn('Genre 2', html)
+        self.assertIn('data-autocomplete-url="/catalog/autocomplete/authors/"', html)
+
+    def test_unbound_form_renders_no_options(self):
+        self.assertNotIn('Last', str(BookForm()['author']))
+
+    def test_validates_submitted_ids(self):
+        form = BookForm({
+            'title': 'New', 'summary': '-', 'isbn': '9780547928227',
+            'author': self.authors[0].pk, 'genre': [self.genres[0].pk],
+        })
+        self.assertTrue(form.is_valid(), form.errors)
@@ -0,0 +1,71 @@
+import datetime
+
+from django.core.cache import cache
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from prometheus_client import REGISTRY
+
+from catalog.models import Book, BookInstance, BookLang
+
+
+def sample(name, **labels):
+    return REGISTRY.get_sample_value(name, labels) or 0
+
+
+class MetricsTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        language = BookLang.objects.create(booklang='en')
+        book = Book.objects.create(title='Counted', summary='-', isbn='9780306406157')
+        today = datetime.date.today()
+        for status, due_back in [('a', None), ('a', None), ('o', today + datetime.timedelta(days=3)),
+                                 ('o', today - datetime.timedelta(days=1)), ('m', None)]:
+            BookInstance.objects.create(book=book, imprint='-', booklang=language, status=status, due_back=due_back)
+
+    def setUp(self):
+        cache.clear()
+
+    def test_requests_are_counted_per_url_name(self):
+        before = {
+            'requests': sample('catalog_requests_total', view='index', method='GET', status='200'),
+            'latency': sample('catalog_request_duration_seconds_count', view='index', method='GET'),
+            'queries': sample('catalog_db_queries_total', view='index'),
+            'sessions': sample('catalog_session_writes_total', view='index'),
+        }
+        self.client.get(reverse('index'))
+        self.assertEqual(sample('catalog_requests_total', view='index', method='GET', status='200'), before['requests'] + 1)
+        self.assertEqual(
+            sample('catalog_request_duration_seconds_count', view='index', method='GET'), before['latency'] + 1,
+        )
+        self.assertGreater(sample('catalog_db_queries_total', view='index'), before['queries'])
+        self.assertEqual(sample('catalog_session_writes_total', view='index'), before['sessions'] + 1)
+
+    def test_cache_events(self):
+        before = sample('catalog_cache_events_total', cache='catalog', event='hits')
+        self.client.get(reverse('index'))
+        self.client.get(reverse('index'))
+        self.assertGreater(sample('catalog_cache_events_total', cache='catalog', event='hits'), before)
+
+    def test_exposition(self):
+        self.client.get(reverse('books'))
+        response = self.client.get('/metrics')
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response['Content-Type'].startswith('text/plain'))
+        body = response.content.decode()
+        self.assertIn('catalog_request_duration_seconds_bucket{le="0.005",method="GET",view="books"}', body)
+        self.assertIn('catalog_copies{status="a"} 2.0', body)
+        self.assertIn('catalog_copies{status="o"} 2.0', body)
+        self.assertIn('catalog_copies{status="r"} 0.0', body)
+        self.assertIn('catalog_copies_overdue 1.0', body)
+
+    def test_restricted_to_monitoring_hosts(self):
+        self.assertEqual(self.client.get('/metrics', REMOTE_ADDR='203.0.113.9').status_code, 403)
+
+    def test_forwarded_requests_are_judged_by_the_client_address(self):
+        # behind a reverse proxy on the same host every request arrives from loopback
+        proxied = {'REMOTE_ADDR': '127.0.0.1', 'HTTP_X_FORWARDED_FOR': '203.0.113.9'}
+        self.assertEqual(self.client.get('/metrics', **proxied).status_code, 403)
+        with override_settings(TRUSTED_PROXY_COUNT=1):
+            self.assertEqual(self.client.get('/metrics', **proxied).status_code, 403)
+            response = self.client.get('/metrics', REMOTE_ADDR='10.0.0.1', HTTP_X_FORWARDED_FOR='127.0.0.1')
+            self.assertEqual(response.status_code, 200)
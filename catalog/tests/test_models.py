@@ -1,8 +1,11 @@
 import datetime
+from io import StringIO
+from pathlib import Path
 
+from django.core.management import call_command
 from django.test import TestCase
 
-from catalog.models import Author, Book, BookInstance, BookLang, Genre
+from catalog.models import Author, Book, BookInstance, BookLang, Genre, LoanEvent
 
 class AuthorModelTest(TestCase):
     @classmethod
@@ -142,8 +145,213 @@ class BookInstanceModelTest(TestCase):
         instance = self._create_instance(status='o', due_back=tomorrow)
         self.assertFalse(instance.is_overdue)
 
+    def test_default_id_is_time_ordered_uuid7(self):
+        first = self._create_instance()
+        second = self._create_instance()
+        self.assertEqual(first.id.version, 7)
+        self.assertLess(first.id, second.id)
+
 
 class BookLangModelTest(TestCase):
     def test_string_representation(self):
         language = BookLang.objects.create(booklang='la')
         self.assertEqual(str(language), 'Lashon Hakodsh')
+
+
+class BookAvailabilityColumnsTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.language = BookLang.objects.create(booklang='he')
+        cls.book = Book.objects.create(title='Dune', summary='Spice.', isbn='9780441013593')
+        cls.other_book = Book.objects.create(title='Emma', summary='Matchmaking.', isbn='9780141439587')
+
+    def _create_instance(self, **kwargs):
+        defaults = {'book': self.book, 'imprint': 'Ace', 'booklang': self.language}
+        defaults.update(kwargs)
+        return BookInstance.objects.create(**defaults)
+
+    def _columns(self, book=None):
+        book = book or self.book
+        book.refresh_from_db()
+        return book.copies_total, book.copies_available, book.next_due_back
+
+    def test_save_and_delete_update_columns(self):
+        due = datetime.date.today() + datetime.timedelta(days=7)
+        available = self._create_instance(status='a')
+        on_loan = self._create_instance(status='o', due_back=due)
+        self.assertEqual(self._columns(), (2, 1, due))
+
+        available.status = 'o'
+        available.due_back = due - datetime.timedelta(days=1)
+        available.save()
+        self.assertEqual(self._columns(), (2, 0, due - datetime.timedelta(days=1)))
+
+        on_loan.book = self.other_book
+        on_loan.save()
+        self.assertEqual(self._columns(), (1, 0, due - datetime.timedelta(days=1)))
+        self.assertEqual(self._columns(self.other_book), (1, 0, due))
+
+        available.delete()
+        self.assertEqual(self._columns(), (0, 0, None))
+
+    def test_queryset_update_and_bulk_paths_update_columns(self):
+        BookInstance.objects.bulk_create(
+            [BookInstance(book=self.book, imprint='Ace', booklang=self.language, status='m') for _ in range(3)]
+        )
+        self.assertEqual(self._columns(), (3, 0, None))
+
+        BookInstance.objects.filter(book=self.book).update(status='a')
+        self.assertEqual(self._columns(), (3, 3, None))
+
+        BookInstance.objects.filter(book=self.book)[:1].get().delete()
+        BookInstance.objects.filter(book=self.book).delete()
+        self.assertEqual(self._columns(), (0, 0, None))
+
+    def test_available_now_uses_column(self):
+        self._create_instance(status='a')
+        self.assertQuerySetEqual(Book.objects.available_now(), [self.book])
+
+    def test_verify_command_repairs_drift(self):
+        self._create_instance(status='a')
+        Book.objects.filter(pk=self.book.pk).update(copies_total=9, copies_available=9)
+
+        out = StringIO()
+        call_command('verify_book_availability', '--repair', stdout=out)
+        self.assertIn('1 book(s) drifted', out.getvalue())
+        self.assertEqual(self._columns(), (1, 1, None))
+
+
+class CopyNumberTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.language = BookLang.objects.create(booklang='en')
+        cls.dune = Book.objects.create(title='Dune', summary='-', isbn='9780441013593')
+        cls.emma = Book.objects.create(title='Emma', summary='-', isbn='9780141439587')
+
+    def _copy(self, book, **kwargs):
+        return BookInstance(book=book, imprint='-', booklang=self.language, **kwargs)
+
+    def test_numbers_are_sequential_per_book(self):
+        first = BookInstance.objects.create(book=self.dune, imprint='-', booklang=self.language)
+        other = BookInstance.objects.create(book=self.emma, imprint='-', booklang=self.language)
+        second = BookInstance.objects.create(book=self.dune, imprint='-', booklang=self.language)
+        self.assertEqual((first.copy_no, second.copy_no, other.copy_no), (1, 2, 1))
+        self.assertEqual(second.copy_label, 'copy 2 of Dune')
+
+    def test_bulk_create_allocates_a_block(self):
+        BookInstance.objects.create(book=self.dune, imprint='-', booklang=self.language)
+        copies = BookInstance.objects.bulk_create([self._copy(self.dune) for _ in range(3)] + [self._copy(self.emma)])
+        self.assertEqual([copy.copy_no for copy in copies], [2, 3, 4, 1])
+
+    def test_moving_a_copy_renumbers_it(self):
+        BookInstance.objects.create(book=self.emma, imprint='-', booklang=self.language)
+        copy = BookInstance.objects.create(book=self.dune, imprint='-', booklang=self.language)
+        copy = BookInstance.objects.get(pk=copy.pk)
+        copy.book = self.emma
+        copy.save()
+        self.assertEqual(copy.copy_no, 2)
+
+    def test_number_is_unique_per_book(self):
+        from django.db import IntegrityError
+
+        BookInstance.objects.create(book=self.dune, imprint='-', booklang=self.language)
+        with self.assertRaises(IntegrityError):
+            BookInstance.objects.create(book=self.dune, imprint='-', booklang=self.language, copy_no=1)
+
+
+class LoanEventTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        from django.contrib.auth import get_user_model
+
+        cls.reader = get_user_model().objects.create_user(username='reader', password='Read&Pwd123')
+        cls.language = BookLang.objects.create(booklang='en')
+        cls.book = Book.objects.create(title='Dune', summary='-', isbn='9780441013593')
+
+    def _create_instance(self, **kwargs):
+        defaults = {'book': self.book, 'imprint': 'Ace', 'booklang': self.language}
+        defaults.update(kwargs)
+        return BookInstance.objects.create(**defaults)
+
+    def _transitions(self):
+        return list(LoanEvent.objects.order_by('id').values_list('from_status', 'to_status'))
+
+    def test_save_logs_status_transitions_only(self):
+        copy = self._create_instance(status='a')
+        copy.status = 'o'
+        copy.borrower = self.reader
+        copy.due_back = datetime.date.today()
+        copy.save()
+        copy.due_back = datetime.date.today() + datetime.timedelta(days=7)
+        copy.save()
+        self.assertEqual(self._transitions(), [('', 'a'), ('a', 'o')])
+        loan = LoanEvent.objects.for_user(self.reader).loans().get()
+        self.assertEqual((loan.book, loan.book_instance_id), (self.book, copy.pk))
+
+    def test_queryset_update_logs_one_event_per_changed_row(self):
+        self._create_instance(status='a')
+        self._create_instance(status='m')
+        LoanEvent.objects.all()._raw_delete('default')
+
+        BookInstance.objects.all().update(status='o', borrower=self.reader)
+        self.assertEqual(sorted(self._transitions()), [('a', 'o'), ('m', 'o')])
+        self.assertEqual(LoanEvent.objects.for_book(self.book).filter(borrower=self.reader).count(), 2)
+
+    def test_bulk_paths_log_events(self):
+        copies = BookInstance.objects.bulk_create(
+            [BookInstance(book=self.book, imprint='-', booklang=self.language, status='m') for _ in range(2)]
+        )
+        copies[0].status = 'a'
+        BookInstance.objects.bulk_update(copies, ['status'])
+        self.assertEqual(self._transitions(), [('', 'm'), ('', 'm'), ('m', 'a')])
+
+    def test_rows_are_append_only(self):
+        self._create_instance(status='a')
+        event = LoanEvent.objects.get()
+        with self.assertRaises(TypeError):
+            event.save()
+        with self.assertRaises(TypeError):
+            LoanEvent.objects.all().delete()
+        with self.assertRaises(TypeError):
+            LoanEvent.objects.update(to_status='o')
+
+    def test_archive_command_moves_old_months(self):
+        import gzip
+        import json
+        import tempfile
+
+        self._create_instance(status='a')
+        next_month = (datetime.date.today().replace(day=1) + datetime.timedelta(days=32)).strftime('%Y-%m')
+        with tempfile.TemporaryDirectory() as output_dir:
+            call_command('archive_loan_events', '--before', next_month, '--output-dir', output_dir, stdout=StringIO())
+            archived = list(Path(output_dir).glob('*.jsonl.gz'))
+            with gzip.open(archived[0], 'rt') as archive:
+                rows = [json.loads(line) for line in archive]
+        self.assertEqual([row['to_status'] for row in rows], ['a'])
+        self.assertFalse(LoanEvent.objects.exists())
+
+    def test_archive_command_rerun_after_a_crash_writes_no_duplicates(self):
+        import gzip
+        import json
+        import tempfile
+        from unittest import mock
+
+        for _ in range(3):
+            self._create_instance(status='a')
+        next_month = (datetime.date.today().replace(day=1) + datetime.timedelta(days=32)).strftime('%Y-%m')
+        args = ('archive_loan_events', '--before', next_month, '--chunk-size', '2')
+        with tempfile.TemporaryDirectory() as output_dir:
+            # the first chunk's file is written, then the run dies before its delete
+            with mock.patch('django.db.models.query.QuerySet._raw_delete', side_effect=RuntimeError('crash')):
+                with self.assertRaises(RuntimeError):
+                    call_command(*args, '--output-dir', output_dir, stdout=StringIO())
+            self.assertEqual(LoanEvent.objects.count(), 3)
+            call_command(*args, '--chunk-size', '3', '--output-dir', output_dir, stdout=StringIO())
+            ids = []
+            for path in sorted(Path(output_dir).glob('*.jsonl.gz')):
+                with gzip.open(path, 'rt') as archive:
+                    ids.extend(json.loads(line)['id'] for line in archive)
+            self.assertEqual(list(Path(output_dir).glob('*.tmp')), [])
+        self.assertEqual(len(ids), 3)
+        self.assertEqual(len(set(ids)), 3)
+        self.assertFalse(LoanEvent.objects.exists())
@@ -0,0 +1,84 @@
+import pstats
+import tempfile
+import threading
+import time
+from pathlib import Path
+
+from django.contrib.auth import get_user_model
+from django.test import SimpleTestCase, TestCase, override_settings
+from django.urls import reverse
+
+from catalog.profiling import StackSampler, list_profiles
+
+User = get_user_model()
+
+
+def busy_wait(seconds):
+    deadline = time.perf_counter() + seconds
+    while time.perf_counter() < deadline:
+        pass
+
+
+class StackSamplerTest(SimpleTestCase):
+    def test_collects_collapsed_stacks_of_the_target_thread(self):
+        sampler = StackSampler(threading.get_ident(), 0.001)
+        sampler.start()
+        busy_wait(0.1)
+        sampler.stop()
+        self.assertTrue(sampler.stacks)
+        stack, _ = sampler.stacks.most_common(1)[0]
+        self.assertTrue(stack.split(';')[-1].startswith('busy_wait (catalog/tests/test_profiling.py:'))
+
+
+class ProfilingMiddlewareTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.staff = User.objects.create_user(username='staff', password='Staff&Pwd123', is_staff=True)
+        cls.reader = User.objects.create_user(username='reader', password='Reader&Pwd123')
+
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.directory = Path(directory.name)
+        settings = override_settings(PROFILE_DIR=directory.name, PROFILE_INTERVAL_MS=0.5)
+        settings.enable()
+        self.addCleanup(settings.disable)
+
+    def test_not_profiled_by_default(self):
+        response = self.client.get(reverse('books'), HTTP_X_PROFILE='1')
+        self.assertNotIn('X-Profile-Id', response)
+        self.assertEqual(list_profiles(), [])
+
+    def test_staff_header(self):
+        self.client.force_login(self.staff)
+        response = self.client.get(reverse('books'), HTTP_X_PROFILE='pstats')
+        profile, = list_profiles()
+        self.assertEqual(response['X-Profile-Id'], profile['name'])
+        self.assertEqual((profile['view'], profile['method'], profile['format']), ('books', 'GET', 'pstats'))
+        self.assertTrue(pstats.Stats(str(self.directory / profile['name'])).total_calls)
+
+    @override_settings(PROFILE_SAMPLE_RATE=1.0, PROFILE_MAX_FILES=2)
+    def test_sampling_keeps_the_newest_profiles(self):
+        self.client.force_login(self.staff)
+        names = [self.client.get(reverse('books'))['X-Profile-Id'] for _ in range(3)]
+        self.assertEqual([profile['name'] for profile in list_profiles()], names[:0:-1])
+        self.assertTrue(names[-1].endswith('.collapsed'))
+
+    @override_settings(PROFILE_SAMPLE_RATE=1.0)
+    def test_profile_id_is_not_shown_to_other_users(self):
+        self.assertNotIn('X-Profile-Id', self.client.get(reverse('books')))
+        self.client.force_login(self.reader)
+        self.assertNotIn('X-Profile-Id', self.client.get(reverse('books')))
+        self.assertEqual(len(list_profiles()), 2)
+
+    def test_admin_pages(self):
+        self.client.force_login(self.staff)
+        name = self.client.get(reverse('authors'), HTTP_X_PROFILE='1')['X-Profile-Id']
+        response = self.client.get(reverse('admin:profiles'))
+        self.assertContains(response, reverse('admin:profile-download', args=[name]))
+        response = self.client.get(reverse('admin:profile-download', args=[name]))
+        self.assertEqual(response['Content-Disposition'], f'attachment; filename="{name}"')
+        self.assertEqual(self.client.get(reverse('admin:profile-download', args=['settings.py'])).status_code, 404)
+
+        self.client.force_login(self.reader)
+        self.assertEqual(self.client.get(reverse('admin:profiles')).status_code, 302)
@@ -0,0 +1,79 @@
+import numpy as np
+from django.contrib.auth import get_user_model
+from django.test import TestCase
+from django.urls import reverse
+
+from catalog.models import Author, Book, BookInstance, BookLang, BookSimilarity, Genre
+from catalog.recommendations import feature_matrix, rebuild_similarities, top_k_neighbours
+
+
+User = get_user_model()
+
+
+def _pairs(*pairs):
+    return np.array([row for row, _ in pairs], dtype=np.int64), np.array([feature for _, feature in pairs], dtype=np.int64)
+
+
+class TopKNeighboursTest(TestCase):
+    def test_ranks_by_cosine_and_skips_self(self):
+        # Books 0 and 1 share genre and author, 2 only the genre, 3 nothing.
+        features = feature_matrix(
+            4,
+            genre_pairs=_pairs((0, 1), (1, 1), (2, 1), (3, 2)),
+            author_pairs=_pairs((0, 7), (1, 7), (2, 8)),
+            borrower_pairs=_pairs(),
+        )
+        rows, columns, scores, ranks = (
+            np.concatenate(parts) for parts in zip(*top_k_neighbours(features, k=2, block_size=3))
+        )
+        neighbours = {(row, rank): column for row, column, rank in zip(rows, columns, ranks)}
+        self.assertEqual(neighbours[(0, 1)], 1)
+        self.assertEqual(neighbours[(0, 2)], 2)
+        self.assertNotIn(3, rows)
+        self.assertTrue(np.all(rows != columns))
+        self.assertTrue(np.all(scores <= 1.0 + 1e-9))
+
+    def test_dense_features_use_popular_representatives(self):
+        # Ten books in one genre with max_df=3: only the two most popular are candidates.
+        features = feature_matrix(
+            10, genre_pairs=_pairs(*[(book, 1) for book in range(10)]),
+            author_pairs=_pairs(), borrower_pairs=_pairs(),
+        )
+        popularity = np.array([0, 0, 0, 0, 0, 0, 0, 0, 5, 9])
+        rows, columns, _, _ = next(top_k_neighbours(features, k=5, max_df=3, per_feature=2, popularity=popularity))
+        self.assertEqual(set(columns[rows == 0]), {8, 9})
+
+
+class RebuildSimilaritiesTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        language = BookLang.objects.create(booklang='en')
+        fantasy = Genre.objects.create(name='Fantasy')
+        history = Genre.objects.create(name='History')
+        author = Author.objects.create(first_name='Ursula', last_name='Le Guin')
+        other = Author.objects.create(first_name='Mary', last_name='Beard')
+        cls.wizard = Book.objects.create(title='A Wizard of Earthsea', summary='-', isbn='9780547773742', author=author)
+        cls.tombs = Book.objects.create(title='The Tombs of Atuan', summary='-', isbn='9780689845369', author=author)
+        cls.spqr = Book.objects.create(title='SPQR', summary='-', isbn='9781631492228', author=other)
+        cls.wizard.genre.add(fantasy)
+        cls.tombs.genre.add(fantasy)
+        cls.spqr.genre.add(history)
+        reader = User.objects.create_user(username='reader', password='1X<ISRUkw+tuK')
+        for book in (cls.wizard, cls.spqr):
+            BookInstance.objects.create(book=book, imprint='-', booklang=language, status='o', borrower=reader)
+
+    def test_rebuild_and_detail_page(self):
+        # Genre + author outweigh a single shared borrower at equal weights.
+        written = rebuild_similarities(k=5, weights={'borrower': 1.0})
+        self.assertEqual(written, BookSimilarity.objects.count())
+        best = BookSimilarity.objects.get(book=self.wizard, rank=1)
+        self.assertEqual(best.similar, self.tombs)
+        self.assertTrue(BookSimilarity.objects.filter(book=self.wizard, similar=self.spqr).exists())
+
+        # Rebuilding replaces the previous rows.
+        self.assertEqual(rebuild_similarities(k=1, weights={'borrower': 1.0}), 3)
+        self.assertEqual(BookSimilarity.objects.filter(book=self.wizard).count(), 1)
+
+        response = self.client.get(reverse('book-detail', args=[self.wizard.pk]))
+        self.assertContains(response, 'The Tombs of Atuan')
+        self.assertEqual([row.similar for row in response.context['similar_books']], [self.tombs])
@@ -0,0 +1,89 @@
+import datetime
+
+from django.contrib.auth import get_user_model
+from django.contrib.auth.models import Group
+from django.core.cache import cache
+from django.test import TestCase
+from django.urls import reverse
+from django.utils import timezone
+
+from catalog import reports
+from catalog.models import Author, Book, BookInstance, BookLang, Genre, LoanEvent
+
+
+User = get_user_model()
+
+
+class ReportsTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        english = BookLang.objects.create(booklang='en')
+        hebrew = BookLang.objects.create(booklang='he')
+        fantasy = Genre.objects.create(name='Fantasy')
+        Genre.objects.create(name='Poetry')
+        author = Author.objects.create(first_name='Ursula', last_name='Le Guin')
+        book = Book.objects.create(title='Earthsea', summary='-', isbn='9780547773742', author=author)
+        book.genre.add(fantasy)
+
+        cls.reader = User.objects.create_user(username='reader', password='1X<ISRUkw+tuK')
+        cls.other = User.objects.create_user(username='other', password='2HJ1vRV0Z&3iD')
+        cls.librarian = User.objects.create_user(username='librarian', password='3Lib&Pwd456')
+        cls.librarian.groups.add(Group.objects.create(name='Librarians'))
+
+        first = BookInstance.objects.create(book=book, imprint='-', booklang=english, status='a')
+        second = BookInstance.objects.create(book=book, imprint='-', booklang=hebrew, status='a')
+        for borrower in (cls.reader, cls.other, cls.reader):
+            first.status, first.borrower = 'o', borrower
+            first.save()
+            first.status, first.borrower = 'a', None
+            first.save()
+        second.status, second.borrower = 'o', cls.reader
+        second.save()
+        cls.old_copy = BookInstance.objects.create(book=book, imprint='-', booklang=english, status='m')
+        BookInstance.objects.create(book=book, imprint='-', booklang=english, status='m')
+
+    def setUp(self):
+        cache.clear()
+
+    def test_loan_reports(self):
+        self.assertEqual(reports.loans_by_genre(), [('Fantasy', 4), ('Poetry', 0)])
+        self.assertEqual(reports.loans_by_language(), [('English', 3), ('Hebrow', 1)])
+        self.assertEqual(reports.loans_by_month(), [(f'{timezone.now():%Y-%m}', 4)])
+        self.assertEqual(reports.top_borrowers(), [('reader', 3), ('other', 1)])
+
+    def test_maintenance_by_age(self):
+        self.assertEqual(dict(reports.maintenance_by_age())['< 7 days'], 2)
+        # copies whose only maintenance event predates the log are "unknown"
+        LoanEvent.objects.filter(to_status='m')._raw_delete('default')
+        LoanEvent.objects.create(
+            book_instance=self.old_copy, book=self.old_copy.book, from_status='a', to_status='m',
+            created_at=timezone.now() - datetime.timedelta(days=100),
+        )
+        self.assertEqual(
+            dict(reports.maintenance_by_age()),
+            {'< 7 days': 0, '7-30 days': 0, '30-90 days': 0, '90-365 days': 1, '> 1 year': 0, 'unknown': 1},
+        )
+
+    def test_each_report_is_one_query_and_cached(self):
+        for report in reports.REPORTS.values():
+            with self.assertNumQueries(1):
+                reports.report_rows(report)
+            with self.assertNumQueries(0):
+                reports.report_rows(report)
+
+    def test_views(self):
+        url = reverse('report-detail', args=['top-borrowers'])
+        self.client.login(username='reader', password='1X<ISRUkw+tuK')
+        self.assertEqual(self.client.get(url).status_code, 403)
+
+        self.client.login(username='librarian', password='3Lib&Pwd456')
+        self.assertContains(self.client.get(reverse('reports')), 'Top borrowers')
+        self.assertContains(self.client.get(url), 'reader')
+        self.assertEqual(self.client.get(reverse('report-detail', args=['nope'])).status_code, 404)
+
+        response = self.client.get(url, {'format': 'csv'})
+        self.assertEqual(response['Content-Type'], 'text/csv; charset=utf-8')
+        self.assertEqual(
+            b''.join(response.streaming_content).decode().splitlines(),
+            ['Borrower,Loans', 'reader,3', 'other,1'],
+        )
@@ -0,0 +1,163 @@
+import datetime
+
+from django.contrib.auth import get_user_model
+from django.test import TestCase
+from django.urls import reverse
+from django.utils import timezone
+
+from catalog.models import (
+    ArchivedBookInstance, Author, Book, BookInstance, BookLang, BookSimilarity, Genre, LoanEvent,
+)
+from catalog.services import (
+    BLOCKED, DELETED, MISSING, archive_copies, bulk_delete_authors, bulk_delete_books, bulk_update_copies,
+)
+
+
+User = get_user_model()
+
+
+class BulkDeleteTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.language = BookLang.objects.create(booklang='en')
+        cls.genre = Genre.objects.create(name='Weeded')
+        cls.busy_author = Author.objects.create(first_name='Busy', last_name='Author')
+        cls.idle_author = Author.objects.create(first_name='Idle', last_name='Author')
+        cls.books = [
+            Book.objects.create(title=f'Book {index}', summary='-', isbn=f'{index:013d}', author=cls.busy_author)
+            for index in range(4)
+        ]
+        for book in cls.books:
+            book.genre.add(cls.genre)
+        BookInstance.objects.create(book=cls.books[0], imprint='-', booklang=cls.language)
+
+    def test_bulk_delete_books_reports_per_id(self):
+        ids = [book.pk for book in self.books] + [999999]
+        with self.assertNumQueries(7):
+            report = bulk_delete_books(ids, chunk_size=len(ids))
+        self.assertEqual(report[self.books[0].pk], BLOCKED)
+        self.assertEqual(report[self.books[1].pk], DELETED)
+        self.assertEqual(report[999999], MISSING)
+        self.assertQuerySetEqual(Book.objects.all(), [self.books[0]])
+        self.assertEqual(Book.genre.through.objects.count(), 1)
+
+    def test_bulk_delete_books_in_chunks(self):
+        report = bulk_delete_books([book.pk for book in self.books], chunk_size=1)
+        self.assertEqual(list(report.values()).count(DELETED), 3)
+
+    def test_bulk_delete_books_removes_similarities(self):
+        BookSimilarity.objects.create(book=self.books[1], similar=self.books[2], score=0.5, rank=1)
+        BookSimilarity.objects.create(book=self.books[0], similar=self.books[1], score=0.5, rank=1)
+        kept = BookSimilarity.objects.create(book=self.books[0], similar=self.books[3], score=0.4, rank=2)
+        report = bulk_delete_books([self.books[1].pk])
+        self.assertEqual(report, {self.books[1].pk: DELETED})
+        self.assertQuerySetEqual(BookSimilarity.objects.all(), [kept])
+
+    def test_bulk_delete_authors_skips_authors_with_books(self):
+        report = bulk_delete_authors([self.busy_author.pk, self.idle_author.pk])
+        self.assertEqual(report, {self.busy_author.pk: BLOCKED, self.idle_author.pk: DELETED})
+        self.assertTrue(Author.objects.filter(pk=self.busy_author.pk).exists())
+
+    def test_admin_action_deletes_books_without_copies(self):
+        admin_user = User.objects.create_superuser(username='admin', password='Admin&Pwd123')
+        self.client.force_login(admin_user)
+        response = self.client.post(
+            reverse('admin:catalog_book_changelist'),
+            {'action': 'delete_books_without_copies', '_selected_action': [book.pk for book in self.books]},
+            follow=True,
+        )
+        self.assertContains(response, 'Deleted 3 record(s).')
+        self.assertContains(response, 'Kept 1 record(s) that still have copies')
+        self.assertEqual(Book.objects.count(), 1)
+
+
+class BulkUpdateCopiesTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.reader = User.objects.create_user(username='reader', password='Read&Pwd123')
+        language = BookLang.objects.create(booklang='en')
+        cls.book = Book.objects.create(title='Cart', summary='-', isbn='9780306406157')
+        cls.copies = [
+            BookInstance.objects.create(
+                book=cls.book, imprint='-', booklang=language, status='o', borrower=cls.reader,
+                due_back=datetime.date.today(),
+            )
+            for _ in range(5)
+        ]
+
+    def test_single_update_statement_keeps_counters(self):
+        with self.assertNumQueries(9):
+            updated = bulk_update_copies(
+                [copy.pk for copy in self.copies], status='a', due_back=None, borrower=None,
+            )
+        self.assertEqual(updated, 5)
+        self.book.refresh_from_db()
+        self.assertEqual((self.book.copies_total, self.book.copies_available), (5, 5))
+        self.assertFalse(BookInstance.objects.filter(borrower__isnull=False).exists())
+
+    def test_admin_action_marks_maintenance(self):
+        admin_user = User.objects.create_superuser(username='admin', password='Admin&Pwd123')
+        self.client.force_login(admin_user)
+        response = self.client.post(
+            reverse('admin:catalog_bookinstance_changelist'),
+            {'action': 'mark_maintenance', '_selected_action': [str(copy.pk) for copy in self.copies[:3]]},
+            follow=True,
+        )
+        self.assertContains(response, 'Updated 3 copy(ies).')
+        self.assertEqual(BookInstance.objects.filter(status='m', borrower__isnull=True).count(), 3)
+
+
+class ArchiveCopiesTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.reader = User.objects.create_user(username='reader', password='Read&Pwd123')
+        language = BookLang.objects.create(booklang='en')
+        cls.book = Book.objects.create(title='Shelf', summary='-', isbn='9780306406157')
+        cls.copies = [
+            BookInstance.objects.create(book=cls.book, imprint=f'Imprint {index}', booklang=language, status='a')
+            for index in range(5)
+        ]
+        lost, withdrawn = cls.copies[:2]
+        lost.status, lost.borrower = 'o', cls.reader
+        lost.save()
+        lost.status = 'l'
+        lost.save()
+        withdrawn.status = 'w'
+        withdrawn.save()
+        cls.idle = cls.copies[2]
+        cls.idle.status = 'm'
+        cls.idle.save()
+
+    def test_moves_retired_copies_with_history(self):
+        archived = archive_copies(BookInstance.objects.retired(), with_history=True, chunk_size=1)
+        self.assertEqual(archived, 2)
+        self.assertEqual(BookInstance.objects.count(), 3)
+        self.book.refresh_from_db()
+        self.assertEqual((self.book.copies_total, self.book.copies_available), (3, 2))
+
+        lost = ArchivedBookInstance.objects.get(pk=self.copies[0].pk)
+        self.assertEqual((lost.status, lost.copy_no, lost.imprint), ('l', self.copies[0].copy_no, 'Imprint 0'))
+        self.assertEqual([event['to_status'] for event in lost.history], ['a', 'o', 'l'])
+        self.assertEqual(lost.history[1]['borrower_id'], self.reader.pk)
+        self.assertFalse(LoanEvent.objects.filter(book_instance_id=self.copies[0].pk).exists())
+
+    def test_without_history_keeps_the_log(self):
+        archive_copies(BookInstance.objects.retired())
+        self.assertIsNone(ArchivedBookInstance.objects.get(pk=self.copies[1].pk).history)
+        self.assertTrue(LoanEvent.objects.filter(book_instance_id=self.copies[1].pk).exists())
+
+    def test_retired_includes_long_maintenance(self):
+        self.assertNotIn(self.idle, BookInstance.objects.retired(timezone.now() - datetime.timedelta(days=30)))
+        self.assertIn(self.idle, BookInstance.objects.retired(timezone.now() + datetime.timedelta(seconds=1)))
+
+    def test_retired_skips_maintenance_without_events(self):
+        LoanEvent.objects.filter(book_instance=self.idle)._raw_delete('default')
+        self.assertNotIn(self.idle, BookInstance.objects.retired(timezone.now() + datetime.timedelta(seconds=1)))
+
+    def test_detail_page_shows_archived_copies_on_request(self):
+        archive_copies(BookInstance.objects.retired())
+        url = reverse('book-detail', args=[self.book.pk])
+        self.assertNotContains(self.client.get(url), 'Imprint 0')
+        response = self.client.get(url, {'include_archived': '1'})
+        self.assertContains(response, 'Imprint 0')
+        self.assertContains(response, 'Withdrawn')
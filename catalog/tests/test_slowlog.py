@@ -0,0 +1,81 @@
+import json
+import tempfile
+from io import StringIO
+from pathlib import Path
+
+from django.contrib.auth import get_user_model
+from django.contrib.auth.models import Group
+from django.core.management import call_command
+from django.test import SimpleTestCase, TestCase, override_settings
+from django.urls import reverse
+
+from catalog.models import Book
+from catalog.slowlog import fingerprint, normalize_sql, redact, write_record
+
+
+class NormalizeTest(SimpleTestCase):
+    def test_literals_and_lists_share_a_fingerprint(self):
+        first = normalize_sql('SELECT "id" FROM "catalog_book" WHERE "id" IN (%s, %s, %s) AND "title" = \'Dune\'')
+        second = normalize_sql('SELECT  "id" FROM "catalog_book"\nWHERE "id" IN (%s) AND "title" = \'It\'\'s\'')
+        self.assertEqual(first, 'SELECT "id" FROM "catalog_book" WHERE "id" IN (...) AND "title" = ?')
+        self.assertEqual(fingerprint(first), fingerprint(second))
+        self.assertEqual(normalize_sql('INSERT INTO "t" ("a") VALUES (%s), (%s) LIMIT 21'),
+                         'INSERT INTO "t" ("a") VALUES (...) LIMIT ?')
+
+    def test_values_are_redacted(self):
+        self.assertEqual(redact(['secret', 42, None, True, b'xy']), ['<str:6>', '<int>', None, True, '<bytes:2>'])
+        self.assertEqual(redact({'name': 'secret'}), {'name': '<str:6>'})
+
+
+class SlowQueryLogTest(TestCase):
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.log = Path(directory.name) / 'slow.jsonl'
+        settings = override_settings(
+            SLOW_QUERY_THRESHOLD_MS=0, SLOW_QUERY_LOG=str(self.log), SLOW_QUERY_EXPLAIN=True,
+        )
+        settings.enable()
+        self.addCleanup(settings.disable)
+
+    def records(self):
+        return [json.loads(line) for line in self.log.read_text().splitlines()]
+
+    def test_records_view_role_params_and_plan(self):
+        Book.objects.create(title='Dune', summary='-', isbn='9780441172719')
+        self.client.get(reverse('index'), {'book_name': 'secret title'})
+        records = self.records()
+        self.assertTrue(records)
+        self.assertEqual({record['view'] for record in records}, {'index'})
+        self.assertEqual({record['role'] for record in records}, {'anonymous'})
+        search = next(record for record in records if 'LIKE' in record['sql'])
+        self.assertNotIn('secret', json.dumps(search))
+        self.assertIn('<str:', json.dumps(search['params']))
+        self.assertTrue(search['plan'])
+
+    def test_librarian_role(self):
+        user = get_user_model().objects.create_user(username='librarian', password='Lib&Pwd123')
+        user.groups.add(Group.objects.create(name='Librarians'))
+        self.client.force_login(user)
+        self.client.get(reverse('books'))
+        self.assertIn('librarian', {record['role'] for record in self.records()})
+
+    def test_rotation(self):
+        with override_settings(SLOW_QUERY_LOG_MAX_BYTES=200, SLOW_QUERY_LOG_BACKUPS=2):
+            for index in range(10):
+                write_record({'index': index, 'padding': 'x' * 80})
+        self.assertEqual(
+            sorted(path.name for path in self.log.parent.glob('slow.jsonl*') if not path.name.endswith('.lock')),
+            ['slow.jsonl', 'slow.jsonl.1', 'slow.jsonl.2'],
+        )
+        self.assertEqual(json.loads(self.log.read_text().splitlines()[-1])['index'], 9)
+
+    def test_report(self):
+        self.client.get(reverse('books'))
+        self.client.get(reverse('authors'))
+        out = StringIO()
+        call_command('slow_queries_report', view='books', plans=True, stdout=out)
+        report = out.getvalue()
+        self.assertIn('views: books', report)
+        self.assertNotIn('authors', report)
+        self.assertIn('distinct statements', report)
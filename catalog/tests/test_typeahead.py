@@ -0,0 +1,166 @@
+import random
+import statistics
+import string
+import time
+from unittest import mock
+
+from django.core.cache import cache
+from django.db import transaction
+from django.test import SimpleTestCase, TestCase
+from django.urls import reverse
+
+from catalog import typeahead
+from catalog.models import Author, Book
+from catalog.services import bulk_delete_books
+from catalog.typeahead import AUTHOR, BOOK, PackedStrings, PrefixIndex, encode_ref
+
+
+class PrefixIndexTest(SimpleTestCase):
+    def setUp(self):
+        self.index = PrefixIndex([
+            ('dune', encode_ref(BOOK, 1), 'Dune'),
+            ('dune messiah', encode_ref(BOOK, 2), 'Dune Messiah'),
+            ('frank herbert', encode_ref(AUTHOR, 1), 'Herbert, Frank'),
+            ('herbert frank', encode_ref(AUTHOR, 1), 'Herbert, Frank'),
+            ('hyperion', encode_ref(BOOK, 3), 'Hyperion'),
+        ])
+
+    def labels(self, prefix, limit=10):
+        return [label for _, label in self.index.search(prefix, limit)]
+
+    def test_prefix_search_in_key_order(self):
+        self.assertEqual(self.labels('dun'), ['Dune', 'Dune Messiah'])
+        self.assertEqual(self.labels('h'), ['Herbert, Frank', 'Hyperion'])
+        self.assertEqual(self.labels('d', limit=1), ['Dune'])
+        self.assertEqual(self.labels('x'), [])
+
+    def test_updates_go_through_the_overlay(self):
+        self.index.update(encode_ref(BOOK, 1), 'Dune (1965)', ['dune (1965)'])
+        self.index.update(encode_ref(BOOK, 4), 'Children of Dune', ['children of dune'])
+        self.index.update(encode_ref(BOOK, 2), None)
+        self.assertEqual(self.labels('dun'), ['Dune (1965)'])
+        self.assertEqual(self.labels('c'), ['Children of Dune'])
+
+        self.index.update(encode_ref(BOOK, 4), 'Dune Children', ['dune children'])
+        self.assertEqual(self.labels('dun'), ['Dune (1965)', 'Dune Children'])
+        self.assertEqual(self.labels('c'), [])
+
+    def test_overlay_is_merged_into_the_packed_base(self):
+        with mock.patch.object(typeahead, 'MERGE_THRESHOLD', 2):
+            self.index.update(encode_ref(BOOK, 4), 'Dust', ['dust'])
+            self.index.update(encode_ref(BOOK, 3), None)
+        self.assertEqual(self.index._overlay, {})
+        self.assertEqual(self.labels('du'), ['Dune', 'Dune Messiah', 'Dust'])
+        self.assertEqual(self.labels('hy'), [])
+
+    def test_packed_strings(self):
+        packed = PackedStrings(['a', 'bc', '', 'שלום'])
+        self.assertEqual(list(packed), ['a', 'bc', '', 'שלום'])
+        self.assertEqual(len(packed), 4)
+
+    def test_answers_in_well_under_a_millisecond(self):
+        words = [''.join(random.choices(string.ascii_lowercase, k=8)) for _ in range(200_000)]
+        index = PrefixIndex((word, encode_ref(BOOK, pk), word) for pk, word in enumerate(words))
+        timings = []
+        for word in random.sample(words, 1000):
+            started = time.perf_counter()
+            index.search(word[:3])
+            timings.append(time.perf_counter() - started)
+        self.assertLess(statistics.median(timings), 0.0005)
+
+
+class TypeaheadTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.author = Author.objects.create(first_name='Ursula', last_name='Le Guin')
+        cls.book = Book.objects.create(title='The Left Hand of Darkness', summary='-', isbn='9780441478125')
+
+    def setUp(self):
+        cache.clear()
+        typeahead._state.index = None
+
+    def test_suggests_books_and_authors(self):
+        self.assertEqual(typeahead.suggest('  the LEFT'), [('book', self.book.pk, 'The Left Hand of Darkness')])
+        self.assertEqual(typeahead.suggest('le gu'), [('author', self.author.pk, 'Le Guin, Ursula')])
+        self.assertEqual(typeahead.suggest('ursula'), [('author', self.author.pk, 'Le Guin, Ursula')])
+        self.assertEqual(typeahead.suggest(''), [])
+
+    def test_follows_saves_and_deletes(self):
+        typeahead.get_index()
+        self.book.title = 'Left Hand'
+        with self.captureOnCommitCallbacks(execute=True):
+            self.book.save()
+        self.assertEqual(typeahead.suggest('the left'), [])
+        self.assertEqual(typeahead.suggest('left'), [('book', self.book.pk, 'Left Hand')])
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.assertEqual(bulk_delete_books([self.book.pk]), {self.book.pk: 'deleted'})
+        self.assertEqual(typeahead.suggest('left'), [])
+        with self.captureOnCommitCallbacks(execute=True):
+            self.author.delete()
+        self.assertEqual(typeahead.suggest('ursula'), [])
+
+    def test_other_processes_replay_the_journal(self):
+        typeahead.get_index()
+        applied = typeahead._state.applied
+        # another process changes the catalog; this one has not seen it yet
+        with mock.patch.object(typeahead._state, 'index', None), self.captureOnCommitCallbacks(execute=True):
+            Book.objects.create(title='The Dispossessed', summary='-', isbn='9780061054884')
+        typeahead._state.checked_at = 0
+        self.assertEqual(typeahead._state.applied, applied)
+        self.assertEqual([label for _, _, label in typeahead.suggest('the d')], ['The Dispossessed'])
+
+        # with the journal gone the index is rebuilt from the database
+        typeahead._state.index = PrefixIndex()
+        typeahead._state.applied = 0
+        typeahead._state.checked_at = 0
+        cache.delete('typeahead:change:1')
+        with mock.patch.object(typeahead, 'BACKGROUND_REBUILD', False):
+            self.assertEqual(len(typeahead.suggest('the')), 2)
+
+    def test_bulk_delete_is_one_journal_entry(self):
+        books = [
+            Book.objects.create(title=f'Earthsea {index}', summary='-', isbn=f'{index:013d}') for index in range(5)
+        ]
+        typeahead.get_index()
+        sequence = typeahead._current_sequence()
+        with self.captureOnCommitCallbacks(execute=True):
+            bulk_delete_books([book.pk for book in books])
+        self.assertEqual(typeahead._current_sequence(), sequence + 1)
+        self.assertEqual(len(cache.get(f'typeahead:change:{sequence + 1}')), 5)
+        self.assertEqual(typeahead.suggest('earthsea'), [])
+
+    def test_rolled_back_writes_are_not_journaled(self):
+        typeahead.get_index()
+        sequence = typeahead._current_sequence()
+        with self.captureOnCommitCallbacks(execute=True), self.assertRaises(ValueError):
+            with transaction.atomic():
+                Book.objects.create(title='The Lathe of Heaven', summary='-', isbn='9780060512743')
+                raise ValueError('rolled back')
+        self.assertEqual(typeahead._current_sequence(), sequence)
+        self.assertEqual(typeahead.suggest('lathe'), [])
+
+    def test_stale_index_keeps_serving_while_rebuilding_in_background(self):
+        typeahead.get_index()
+        typeahead._state.built_at -= typeahead.MAX_AGE + 1
+        typeahead._state.checked_at = 0
+        started = mock.Mock()
+        with mock.patch.object(typeahead.threading, 'Thread', return_value=started) as thread, \
+                mock.patch.object(typeahead, 'rebuild') as rebuild:
+            with self.assertNumQueries(0):
+                self.assertEqual(len(typeahead.suggest('le')), 1)
+            typeahead._state.checked_at = 0
+            typeahead.suggest('le')
+        # one thread for both stale checks; nothing rebuilt on the request
+        thread.assert_called_once()
+        started.start.assert_called_once_with()
+        rebuild.assert_not_called()
+        typeahead._state.rebuilding = False
+
+    def test_endpoint(self):
+        typeahead.get_index()
+        with self.assertNumQueries(0):
+            response = self.client.get(reverse('typeahead'), {'q': 'le'})
+        self.assertEqual(response.json()['results'], [
+            {'type': 'author', 'label': 'Le Guin, Ursula', 'url': reverse('author-detail', args=[self.author.pk])},
+        ])
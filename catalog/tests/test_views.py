@@ -2,17 +2,21 @@ import copy
 import datetime
 import shutil
 import tempfile
+from io import StringIO
 from pathlib import Path
 
 from django.conf import settings
 from django.contrib.auth import get_user_model
 from django.contrib.auth.models import Group
+from django.core.cache import cache
+from django.core.management import call_command
+from django.db import connection
 from django.test import TestCase, override_settings
 from django.urls import reverse
 from django.utils import timezone
 
 from catalog.models import Author, Book, BookInstance, BookLang, Genre
-from catalog import views as catalog_views
+from catalog import search, views as catalog_views
 
 
 User = get_user_model()
@@ -95,6 +99,292 @@ class AuthorListViewTest(TemplateDirMixin, TestCase):
         self.assertEqual(response.status_code, 200)
         self.assertEqual(len(response.context['author_list']), 3)
 
+    def test_annotates_counts_and_sorts_by_them(self):
+        author = Author.objects.get(last_name='Last 7')
+        language = BookLang.objects.create(booklang='en')
+        for index, statuses in enumerate(['oa', 'o']):
+            book = Book.objects.create(title=f'Title {index}', summary='-', isbn=f'97800000000{index:02d}', author=author)
+            for status in statuses:
+                BookInstance.objects.create(book=book, imprint='-', status=status, booklang=language)
+
+        response = self.client.get(reverse('authors'), {'sort': 'copies'})
+        first = response.context['author_list'][0]
+        self.assertEqual(first, author)
+        self.assertEqual((first.num_titles, first.num_copies, first.num_on_loan), (2, 3, 2))
+
+    def test_last_name_prefix_search(self):
+        response = self.client.get(reverse('authors'), {'q': 'last 1'})
+        self.assertEqual(
+            sorted(author.last_name for author in response.context['author_list']),
+            ['Last 1', 'Last 10', 'Last 11', 'Last 12'],
+        )
+
+    def test_query_count_is_constant(self):
+        with self.assertNumQueries(2):
+            self.client.get(reverse('authors'))
+
+
+class BookListViewTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.author = Author.objects.create(first_name='Ursula', last_name='Le Guin')
+        cls.genre = Genre.objects.create(name='Science Fiction')
+        cls.language = BookLang.objects.create(booklang='en')
+        cls.book = cls._create_book(0, statuses='aaorm')
+
+    @classmethod
+    def _create_book(cls, index, statuses):
+        book = Book.objects.create(
+            title=f'Book {index:02d}',
+            summary='Summary',
+            isbn=f'{index:013d}',
+            author=cls.author,
+        )
+        book.genre.add(cls.genre)
+        for status in statuses:
+            BookInstance.objects.create(
+                book=book, imprint='Imprint', status=status, booklang=cls.language,
+            )
+        return book
+
+    def test_annotates_copy_counts(self):
+        response = self.client.get(reverse('books'))
+        self.assertEqual(response.status_code, 200)
+        book = response.context['book_list'][0]
+        self.assertEqual(
+            (book.num_copies, book.num_available, book.num_on_loan, book.num_reserved),
+            (5, 2, 1, 1),
+        )
+
+    def test_query_count_does_not_grow_with_books(self):
+        with self.assertNumQueries(3):
+            self.client.get(reverse('books'))
+        for index in range(1, 10):
+            self._create_book(index, statuses='aor')
+        with self.assertNumQueries(3):
+            response = self.client.get(reverse('books'))
+        self.assertEqual(len(response.context['book_list']), 10)
+
+    def test_json_endpoint_returns_counts(self):
+        response = self.client.get(reverse('books-json'))
+        self.assertEqual(response.status_code, 200)
+        result = response.json()['results'][0]
+        self.assertEqual(result['title'], 'Book 00')
+        self.assertEqual(result['author'], 'Le Guin, Ursula')
+        self.assertEqual(
+            result['copies'],
+            {'total': 5, 'available': 2, 'on_loan': 1, 'reserved': 1},
+        )
+
+
+class BookBrowseViewTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.tolkien = Author.objects.create(first_name='J. R. R.', last_name='Tolkien')
+        cls.herbert = Author.objects.create(first_name='Frank', last_name='Herbert')
+        cls.fantasy = Genre.objects.create(name='Fantasy')
+        cls.scifi = Genre.objects.create(name='Science Fiction')
+        english = BookLang.objects.create(booklang='en')
+        hebrew = BookLang.objects.create(booklang='he')
+
+        cls.hobbit = Book.objects.create(title='The Hobbit', summary='-', isbn='9780547928227', author=cls.tolkien)
+        cls.hobbit.genre.add(cls.fantasy)
+        cls.dune = Book.objects.create(title='Dune', summary='-', isbn='9780441013593', author=cls.herbert)
+        cls.dune.genre.add(cls.scifi, cls.fantasy)
+        BookInstance.objects.create(book=cls.hobbit, imprint='HMH', status='a', booklang=english)
+        BookInstance.objects.create(book=cls.hobbit, imprint='Am Oved', status='o', booklang=hebrew)
+        BookInstance.objects.create(book=cls.dune, imprint='Ace', status='m', booklang=english)
+
+    def setUp(self):
+        cache.clear()
+
+    def _facet(self, response, name):
+        return {option['label']: option['count'] for option in response.context['facets'][name]}
+
+    def test_facet_counts_without_filters(self):
+        response = self.client.get(reverse('book-browse'))
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(self._facet(response, 'genre'), {'Fantasy': 2, 'Science Fiction': 1})
+        self.assertEqual(self._facet(response, 'lang'), {'English': 2, 'Hebrow': 1})
+        self.assertEqual(response.context['facets']['available'], {'available': 1, 'total': 2})
+
+    def test_filters_narrow_results_and_other_facets(self):
+        response = self.client.get(reverse('book-browse'), {'genre': self.scifi.pk})
+        self.assertEqual(list(response.context['book_list']), [self.dune])
+        self.assertEqual(self._facet(response, 'genre'), {'Fantasy': 2, 'Science Fiction': 1})
+        self.assertEqual(self._facet(response, 'lang'), {'English': 1})
+
+        response = self.client.get(reverse('book-browse'), {'lang': 'he', 'available': '1'})
+        self.assertEqual(list(response.context['book_list']), [self.hobbit])
+
+    def test_junk_ids_are_ignored(self):
+        response = self.client.get(reverse('book-browse'), {'genre': ['\u00b2', 'x', str(self.scifi.pk)]})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(list(response.context['book_list']), [self.dune])
+
+    def test_facets_cached_per_filter_combination(self):
+        with self.assertNumQueries(6):
+            self.client.get(reverse('book-browse'), {'genre': self.fantasy.pk})
+        with self.assertNumQueries(2):
+            self.client.get(reverse('book-browse'), {'genre': self.fantasy.pk})
+
+    def test_cache_invalidated_by_catalog_change(self):
+        self.client.get(reverse('book-browse'))
+        with self.captureOnCommitCallbacks(execute=True):
+            Book.objects.create(title='Silmarillion', summary='-', isbn='9780544338012', author=self.tolkien)
+        response = self.client.get(reverse('book-browse'))
+        self.assertEqual(response.context['facets']['available']['total'], 3)
+
+    def test_genre_detail_redirects_to_browse(self):
+        response = self.client.get(self.fantasy.get_absolute_url())
+        self.assertRedirects(response, f"{reverse('book-browse')}?genre={self.fantasy.pk}")
+
+
+class IndexSearchTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        author = Author.objects.create(first_name='Frank', last_name='Herbert')
+        Book.objects.create(title='Dune', summary='-', isbn='9780441013593', author=author)
+        Book.objects.create(title='Dune Messiah', summary='-', isbn='9780593098233', author=author)
+        Book.objects.create(title='The Hobbit', summary='-', isbn='9780547928227', author=author)
+        cls.staff = User.objects.create_user(username='staff', password='Staff&Pwd123', is_staff=True)
+
+    def setUp(self):
+        cache.clear()
+        search.results.clear()
+
+    def test_get_search_is_cached_per_normalized_term(self):
+        response = self.client.get(reverse('index'), {'book_name': 'dune'})
+        self.assertEqual([book.title for book in response.context['search_results']], ['Dune', 'Dune Messiah'])
+        self.assertIn('max-age', response['Cache-Control'])
+        # the page carries the session cookie, so shared caches must not keep it
+        self.assertIn('private', response['Cache-Control'])
+        self.assertIn('sessionid', response.cookies)
+
+        response = self.client.get(reverse('index'), {'book_name': '  DUNE '})
+        self.assertEqual(len(response.context['search_results']), 2)
+        self.assertEqual((search.results.hits, search.results.misses), (1, 1))
+
+        # a write to Book moves to a new catalog version, so the entry is not reused
+        with self.captureOnCommitCallbacks(execute=True):
+            Book.objects.create(title='Children of Dune', summary='-', isbn='9780593098240')
+        response = self.client.get(reverse('index'), {'book_name': 'dune'})
+        self.assertEqual(len(response.context['search_results']), 3)
+
+    def test_post_search_still_works(self):
+        response = self.client.post(reverse('index'), {'book_name': 'hobbit'})
+        self.assertEqual([book.title for book in response.context['search_results']], ['The Hobbit'])
+
+    @override_settings(SEARCH_THROTTLE_BURST=2, SEARCH_THROTTLE_RATE=0.01)
+    def test_throttle_returns_429(self):
+        for _ in range(2):
+            self.assertEqual(self.client.get(reverse('index'), {'book_name': 'dune'}).status_code, 200)
+        response = self.client.get(reverse('index'), {'book_name': 'dune'})
+        self.assertEqual(response.status_code, 429)
+        self.assertGreater(int(response['Retry-After']), 0)
+        # browsing the index without a search is not throttled
+        self.assertEqual(self.client.get(reverse('index')).status_code, 200)
+
+    @override_settings(SEARCH_THROTTLE_BURST=1, SEARCH_THROTTLE_RATE=0.01, TRUSTED_PROXY_COUNT=1)
+    def test_throttle_keys_on_forwarded_client_behind_proxy(self):
+        proxy = {'REMOTE_ADDR': '10.0.0.1'}
+        first = self.client_class()
+        second = self.client_class()
+        self.assertEqual(
+            first.get(reverse('index'), {'book_name': 'dune'}, HTTP_X_FORWARDED_FOR='203.0.113.1', **proxy).status_code,
+            200,
+        )
+        self.assertEqual(
+            second.get(reverse('index'), {'book_name': 'dune'}, HTTP_X_FORWARDED_FOR='203.0.113.2', **proxy).status_code,
+            200,
+        )
+        # a spoofed left-hand entry does not buy a fresh bucket
+        response = first.get(
+            reverse('index'), {'book_name': 'dune'}, HTTP_X_FORWARDED_FOR='198.51.100.7, 203.0.113.1', **proxy,
+        )
+        self.assertEqual(response.status_code, 429)
+
+    def test_stats_are_staff_only(self):
+        self.client.get(reverse('index'), {'book_name': 'dune'})
+        self.client.login(username='staff', password='Staff&Pwd123')
+        stats = self.client.get(reverse('search-stats')).json()
+        self.assertEqual((stats['misses'], stats['entries']), (1, 1))
+
+
+class AutocompleteViewTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        author = Author.objects.create(first_name='Frank', last_name='Herbert')
+        Author.objects.create(first_name='Herman', last_name='Melville')
+        for index in range(25):
+            Book.objects.create(title=f'Dune {index:02d}', summary='-', isbn=f'{index:013d}', author=author)
+        Book.objects.create(title='Moby Dick', summary='-', isbn='9780142437247', author=author)
+        Genre.objects.create(name='Fantasy')
+        BookLang.objects.create(booklang='he')
+        cls.reader = User.objects.create_user(username='reader', password='1X<ISRUkw+tuK')
+        cls.librarian = User.objects.create_user(username='librarian', password='3Lib&Pwd456')
+        cls.librarian.groups.add(Group.objects.create(name='Librarians'))
+
+    def test_requires_login(self):
+        response = self.client.get(reverse('autocomplete-books'))
+        self.assertEqual(response.status_code, 302)
+
+    def test_books_are_prefix_matched_and_paginated(self):
+        self.client.login(username='reader', password='1X<ISRUkw+tuK')
+        first = self.client.get(reverse('autocomplete-books'), {'q': 'dune'}).json()
+        self.assertEqual(len(first['results']), 20)
+        self.assertEqual(first['results'][0]['text'], 'Dune 00')
+        self.assertTrue(first['pagination']['more'])
+        second = self.client.get(reverse('autocomplete-books'), {'q': 'dune', 'page': 2}).json()
+        self.assertEqual(len(second['results']), 5)
+        self.assertFalse(second['pagination']['more'])
+
+    def test_other_endpoints(self):
+        self.client.login(username='reader', password='1X<ISRUkw+tuK')
+        authors = self.client.get(reverse('autocomplete-authors'), {'q': 'mel'}).json()['results']
+        self.assertEqual([row['text'] for row in authors], ['Melville, Herman'])
+        genres = self.client.get(reverse('autocomplete-genres'), {'q': 'fan'}).json()['results']
+        self.assertEqual([row['text'] for row in genres], ['Fantasy'])
+        self.assertEqual(self.client.get(reverse('autocomplete-genres'), {'q': 'FAN'}).json()['results'], genres)
+        languages = self.client.get(reverse('autocomplete-languages'), {'q': 'heb'}).json()['results']
+        self.assertEqual([row['text'] for row in languages], ['Hebrow'])
+
+    def test_users_are_librarian_only(self):
+        self.client.login(username='reader', password='1X<ISRUkw+tuK')
+        self.assertEqual(self.client.get(reverse('autocomplete-users')).status_code, 403)
+        self.client.login(username='librarian', password='3Lib&Pwd456')
+        results = self.client.get(reverse('autocomplete-users'), {'q': 'rea'}).json()['results']
+        self.assertEqual(results, [{'id': 'reader', 'text': 'reader'}])
+
+    def test_admin_uses_autocomplete(self):
+        admin_user = User.objects.create_superuser(username='admin', password='Admin&Pwd123')
+        self.client.force_login(admin_user)
+        response = self.client.get(reverse('admin:catalog_bookinstance_add'))
+        self.assertNotContains(response, 'Moby Dick')
+        self.assertContains(response, 'admin-autocomplete')
+        response = self.client.get(reverse('admin:autocomplete'), {
+            'app_label': 'catalog', 'model_name': 'bookinstance', 'field_name': 'book', 'term': 'moby',
+        })
+        self.assertEqual([row['text'] for row in response.json()['results']], ['Moby Dick'])
+
+    def test_prefix_search_uses_the_lower_title_index(self):
+        queryset = Book.objects.title_startswith('DUNE 1')
+        self.assertEqual(queryset.count(), 10)
+        if connection.vendor == 'sqlite':
+            self.assertIn('USING INDEX book_title_lower_idx', queryset.explain())
+
+    def test_admin_user_search(self):
+        admin_user = User.objects.create_superuser(username='admin', password='Admin&Pwd123')
+        User.objects.filter(pk=self.reader.pk).update(email='ishmael@example.com')
+        self.client.force_login(admin_user)
+        # the changelist keeps the stock search, e.g. by email
+        response = self.client.get(reverse('admin:auth_user_changelist'), {'q': 'ishmael'})
+        self.assertEqual(list(response.context['cl'].result_list), [self.reader])
+        response = self.client.get(reverse('admin:autocomplete'), {
+            'app_label': 'catalog', 'model_name': 'bookinstance', 'field_name': 'borrower', 'term': 'lib',
+        })
+        self.assertEqual([row['text'] for row in response.json()['results']], ['librarian'])
+
 
 class LoanedBookInstancesByUserListViewTest(TestCase):
     @classmethod
@@ -152,6 +442,18 @@ class LoanedBookInstancesByUserListViewTest(TestCase):
             self.assertEqual(book_instance.borrower, self.user1)
             self.assertEqual(book_instance.status, 'o')
 
+    def test_loan_history_lists_past_loans(self):
+        instance = BookInstance.objects.filter(borrower=self.user1).first()
+        instance.status = 'o'
+        instance.save()
+        instance.status = 'a'
+        instance.save()
+
+        self.client.login(username='testuser1', password='1X<ISRUkw+tuK')
+        response = self.client.get(reverse('my-loan-history'))
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual([event.book for event in response.context['loanevent_list']], [self.book])
+
     def test_pages_ordered_by_due_date(self):
         for offset, instance in enumerate(BookInstance.objects.filter(borrower=self.user1).order_by('pk')):
             instance.status = 'o'
@@ -273,6 +575,13 @@ class RenewBookInstancesViewTest(TestCase):
         self.book_instance.refresh_from_db()
         self.assertEqual(self.book_instance.due_back, valid_date)
 
+    def test_copy_lookup_redirects_to_renew_page(self):
+        self.client.login(username='librarian', password='Lib&Pwd123')
+        response = self.client.get(
+            reverse('copy-lookup', args=[self.book_instance.book_id, self.book_instance.copy_no])
+        )
+        self.assertRedirects(response, self.url)
+
     def test_post_invalid_past_date(self):
         self.client.login(username='librarian', password='Lib&Pwd123')
         invalid_date = datetime.date.today() - datetime.timedelta(days=1)
@@ -286,3 +595,143 @@ class RenewBookInstancesViewTest(TestCase):
         response = self.client.post(self.url, {'renewal_date': invalid_date})
         self.assertEqual(response.status_code, 200)
         self.assertFormError(response, 'form', 'renewal_date', 'Invalid date - renewal more than 4 weeks ahead')
+
+
+class BookInstanceBulkUpdateViewTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        group = Group.objects.create(name='Librarians')
+        cls.librarian = User.objects.create_user(username='librarian', password='Lib&Pwd123')
+        cls.librarian.groups.add(group)
+        cls.reader = User.objects.create_user(username='reader', password='Read&Pwd123')
+        language = BookLang.objects.create(booklang='en')
+        book = Book.objects.create(title='Shelf', summary='-', isbn='9780306406157')
+        cls.copies = [
+            BookInstance.objects.create(book=book, imprint='-', booklang=language, status='m')
+            for _ in range(3)
+        ]
+        cls.url = reverse('bookinstance-bulk-update')
+
+    def test_forbidden_if_not_librarian(self):
+        self.client.login(username='reader', password='Read&Pwd123')
+        self.assertEqual(self.client.get(self.url).status_code, 403)
+
+    def test_lends_copies_in_bulk(self):
+        self.client.login(username='librarian', password='Lib&Pwd123')
+        due = datetime.date.today() + datetime.timedelta(weeks=2)
+        missing = '01a15444-536c-7f69-8260-49cb5bea1735'
+        response = self.client.post(self.url, {
+            'copy_ids': '\n'.join([str(copy.pk) for copy in self.copies[:2]] + [missing]),
+            'status': 'o',
+            'due_back': due,
+            'borrower': 'reader',
+        })
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.context['result']['updated'], 2)
+        self.assertEqual([str(copy_id) for copy_id in response.context['result']['unknown']], [missing])
+        self.assertEqual(
+            BookInstance.objects.filter(status='o', borrower=self.reader, due_back=due).count(), 2,
+        )
+
+    def test_rejects_bad_ids(self):
+        self.client.login(username='librarian', password='Lib&Pwd123')
+        response = self.client.post(self.url, {'copy_ids': 'not-a-uuid', 'status': 'a'})
+        self.assertFormError(response.context['form'], 'copy_ids', 'Invalid copy id: not-a-uuid')
+
+
+class PaginatedAdminInlineTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.admin_user = User.objects.create_superuser(username='admin', password='Admin&Pwd123')
+        cls.language = BookLang.objects.create(booklang='en')
+        cls.author = Author.objects.create(first_name='Busy', last_name='Author')
+        cls.book = Book.objects.create(title='Popular', summary='-', isbn='9780306406157', author=cls.author)
+
+    def _add_copies(self, count, start=0):
+        readers = [User.objects.create_user(username=f'reader{index}') for index in range(start, start + count)]
+        BookInstance.objects.bulk_create(
+            BookInstance(book=self.book, imprint=f'Imprint {index}', booklang=self.language,
+                         status='o', borrower=reader, due_back=datetime.date.today())
+            for index, reader in enumerate(readers)
+        )
+
+    def _change_page_queries(self, **params):
+        from django.db import connection
+        from django.test.utils import CaptureQueriesContext
+
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(reverse('admin:catalog_book_change', args=[self.book.pk]), params)
+        self.assertEqual(response.status_code, 200)
+        return response, len(queries)
+
+    def test_query_count_does_not_grow_with_copies(self):
+        self.client.force_login(self.admin_user)
+        self._add_copies(5)
+        self._change_page_queries()   # loads the session and user into the cache
+        _, few = self._change_page_queries()
+
+        # 25 rendered rows with borrowers and languages cost the same queries as 5
+        self._add_copies(40, start=5)
+        response, many = self._change_page_queries()
+        self.assertEqual(few, many)
+        self.assertContains(response, 'Page 1 of 2 (45 rows)')
+        self.assertContains(response, 'reader24')
+        self.assertNotContains(response, 'reader25')
+
+    def test_second_page(self):
+        self.client.force_login(self.admin_user)
+        self._add_copies(30)
+        response, _ = self._change_page_queries(**{'bookinstance_set-page': 2})
+        self.assertContains(response, 'reader29')
+        self.assertNotContains(response, 'reader3"')
+        self.assertContains(response, 'Page 2 of 2')
+
+    def test_author_books_inline_is_paginated(self):
+        self.client.force_login(self.admin_user)
+        Book.objects.bulk_create(
+            Book(title=f'Extra {index:02d}', summary='-', isbn=f'{index:013d}', author=self.author) for index in range(30)
+        )
+        response = self.client.get(reverse('admin:catalog_author_change', args=[self.author.pk]))
+        self.assertContains(response, 'Page 1 of 2 (31 rows)')
+
+    def test_save_writes_only_the_page_and_changed_rows(self):
+        from django.db import connection
+        from django.test.utils import CaptureQueriesContext
+
+        self.client.force_login(self.admin_user)
+        self._add_copies(30)
+        self.book.genre.add(Genre.objects.create(name='Popular'))
+        url = reverse('admin:catalog_book_change', args=[self.book.pk]) + '?bookinstance_set-page=2'
+        response = self.client.get(url)
+        data = {}
+        for form in [response.context['adminform'].form, *response.context['inline_admin_formsets'][0].formset]:
+            for field in form:
+                value = field.value()
+                if value is None:
+                    continue
+                data[field.html_name] = [str(item) for item in value] if isinstance(value, list) else str(value)
+                if field.field.show_hidden_initial:
+                    data[field.html_initial_name] = data[field.html_name]
+        formset = response.context['inline_admin_formsets'][0].formset
+        data.update({f'{formset.prefix}-{key}': value for key, value in formset.management_form.initial.items()})
+        edited = formset.forms[0].instance
+        data[formset.forms[0]['imprint'].html_name] = 'Rebound'
+
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.post(url, data)
+        self.assertEqual(response.status_code, 302)
+        self.assertEqual(list(BookInstance.objects.filter(imprint='Rebound')), [edited])
+        updates = [query['sql'] for query in queries if query['sql'].startswith('UPDATE "catalog_bookinstance"')]
+        self.assertEqual(len(updates), 1)
+
+
+class StartupImportTest(TestCase):
+    def test_public_pages_do_not_load_the_admin(self):
+        out = StringIO()
+        call_command(
+            'profile_startup', top=1, check=['catalog.admin', 'import_export.admin', 'tablib', 'numpy'], stdout=out,
+        )
+        self.assertIn('public urls', out.getvalue())
+
+    def test_admin_is_loaded_on_first_use(self):
+        self.assertEqual(reverse('admin:catalog_book_changelist'), '/admin/catalog/book/')
@@ -0,0 +1,37 @@
+import os
+import sys
+import unittest
+from unittest import mock
+
+from django.db import connections
+from django.template import engines
+from django.test import SimpleTestCase
+
+from catalog.warmup import memory_kb, warm_database, warm_templates, warm_urls
+
+
+class WarmUpTest(SimpleTestCase):
+    def test_compiles_project_templates_into_the_cached_loader(self):
+        loader = engines['django'].engine.template_loaders[0]
+        loader.reset()
+        self.assertGreater(warm_templates(), 10)
+        self.assertIn('catalog/book_list.html', loader.get_template_cache)
+        self.assertNotIn('admin/base.html', loader.get_template_cache)
+
+    def test_loads_the_admin_urls_on_request(self):
+        warm_urls(admin=True)
+        self.assertIn('catalog.admin', sys.modules)
+
+    @unittest.skipUnless(os.path.exists('/proc/self/status'), 'needs /proc')
+    def test_memory_usage(self):
+        usage = memory_kb()
+        self.assertGreater(usage['rss'], 0)
+
+    def test_closes_connection_pools_before_fork(self):
+        connection = connections['default']
+        options = {**connection.settings_dict['OPTIONS'], 'pool': {'max_size': 4}}
+        with mock.patch.dict(connection.settings_dict, OPTIONS=options), \
+                mock.patch.object(connection, 'ensure_connection'), \
+                mock.patch.object(connection, 'close_pool', create=True) as close_pool:
+            warm_database()
+        close_pool.assert_called_once_with()
@@ -0,0 +1,316 @@
+"""Title and author suggestions for the search box, served from memory.
+
+Each process keeps a :class:`PrefixIndex` of normalized book titles and
+author names ("first last" and "last first").  A prefix query is a binary
+search into a sorted array followed by a short forward scan, so answering
+does not touch the database.
+
+The bulk of the index is packed: all keys in one string plus an offset
+array, all labels likewise, and an ``array`` of ids.  That is a handful
+of large objects instead of several small ones per title, which keeps
+memory per million titles in the tens of megabytes and lets a preloaded
+gunicorn master share the index with its workers (see warmup.py).
+
+Changes made through save()/delete() are applied to a small sorted
+overlay, plus a set of hidden base entries, and are folded into the
+packed base once the overlay grows past MERGE_THRESHOLD.  They also go
+into a short journal in the shared cache, one entry per write, so a bulk
+delete costs two cache round-trips however many rows it removes.  Both
+happen when the write's transaction commits.  Other
+processes replay the journal at most once per SYNC_INTERVAL.
+
+A process that cannot replay rebuilds from the database.  This happens
+when the journal has expired, or when the index is older than MAX_AGE,
+which also covers bulk writes that send no signals.  The rebuild runs in
+a background thread while the current index keeps answering, so no
+request waits for it.  Only a process with no index at all builds one
+on a request, and under gunicorn the warm-up does that before forking.
+"""
+import logging
+import threading
+import time
+from array import array
+from bisect import bisect_left, insort
+
+from django.core.cache import cache
+from django.db import connection, transaction
+
+from .models import Author, Book
+from .search import normalize_term
+
+BOOK, AUTHOR = 0, 1
+KINDS = ('book', 'author')
+SUGGESTION_LIMIT = 10
+MERGE_THRESHOLD = 10000
+SYNC_INTERVAL = 1.0
+MAX_AGE = 3600
+JOURNAL_TTL = 3600
+MAX_REPLAY = 1000
+SEQUENCE_KEY = 'typeahead:seq'
+BACKGROUND_REBUILD = True
+
+logger = logging.getLogger(__name__)
+
+
+def encode_ref(kind, pk):
+    return pk << 1 | kind
+
+
+def decode_ref(ref):
+    return ref & 1, ref >> 1
+
+
+class PackedStrings:
+    """An immutable sequence of strings stored as one string plus offsets; works with bisect."""
+
+    def __init__(self, strings):
+        self._blob = ''.join(strings)
+        offsets = [0]
+        for string in strings:
+            offsets.append(offsets[-1] + len(string))
+        self._offsets = array('I' if offsets[-1] < 2 ** 32 else 'Q', offsets)
+
+    def __len__(self):
+        return len(self._offsets) - 1
+
+    def __getitem__(self, index):
+        return self._blob[self._offsets[index]:self._offsets[index + 1]]
+
+
+class PrefixIndex:
+    """Sorted (key, ref, label) entries searchable by key prefix.
+
+    A ref identifies one book or author (see :func:`encode_ref`); an author
+    has two keys.  Suggestions are distinct refs in key order.
+    """
+
+    def __init__(self, entries=()):
+        self._lock = threading.Lock()
+        self._build(list(entries))
+
+    def _build(self, entries):
+        entries.sort()
+        self._keys = PackedStrings([key for key, _, _ in entries])
+        self._labels = PackedStrings([label for _, _, label in entries])
+        self._refs = array('q', [ref for _, ref, _ in entries])
+        self._hidden = set()        # refs whose base entries are out of date
+        self._overlay = {}          # ref -> (label, keys) for changes since the build
+        self._overlay_keys = []     # sorted (key, ref)
+
+    def __len__(self):
+        return len(self._refs) + sum(len(keys) for _, keys in self._overlay.values())
+
+    def update(self, ref, label, keys=()):
+        """Replace the entries of `ref`; a label of None removes them."""
+        with self._lock:
+            previous = self._overlay.pop(ref, None)
+            if previous is not None:
+                for key in previous[1]:
+                    del self._overlay_keys[bisect_left(self._overlay_keys, (key, ref))]
+            self._hidden.add(ref)
+            if label is not None:
+                self._overlay[ref] = (label, keys)
+                for key in keys:
+                    insort(self._overlay_keys, (key, ref))
+            if len(self._overlay) + len(self._hidden) > MERGE_THRESHOLD:
+                self._merge()
+
+    def _merge(self):
+        entries = [
+            (self._keys[index], ref, self._labels[index])
+            for index, ref in enumerate(self._refs) if ref not in self._hidden
+        ]
+        entries.extend((key, ref, label) for ref, (label, keys) in self._overlay.items() for key in keys)
+        self._build(entries)
+
+    def search(self, prefix, limit=SUGGESTION_LIMIT):
+        """Return up to `limit` (ref, label) pairs whose key starts with `prefix`."""
+        with self._lock:
+            found = self._scan_base(prefix, limit)
+            start = bisect_left(self._overlay_keys, (prefix,))
+            seen = set()
+            for key, ref in self._overlay_keys[start:]:
+                if not key.startswith(prefix) or len(seen) == limit:
+                    break
+                if ref not in seen:
+                    seen.add(ref)
+                    found.append((key, ref, self._overlay[ref][0]))
+        found.sort()
+        results, seen = [], set()
+        for _, ref, label in found:
+            if ref not in seen:
+                seen.add(ref)
+                results.append((ref, label))
+        return results[:limit]
+
+    def _scan_base(self, prefix, limit):
+        keys, refs, hidden = self._keys, self._refs, self._hidden
+        found, seen = [], set()
+        index = bisect_left(keys, prefix)
+        while index < len(refs) and len(seen) < limit:
+            key = keys[index]
+            if not key.startswith(prefix):
+                break
+            ref = refs[index]
+            if ref not in hidden and ref not in seen:
+                seen.add(ref)
+                found.append((key, ref, self._labels[index]))
+            index += 1
+        return found
+
+
+def book_entry(title):
+    return title, [normalize_term(title)]
+
+
+def author_entry(first_name, last_name):
+    return f'{last_name}, {first_name}', sorted({
+        normalize_term(f'{first_name} {last_name}'), normalize_term(f'{last_name} {first_name}'),
+    })
+
+
+def load_entries():
+    for pk, title in Book.objects.values_list('pk', 'title').iterator(chunk_size=10000):
+        label, keys = book_entry(title)
+        ref = encode_ref(BOOK, pk)
+        yield from ((key, ref, label) for key in keys)
+    for pk, first_name, last_name in Author.objects.values_list(
+        'pk', 'first_name', 'last_name',
+    ).iterator(chunk_size=10000):
+        label, keys = author_entry(first_name, last_name)
+        ref = encode_ref(AUTHOR, pk)
+        yield from ((key, ref, label) for key in keys)
+
+
+class _State:
+    index = None
+    built_at = 0.0
+    applied = 0      # last journal sequence number reflected in the index
+    checked_at = 0.0
+    rebuilding = False
+
+
+_state = _State()
+_build_lock = threading.Lock()   # one build at a time
+_state_lock = threading.Lock()   # swapping the index vs. replaying the journal into it
+
+
+def _current_sequence():
+    return cache.get(SEQUENCE_KEY, 0)
+
+
+def rebuild():
+    """Build this process's index from the database."""
+    with _build_lock:
+        sequence = _current_sequence()
+        index = PrefixIndex(load_entries())
+        with _state_lock:
+            # changes after `sequence` are replayed by the next sync; replaying
+            # one the load already saw is harmless, as updates replace entries
+            _state.index, _state.applied = index, sequence
+            _state.built_at = _state.checked_at = time.monotonic()
+    return index
+
+
+def _background_rebuild():
+    try:
+        rebuild()
+    except Exception:
+        logger.exception('Typeahead rebuild failed; the current index keeps serving')
+    finally:
+        _state.rebuilding = False
+        connection.close()
+
+
+def rebuild_later():
+    """Rebuild in a background thread, unless one is already running."""
+    if not BACKGROUND_REBUILD:
+        rebuild()
+        return
+    with _state_lock:
+        if _state.rebuilding:
+            return
+        _state.rebuilding = True
+    threading.Thread(target=_background_rebuild, name='typeahead-rebuild', daemon=True).start()
+
+
+def _sync():
+    now = time.monotonic()
+    if now - _state.checked_at < SYNC_INTERVAL:
+        return
+    _state.checked_at = now
+    if now - _state.built_at > MAX_AGE:
+        rebuild_later()
+    applied, sequence = _state.applied, _current_sequence()
+    if sequence == applied:
+        return
+    if not 0 < sequence - applied <= MAX_REPLAY:
+        rebuild_later()
+        return
+    keys = [f'typeahead:change:{number}' for number in range(applied + 1, sequence + 1)]
+    entries = cache.get_many(keys)
+    if len(entries) < len(keys):
+        rebuild_later()
+        return
+    with _state_lock:
+        if _state.applied != applied:
+            return   # a rebuild was swapped in meanwhile; the next sync catches up
+        for key in keys:
+            for change in entries[key]:
+                _state.index.update(*change)
+        _state.applied = sequence
+
+
+def get_index():
+    if _state.index is None:
+        rebuild()
+    else:
+        _sync()
+    return _state.index
+
+
+def record_changes(changes, using=None):
+    """Apply (ref, label, keys) changes to this process's index and journal them as one entry.
+
+    Both happen once the current transaction on `using` commits, so a
+    rolled-back write never reaches any process's index.
+    """
+    changes = [(ref, label, list(keys)) for ref, label, keys in changes]
+    if changes:
+        transaction.on_commit(lambda: _publish(changes), using=using)
+
+
+def _publish(changes):
+    try:
+        sequence = cache.incr(SEQUENCE_KEY)
+    except ValueError:
+        cache.add(SEQUENCE_KEY, 0, timeout=None)
+        sequence = cache.incr(SEQUENCE_KEY)
+    cache.set(f'typeahead:change:{sequence}', changes, JOURNAL_TTL)
+    if _state.index is not None:
+        for change in changes:
+            _state.index.update(*change)
+
+
+def book_changed(book, using=None):
+    record_changes([(encode_ref(BOOK, book.pk), *book_entry(book.title))], using=using)
+
+
+def author_changed(author, using=None):
+    record_changes(
+        [(encode_ref(AUTHOR, author.pk), *author_entry(author.first_name, author.last_name))], using=using,
+    )
+
+
+def removed(kind, pks, using=None):
+    record_changes(((encode_ref(kind, pk), None, ()) for pk in pks), using=using)
+
+
+def suggest(term, limit=SUGGESTION_LIMIT):
+    """Suggestions for a partly typed term, as (kind, pk, label) tuples."""
+    prefix = normalize_term(term)
+    if not prefix:
+        return []
+    return [(KINDS[kind], pk, label) for kind, pk, label in (
+        (*decode_ref(ref), label) for ref, label in get_index().search(prefix, limit)
+    )]
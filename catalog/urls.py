@@ -1,9 +1,15 @@
 from django.urls import path
-from . import views
+from . import api, autocomplete, views
 
 urlpatterns = [
     path('', views.index, name='index'),
+    path('search/stats.json', views.search_stats, name='search-stats'),
+    path('cache/stats.json', views.cache_stats, name='cache-stats'),
+    path('typeahead/', views.typeahead_suggestions, name='typeahead'),
     path('books/', views.BookListView.as_view(), name='books'),
+    path('books.json', views.book_list_json, name='books-json'),
+    path('browse/', views.BookBrowseView.as_view(), name='book-browse'),
+    path('genre/<int:pk>', views.genre_detail, name='genre-detail'),
     path('book/<int:pk>', views.BookDetailView.as_view(), name='book-detail'),
     path('book/create/', views.BookCreate.as_view(), name='book-create'),
     path('book/<int:pk>/update/', views.BookUpdate.as_view(), name='book-update'),
@@ -11,10 +17,27 @@ urlpatterns = [
     path('authors/', views.AuthorListView.as_view(), name='authors'),
     path('author/<int:pk>', views.AuthorDetailView.as_view(), name='author-detail'),
     path('mybooks/', views.LoanedBooksByUserListView.as_view(), name='my-borrowed'),
+    path('mybooks/history/', views.LoanHistoryListView.as_view(), name='my-loan-history'),
     path('allbooks/', views.AllLoanedBooksByUserListView.as_view(), name='all-borrowed'),
     path('book/<uuid:pk>/renew/', views.renew_book_librarian, name='renew-book-librarian'),
+    path('book/<int:book_pk>/copy/<int:copy_no>/', views.copy_lookup, name='copy-lookup'),
+    path('copies/bulk/', views.bookinstance_bulk_update, name='bookinstance-bulk-update'),
+    path('reports/', views.report_list, name='reports'),
+    path('reports/<slug:slug>/', views.report_detail, name='report-detail'),
     path('author/create/', views.AuthorCreate.as_view(), name='author-create'),
     path('author/<int:pk>/update/', views.AuthorUpdate.as_view(), name='author-update'),
     path('author/<int:pk>/delete/', views.AuthorDelete.as_view(), name='author-delete'),
-
+    path('autocomplete/books/', autocomplete.books, name='autocomplete-books'),
+    path('autocomplete/authors/', autocomplete.authors, name='autocomplete-authors'),
+    path('autocomplete/genres/', autocomplete.genres, name='autocomplete-genres'),
+    path('autocomplete/languages/', autocomplete.languages, name='autocomplete-languages'),
+    path('autocomplete/users/', autocomplete.users, name='autocomplete-users'),
+    path('api/books/', api.book_list, name='api-books'),
+    path('api/books/<int:pk>/', api.book_detail, name='api-book-detail'),
+    path('api/books/<int:pk>/copies/', api.book_copies, name='api-book-copies'),
+    path('api/authors/', api.author_list, name='api-authors'),
+    path('api/authors/<int:pk>/', api.author_detail, name='api-author-detail'),
+    path('api/genres/', api.genre_list, name='api-genres'),
+    path('api/isbn/', api.isbn_lookup, name='api-isbn-lookup'),
+    path('api/me/loans/', api.my_loans, name='api-my-loans'),
 ]
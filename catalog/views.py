@@ -1,12 +1,19 @@
-from django.http import HttpResponseRedirect
-from catalog.forms import RenewBookForm
+import csv
+import math
+from django.core.paginator import Paginator
+from django.conf import settings
+from django.http import HttpResponse, HttpResponseRedirect, JsonResponse
+from django.utils.cache import patch_cache_control
+from catalog.forms import BookForm, BookInstanceBulkForm, RenewBookForm
 import datetime
 from django.contrib.auth.decorators import login_required, permission_required
 from django.shortcuts import render
 from django.template.defaultfilters import title
 from django.views import generic
-from .admin import BookInline
-from .models import Book, Author, BookInstance, Genre
+from . import facets, reports, search, typeahead
+from .cache import cache_stats as catalog_cache_stats, get_or_compute
+from .models import ArchivedBookInstance, Book, Author, BookInstance, BookSimilarity, Genre, LoanEvent
+from .services import BLOCKED, bulk_delete_authors, bulk_delete_books, bulk_update_copies
 from django.shortcuts import get_object_or_404, render
 from django.contrib.auth.mixins import LoginRequiredMixin, UserPassesTestMixin
 from django.views.generic.edit import CreateView, UpdateView, DeleteView
@@ -18,67 +25,224 @@ from django.contrib.auth.mixins import LoginRequiredMixin, UserPassesTestMixin,
 def index(request):
 
     """View function for home page of site."""
-    # Generate counts of some of the main objects
-    num_books = Book.objects.all().count()
-    num_instances = BookInstance.objects.all().count()
-
-    # Available books (status = 'a')
-    num_instances_available = BookInstance.objects.filter(status__exact='a').count()
-
-    # The 'all()' is implied by default.
-    num_authors = Author.objects.count()
-    num_genre = Genre.objects.count()
+    # Generate counts of some of the main objects (cached until the catalog changes)
+    counts = get_or_compute('index:counts', lambda: {
+        'num_books': Book.objects.all().count(),
+        'num_instances': BookInstance.objects.all().count(),
+        # Available books (status = 'a')
+        'num_instances_available': BookInstance.objects.filter(status__exact='a').count(),
+        # The 'all()' is implied by default.
+        'num_authors': Author.objects.count(),
+        'num_genre': Genre.objects.count(),
+    })
 
     num_visits = request.session.get('num_visits', 0)
     num_visits += 1
     request.session['num_visits'] = num_visits
     username_visits = request.session.get('username', "User")
 
-    # Handle book search
+    # Handle book search (GET ?book_name= so result pages are cacheable; POST still accepted)
     search_results = None
-    if request.method == 'POST':
-        book_name = request.POST.get('book_name', '')
-        if book_name:
-            # Search for books containing the search term (case-insensitive)
-            search_results = Book.objects.filter(title__icontains=book_name)
-
+    params = request.POST if request.method == 'POST' else request.GET
+    book_name = search.normalize_term(params.get('book_name', ''))
+    if book_name:
+        retry_after = search.throttle_search(request)
+        if retry_after:
+            response = HttpResponse('Too many searches, please slow down.', status=429)
+            response['Retry-After'] = str(math.ceil(retry_after))
+            return response
+        # Search for books containing the search term (case-insensitive)
+        search_results = search.search_books(book_name)
 
     context = {
-        'num_books': num_books,
-        'num_instances': num_instances,
-        'num_instances_available': num_instances_available,
-        'num_authors': num_authors,
-        'num_genre': num_genre,
+        **counts,
         'search_results': search_results,
+        'book_name': book_name,
         'num_visits' : num_visits,
         'username_visits' : username_visits
     }
 
     # Render the HTML template index.html with the data in the context variable
-    return render(request, 'index.html', context=context)
+    response = render(request, 'index.html', context=context)
+    if search_results is not None and request.method == 'GET':
+        # הדף אישי (סשן, שם משתמש, CSRF) - רק הדפדפן רשאי לשמור אותו, לא פרוקסי משותף
+        patch_cache_control(response, private=True, max_age=settings.SEARCH_CACHE_TTL)
+    return response
+
+
+@login_required
+def search_stats(request):
+    """סטטיסטיקת מטמון החיפוש של התהליך הנוכחי (לצוות בלבד)."""
+    from django.http import HttpResponseForbidden
+    if not request.user.is_staff:
+        return HttpResponseForbidden("Access denied: staff only.")
+    return JsonResponse(search.results.stats())
+
+
+@login_required
+def cache_stats(request):
+    """מוני המטמון המשותף (פגיעות, החטאות, רענון מוקדם, פינויים) בתהליך הנוכחי - לצוות בלבד."""
+    from django.http import HttpResponseForbidden
+    if not request.user.is_staff:
+        return HttpResponseForbidden("Access denied: staff only.")
+    return JsonResponse(catalog_cache_stats())
+
+
+def typeahead_suggestions(request):
+    """הצעות לתיבת החיפוש תוך כדי הקלדה - ספרים ומחברים, מאינדקס בזיכרון בלי פנייה למסד."""
+    suggestions = [
+        {
+            'type': kind,
+            'label': label,
+            'url': reverse('book-detail' if kind == 'book' else 'author-detail', args=[pk]),
+        }
+        for kind, pk, label in typeahead.suggest(request.GET.get('q', ''))
+    ]
+    response = JsonResponse({'results': suggestions})
+    patch_cache_control(response, max_age=30)
+    return response
+
+
+class FilterQueryMixin:
+    """מעביר לתבנית את מחרוזת הסינון כדי שקישורי העמודים ישמרו אותה."""
+
+    def get_context_data(self, **kwargs):
+        context = super().get_context_data(**kwargs)
+        query = self.request.GET.copy()
+        query.pop('page', None)
+        context['filter_query'] = query.urlencode()
+        return context
 
-class BookListView(generic.ListView):
+
+def book_list_queryset():
+    """ספרים עם ספירת עותקים לפי סטטוס, מחבר וז׳אנרים - מספר שאילתות קבוע לכל עמוד."""
+    return (
+        Book.objects.with_availability()
+        .select_related('author')
+        .prefetch_related('genre')
+        .order_by('title', 'pk')
+    )
+
+
+class BookListView(FilterQueryMixin, generic.ListView):
     model = Book
     paginate_by = 10
     context_object_name  = 'book_list'   # שם משלכם לרשימה כמשתנה תבנית
-    queryset = Book.objects.all()#filter(title__contains='ספר')[:5] # קבל 5 ספרים המכילים את הכותרת 'war'
     template_name = 'books/my_arbitrary_template_name_list.html'  # ציינו שם/מיקום תבנית משלכם
 
+    def get_queryset(self):
+        queryset = book_list_queryset()
+        if self.request.GET.get('available'):
+            queryset = queryset.available_now()
+        return queryset
+
+
+def book_list_json(request):
+    """אותו עמוד של רשימת הספרים, בפורמט JSON."""
+    books = book_list_queryset().values(
+        'id', 'title', 'isbn', 'author__first_name', 'author__last_name',
+        'num_copies', 'num_available', 'num_on_loan', 'num_reserved',
+    )
+    page = Paginator(books, BookListView.paginate_by).get_page(request.GET.get('page'))
+    return JsonResponse({
+        'page': page.number,
+        'num_pages': page.paginator.num_pages,
+        'results': [
+            {
+                'id': book['id'],
+                'title': book['title'],
+                'isbn': book['isbn'],
+                'author': f"{book['author__last_name']}, {book['author__first_name']}"
+                if book['author__last_name'] is not None else None,
+                'url': reverse('book-detail', args=[book['id']]),
+                'copies': {
+                    'total': book['num_copies'],
+                    'available': book['num_available'],
+                    'on_loan': book['num_on_loan'],
+                    'reserved': book['num_reserved'],
+                },
+            }
+            for book in page.object_list
+        ],
+    })
+
+class BookBrowseView(FilterQueryMixin, generic.ListView):
+    """עיון בקטלוג לפי ז׳אנר, שפה, מחבר וזמינות, עם ספירות לכל ערך."""
+    model = Book
+    paginate_by = 10
+    context_object_name = 'book_list'
+    template_name = 'catalog/book_browse.html'
+
+    def get_queryset(self):
+        self.filters = facets.parse_filters(self.request.GET)
+        return facets.filter_books(
+            Book.objects.select_related('author').order_by('title', 'pk'),
+            self.filters,
+        )
+
+    def get_context_data(self, **kwargs):
+        context = super().get_context_data(**kwargs)
+        context['filters'] = self.filters
+        context['facets'] = facets.facet_counts(self.filters)
+        return context
+
+
+def genre_detail(request, pk):
+    """עמוד ז׳אנר הוא עיון בקטלוג המסונן לז׳אנר הזה."""
+    genre = get_object_or_404(Genre, pk=pk)
+    return HttpResponseRedirect(f"{reverse('book-browse')}?genre={genre.pk}")
+
+
 class BookDetailView(generic.DetailView):
     model = Book
 
+    def get_context_data(self, **kwargs):
+        context = super().get_context_data(**kwargs)
+        # ספרים דומים מחושבים מראש (build_recommendations); שאילתה אחת על האינדקס (book, rank)
+        context['similar_books'] = (
+            BookSimilarity.objects.filter(book=self.object)
+            .select_related('similar__author')
+            .order_by('rank')
+        )
+        # עותקים שהועברו לארכיון מוצגים רק כשמבקשים במפורש (?include_archived=1)
+        context['include_archived'] = self.request.GET.get('include_archived') == '1'
+        if context['include_archived']:
+            context['archived_copies'] = ArchivedBookInstance.objects.filter(book=self.object).order_by('copy_no')
+        return context
+
     def book_detail_view(request, primary_key):
         book = get_object_or_404(Book, pk=primary_key)
         return render(request, 'catalog/book_detail.html', context={'book': book})
 
 
-class AuthorListView(generic.ListView):
+class AuthorListView(FilterQueryMixin, generic.ListView):
     model = Author
     paginate_by = 10
     context_object_name = 'author_list'   # שם משלכם לרשימה כמשתנה תבנית
-    queryset = Author.objects.all()#filter(title__contains='ספר')[:5] # קבל 5 ספרים המכילים את הכותרת 'war'
     template_name = 'author/my_arbitrary_template_name_list.html'  # ציינו שם/מיקום תבנית משלכם
 
+    # ?sort=<key> -> סדר המיון; המספרים יורדים, השם עולה
+    SORT_ORDERS = {
+        'name': ('last_name', 'first_name'),
+        'titles': ('-num_titles', 'last_name', 'first_name'),
+        'copies': ('-num_copies', 'last_name', 'first_name'),
+        'on_loan': ('-num_on_loan', 'last_name', 'first_name'),
+    }
+
+    def get_queryset(self):
+        queryset = Author.objects.with_counts()
+        prefix = self.request.GET.get('q', '').strip()
+        if prefix:
+            queryset = queryset.last_name_startswith(prefix)
+        self.sort = self.request.GET.get('sort') if self.request.GET.get('sort') in self.SORT_ORDERS else 'name'
+        return queryset.order_by(*self.SORT_ORDERS[self.sort], 'pk')
+
+    def get_context_data(self, **kwargs):
+        context = super().get_context_data(**kwargs)
+        context['sort'] = self.sort
+        context['search_prefix'] = self.request.GET.get('q', '')
+        return context
+
 
 class AuthorDetailView(LoginRequiredMixin, generic.DetailView):
     model = Author
@@ -105,6 +269,16 @@ class LoanedBooksByUserListView(LoginRequiredMixin, generic.ListView):
         return(obj.borrower)
 
 
+class LoanHistoryListView(LoginRequiredMixin, generic.ListView):
+    """היסטוריית ההשאלות של המשתמש הנוכחי, מהחדשה לישנה."""
+    model = LoanEvent
+    template_name = 'catalog/loan_history.html'
+    paginate_by = 20
+
+    def get_queryset(self):
+        return LoanEvent.objects.for_user(self.request.user).loans().select_related('book')
+
+
 class AllLoanedBooksByUserListView(LoginRequiredMixin, UserPassesTestMixin, generic.ListView):
     """תצוגה כללית של כל הספרים המושאלים (לספרניות בלבד)."""
     model = BookInstance
@@ -156,6 +330,74 @@ def renew_book_librarian(request, pk):
 
     return render(request, 'catalog/book_renew_librarian.html', context)
 
+@login_required
+def bookinstance_bulk_update(request):
+    """עדכון סטטוס, תאריך החזרה ושואל לעותקים רבים בבקשה אחת (לספרניות בלבד)."""
+    from django.http import HttpResponseForbidden
+    if not request.user.groups.filter(name='Librarians').exists():
+        return HttpResponseForbidden("Access denied: Only librarians can update copies.")
+
+    result = None
+    if request.method == 'POST':
+        form = BookInstanceBulkForm(request.POST)
+        if form.is_valid():
+            copy_ids = form.cleaned_data['copy_ids']
+            found = set(BookInstance.objects.filter(pk__in=copy_ids).values_list('pk', flat=True))
+            updated = bulk_update_copies(copy_ids, **form.changes())
+            result = {
+                'updated': updated,
+                'unknown': [copy_id for copy_id in copy_ids if copy_id not in found],
+            }
+            form = BookInstanceBulkForm()
+    else:
+        form = BookInstanceBulkForm()
+
+    return render(request, 'catalog/bookinstance_bulk_form.html', {'form': form, 'result': result})
+
+class _Echo:
+    """קובץ מדומה: csv.writer כותב אליו ומקבל בחזרה את השורה, כדי להזרים אותה."""
+
+    def write(self, value):
+        return value
+
+
+@login_required
+def report_list(request):
+    """רשימת הדוחות לספרניות."""
+    from django.http import HttpResponseForbidden
+    if not request.user.groups.filter(name='Librarians').exists():
+        return HttpResponseForbidden("Access denied: Only librarians can view reports.")
+    return render(request, 'catalog/report_list.html', {'reports': reports.REPORTS.values()})
+
+
+@login_required
+def report_detail(request, slug):
+    """דוח בודד כטבלת HTML, או כ-CSV מוזרם עם ?format=csv."""
+    from django.http import Http404, HttpResponseForbidden, StreamingHttpResponse
+    if not request.user.groups.filter(name='Librarians').exists():
+        return HttpResponseForbidden("Access denied: Only librarians can view reports.")
+    report = reports.REPORTS.get(slug)
+    if report is None:
+        raise Http404('No such report.')
+    rows = reports.report_rows(report)
+
+    if request.GET.get('format') == 'csv':
+        writer = csv.writer(_Echo())
+        response = StreamingHttpResponse(
+            (writer.writerow(row) for row in [report.columns, *rows]),
+            content_type='text/csv; charset=utf-8',
+        )
+        response['Content-Disposition'] = f'attachment; filename="{slug}.csv"'
+        return response
+
+    return render(request, 'catalog/report_detail.html', {'report': report, 'rows': rows})
+
+@login_required
+def copy_lookup(request, book_pk, copy_no):
+    """חיפוש עותק לפי ספר ומספר עותק (למשל "עותק 17 של דיונה") ומעבר לעמוד החידוש שלו."""
+    book_instance = get_object_or_404(BookInstance.objects.only('pk'), book_id=book_pk, copy_no=copy_no)
+    return HttpResponseRedirect(reverse('renew-book-librarian', args=[book_instance.pk]))
+
 class AuthorCreate(UserPassesTestMixin, PermissionRequiredMixin, CreateView):
     model = Author
     fields = ['first_name', 'last_name', 'date_of_birth', 'date_of_death']
@@ -183,24 +425,22 @@ class AuthorDelete(UserPassesTestMixin, PermissionRequiredMixin, DeleteView):
         return self.request.user.groups.filter(name='Librarians').exists()
     
     def form_valid(self, form):
-        try:
-            self.object.delete()
-            return HttpResponseRedirect(self.success_url)
-        except Exception as e:
+        if bulk_delete_authors([self.object.pk])[self.object.pk] == BLOCKED:
             return HttpResponseRedirect(
                 reverse("author-delete", kwargs={"pk": self.object.pk})
             )
+        return HttpResponseRedirect(self.success_url)
 
 
 class BookCreate(PermissionRequiredMixin, CreateView):
     model = Book
-    fields = '__all__'
+    form_class = BookForm
     permission_required = 'catalog.add_book'
 
 
 class BookUpdate(PermissionRequiredMixin, UpdateView):
     model = Book
-    fields = '__all__'
+    form_class = BookForm
     permission_required = 'catalog.change_book'
 
 
@@ -212,9 +452,9 @@ class BookDelete(PermissionRequiredMixin, DeleteView):
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
         book = context.get('object') or getattr(self, 'object', None) or self.get_object()
-        bookinstances = book.bookinstance_set.all()
+        bookinstances = list(book.bookinstance_set.all())
         context['bookinstance_list'] = bookinstances
-        context['has_bookinstances'] = bookinstances.exists()
+        context['has_bookinstances'] = bool(bookinstances)
         context['book'] = book
         return context
 
@@ -223,10 +463,8 @@ class BookDelete(PermissionRequiredMixin, DeleteView):
         return self.form_valid(form=None)
 
     def form_valid(self, form):
-        if self.object.bookinstance_set.exists():
+        if bulk_delete_books([self.object.pk])[self.object.pk] == BLOCKED:
             context = self.get_context_data(object=self.object)
             context['cannot_delete'] = True
             return self.render_to_response(context)
-        success_url = self.get_success_url()
-        self.object.delete()
-        return HttpResponseRedirect(success_url)
+        return HttpResponseRedirect(self.get_success_url())
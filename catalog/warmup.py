@@ -0,0 +1,118 @@
+"""Work done once in the gunicorn master before it forks its workers.
+
+With ``preload_app`` the master imports the project, and whatever it builds
+before forking (imported modules, the URL resolver, compiled templates,
+the typeahead index) is shared copy-on-write by every worker instead of
+being rebuilt in each one.
+See gunicorn.conf.py.
+"""
+import logging
+import time
+from pathlib import Path
+
+from django.conf import settings
+from django.db import connections
+from django.template import TemplateDoesNotExist, TemplateSyntaxError, engines
+from django.urls import get_resolver, resolve, reverse
+
+from . import typeahead
+
+logger = logging.getLogger(__name__)
+
+
+def memory_kb():
+    """Resident and private (unshared) memory of this process in KiB, where /proc provides them."""
+    usage = {}
+    for path, fields in (
+        ('/proc/self/status', {'VmRSS:': 'rss'}),
+        ('/proc/self/smaps_rollup', {'Private_Clean:': 'private', 'Private_Dirty:': 'private'}),
+    ):
+        try:
+            with open(path) as lines:
+                for line in lines:
+                    parts = line.split()
+                    if parts and parts[0] in fields:
+                        key = fields[parts[0]]
+                        usage[key] = usage.get(key, 0) + int(parts[1])
+        except OSError:
+            pass
+    return usage
+
+
+def warm_urls(admin=True):
+    """Import every urlconf and view module and build the reverse lookup tables."""
+    get_resolver()._populate()
+    reverse('index')
+    if admin:
+        resolve('/admin/')
+        reverse('admin:index')
+
+
+def warm_templates():
+    """Compile the project's own templates into the cached template loader.
+
+    Only the project templates directory and this app's templates are
+    primed; the admin's templates are compiled on first use as usual.
+    """
+    count = 0
+    roots = [Path(directory) for directory in settings.TEMPLATES[0]['DIRS']]
+    roots.append(Path(__file__).resolve().parent / 'templates')
+    for engine in engines.all():
+        for root in roots:
+            for path in sorted(root.rglob('*.html')):
+                name = path.relative_to(root).as_posix()
+                if name.startswith('admin/'):
+                    continue
+                try:
+                    engine.get_template(name)
+                except (TemplateDoesNotExist, TemplateSyntaxError) as exc:
+                    logger.warning('Template %s not warmed: %s', name, exc)
+                else:
+                    count += 1
+    return count
+
+
+def warm_database():
+    """Connect once to every database, then close the connections and pools.
+
+    This imports the database drivers and checks the credentials before
+    any worker starts.  The connections themselves must not be shared
+    with forked workers, so they are closed here; each worker opens its
+    own with :func:`open_connections`.  With a connection pool, close()
+    only hands the connection back to a class-level pool that keeps its
+    sockets and threads, so the pool itself is closed as well.
+    """
+    for alias in connections:
+        connections[alias].ensure_connection()
+    connections.close_all()
+    for alias in connections:
+        connection = connections[alias]
+        if connection.settings_dict['OPTIONS'].get('pool'):
+            connection.close_pool()
+
+
+def open_connections():
+    """Open this worker's connections (or build its pool) before the first request.
+
+    Connections that Django closes at the start of every request
+    (``CONN_MAX_AGE = 0`` without a pool) are not worth opening early.
+    """
+    for alias in connections:
+        connection = connections[alias]
+        if connection.settings_dict['CONN_MAX_AGE'] or 'pool' in connection.settings_dict['OPTIONS']:
+            connection.ensure_connection()
+
+
+def warm_up(admin=True):
+    """Run the warm-up steps, returning each step's duration in seconds."""
+    timings = {}
+    for name, step in (
+        ('urls', lambda: warm_urls(admin=admin)),
+        ('templates', warm_templates),
+        ('typeahead', typeahead.rebuild),
+        ('database', warm_database),
+    ):
+        started = time.perf_counter()
+        step()
+        timings[name] = time.perf_counter() - started
+    return timings
@@ -0,0 +1,57 @@
+"""Select widgets backed by the autocomplete endpoints in autocomplete.py.
+
+A plain ``<select>`` for a ForeignKey renders one ``<option>`` per row of
+the related table.  These widgets render only the selected options and
+let select2 (the copy bundled with django.contrib.admin) fetch the rest
+page by page as the user types.
+"""
+from django import forms
+from django.urls import reverse
+
+
+class AutocompleteMixin:
+    def __init__(self, url_name, attrs=None):
+        self.url_name = url_name
+        super().__init__(attrs)
+
+    def build_attrs(self, base_attrs, extra_attrs=None):
+        attrs = super().build_attrs(base_attrs, extra_attrs)
+        attrs['data-autocomplete-url'] = reverse(self.url_name)
+        attrs['class'] = ' '.join(filter(None, [attrs.get('class'), 'catalog-autocomplete']))
+        return attrs
+
+    def optgroups(self, name, value, attrs=None):
+        """Only the selected choices, loaded with one `pk IN (...)` query."""
+        selected = {str(item) for item in value if item not in ('', None)}
+        groups = []
+        if not self.is_required and not self.allow_multiple_selected:
+            groups.append((None, [self.create_option(name, '', '', False, 0)], 0))
+        if not selected:
+            return groups
+        field = self.choices.field
+        lookup = f"{field.to_field_name or 'pk'}__in"
+        for index, obj in enumerate(self.choices.queryset.filter(**{lookup: selected}), start=len(groups)):
+            option_value = field.prepare_value(obj)
+            groups.append((None, [
+                self.create_option(name, option_value, field.label_from_instance(obj), True, index, attrs=attrs)
+            ], index))
+        return groups
+
+    @property
+    def media(self):
+        return forms.Media(
+            js=(
+                'admin/js/vendor/jquery/jquery.min.js',
+                'admin/js/vendor/select2/select2.full.min.js',
+                'js/autocomplete.js',
+            ),
+            css={'screen': ('admin/css/vendor/select2/select2.min.css',)},
+        )
+
+
+class AutocompleteSelect(AutocompleteMixin, forms.Select):
+    pass
+
+
+class AutocompleteSelectMultiple(AutocompleteMixin, forms.SelectMultiple):
+    pass
@@ -0,0 +1,18 @@
+"""Admin URLs, imported on the first request under /admin/.
+
+The project uses SimpleAdminConfig, so nothing imports the apps' admin
+modules at startup; autodiscover() runs here instead, the first time the
+admin is resolved or reversed.
+"""
+from django.contrib import admin
+from django.urls import path
+
+from catalog.admin import profile_download, profile_list
+
+admin.autodiscover()
+
+urlpatterns = [
+    path('profiles/', admin.site.admin_view(profile_list), name='profiles'),
+    path('profiles/<str:name>', admin.site.admin_view(profile_download), name='profile-download'),
+    *admin.site.get_urls(),
+]
@@ -1,4 +1,5 @@
 import os
+import sys
 from pathlib import Path
 from dotenv import load_dotenv
 import dj_database_url
@@ -53,7 +54,9 @@ CSRF_TRUSTED_ORIGINS = [
 # Application definition
 
 INSTALLED_APPS = [
-    "django.contrib.admin",
+    # בלי autodiscover בעליית התהליך: catalog.admin (ואיתו import_export) נטען
+    # רק כשנפתח לראשונה נתיב תחת /admin/ - ראו locallibary/admin_urls.py
+    "django.contrib.admin.apps.SimpleAdminConfig",
     "django.contrib.auth",
     "django.contrib.contenttypes",
     "django.contrib.sessions",
@@ -61,15 +64,21 @@ INSTALLED_APPS = [
     "django.contrib.staticfiles",
     'catalog.apps.CatalogConfig',
     'import_export',
+    'sequences.apps.SequencesConfig',
 ]
 
 MIDDLEWARE = [
+    # ראשון, כדי למדוד את כל הבקשה; ראו catalog/metrics.py
+    'catalog.metrics.MetricsMiddleware',
+    'catalog.slowlog.SlowQueryMiddleware',
     "django.middleware.security.SecurityMiddleware",
     'whitenoise.middleware.WhiteNoiseMiddleware',
     "django.contrib.sessions.middleware.SessionMiddleware",
     "django.middleware.common.CommonMiddleware",
     "django.middleware.csrf.CsrfViewMiddleware",
     "django.contrib.auth.middleware.AuthenticationMiddleware",
+    # אחרי האימות, כדי שרק צוות יוכל לבקש פרופיל בכותרת
+    'catalog.profiling.ProfilingMiddleware',
     "django.contrib.messages.middleware.MessageMiddleware",
     "django.middleware.clickjacking.XFrameOptionsMiddleware",
 ]
@@ -149,15 +158,38 @@ STATIC_ROOT = BASE_DIR / 'static/'
 
 DEFAULT_AUTO_FIELD = "django.db.models.BigAutoField"
 LOGIN_REDIRECT_URL = '/'
+
+# אחסון הסשן: cached_db (ברירת מחדל - קריאה מהמטמון, כתיבה גם למסד), db, cache
+# (מהיר, אבל סשן אובד כשהמטמון מתמלא) או signed_cookies (בלי שאילתות בכלל; הנתונים חתומים אך גלויים)
+SESSION_BACKEND = os.environ.get('SESSION_BACKEND', 'cached_db')
+SESSION_ENGINE = {
+    'db': 'django.contrib.sessions.backends.db',
+    'cached_db': 'django.contrib.sessions.backends.cached_db',
+    'cache': 'django.contrib.sessions.backends.cache',
+    'signed_cookies': 'django.contrib.sessions.backends.signed_cookies',
+}[SESSION_BACKEND]
+
+# המשתמש המחובר (עם הקבוצות וההרשאות) נשמר במטמון; ראו catalog/backends.py
+AUTHENTICATION_BACKENDS = ['catalog.backends.CachedModelBackend']
+AUTH_USER_CACHE_TIMEOUT = int(os.environ.get('AUTH_USER_CACHE_TIMEOUT', 60))   # שניות
 EMAIL_BACKEND = 'django.core.mail.backends.console.EmailBackend'
 
 
+# DATABASE_POOL_MAX_SIZE: מאגר חיבורים של psycopg 3 בכל worker (PostgreSQL בלבד)
+# במקום חיבור קבוע אחד; מתאים ל-worker עם כמה threads (ראו gunicorn.conf.py)
+DATABASE_POOL_MAX_SIZE = int(os.environ.get('DATABASE_POOL_MAX_SIZE', 0))
+
 if 'DATABASE_URL' in os.environ:
     DATABASES['default'] = dj_database_url.config(
         default=os.environ.get('DATABASE_URL'),
-        conn_max_age=500,
+        conn_max_age=0 if DATABASE_POOL_MAX_SIZE else 500,
         conn_health_checks=True,
     )
+    if DATABASE_POOL_MAX_SIZE:
+        DATABASES['default'].setdefault('OPTIONS', {})['pool'] = {
+            'min_size': int(os.environ.get('DATABASE_POOL_MIN_SIZE', 1)),
+            'max_size': DATABASE_POOL_MAX_SIZE,
+        }
 
 # Static files (CSS, JavaScript, Images)
 # https://docs.djangoproject.com/en/5.0/howto/static-files/
@@ -180,3 +212,78 @@ STORAGES = {
 }
 
 
+
+# חיפוש בדף הבית: דלי אסימונים לכל IP ולכל משתמש, ומטמון תוצאות בתוך התהליך
+SEARCH_THROTTLE_RATE = float(os.environ.get('SEARCH_THROTTLE_RATE', 1))   # אסימונים לשנייה
+SEARCH_THROTTLE_BURST = int(os.environ.get('SEARCH_THROTTLE_BURST', 10))
+SEARCH_CACHE_MAX_ENTRIES = int(os.environ.get('SEARCH_CACHE_MAX_ENTRIES', 1000))
+SEARCH_CACHE_TTL = int(os.environ.get('SEARCH_CACHE_TTL', 300))   # שניות
+SEARCH_RESULT_LIMIT = 50
+# מספר הפרוקסים לפני השרת שמוסיפים את כתובת הלקוח ל-X-Forwarded-For (ב-Railway: אחד).
+# 0 = להשתמש ב-REMOTE_ADDR. הכתובת נלקחת מימין, כך שלקוח לא יכול לזייף אותה.
+TRUSTED_PROXY_COUNT = int(os.environ.get('TRUSTED_PROXY_COUNT', 1 if 'RAILWAY_ENVIRONMENT' in os.environ else 0))
+
+# מטמון משותף לכל תהליכי ה-worker.
+# CACHE_BACKEND: redis (ברירת המחדל כשמוגדר CACHE_URL), db (ברירת המחדל אחרת; טבלת
+# המטמון נוצרת ב-migrate), file או locmem (ברירת המחדל בהרצת בדיקות).
+# file ו-locmem מתאימים לתהליך יחיד בלבד: incr ו-add שלהם אינם אטומיים בין תהליכים,
+# ולכן נעילת ה-stampede ב-catalog/cache.py לא עובדת בין workers.
+TESTING = len(sys.argv) > 1 and sys.argv[1] == 'test'
+CACHE_BACKEND = os.environ.get(
+    'CACHE_BACKEND', 'locmem' if TESTING else 'redis' if os.environ.get('CACHE_URL') else 'db',
+)
+CACHE_OPTIONS = {
+    # מספר הרשומות המרבי; כשעוברים אותו נמחק 1/CULL_FREQUENCY מהרשומות
+    'MAX_ENTRIES': int(os.environ.get('CACHE_MAX_ENTRIES', 10000)),
+    'CULL_FREQUENCY': int(os.environ.get('CACHE_CULL_FREQUENCY', 4)),
+}
+CACHE_BACKENDS = {
+    'file': {
+        'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+        'LOCATION': os.environ.get('CACHE_LOCATION', str(BASE_DIR / 'var' / 'cache')),
+        'OPTIONS': CACHE_OPTIONS,
+    },
+    'db': {
+        'BACKEND': 'django.core.cache.backends.db.DatabaseCache',
+        'LOCATION': os.environ.get('CACHE_LOCATION', 'catalog_cache'),
+        'OPTIONS': CACHE_OPTIONS,
+    },
+    'redis': {
+        'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+        'LOCATION': os.environ.get('CACHE_URL', 'redis://127.0.0.1:6379/1'),
+    },
+    'locmem': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'OPTIONS': CACHE_OPTIONS,
+    },
+}
+CACHES = {
+    'default': {
+        **CACHE_BACKENDS[CACHE_BACKEND],
+        'KEY_PREFIX': os.environ.get('CACHE_KEY_PREFIX', 'locallibrary'),
+        'TIMEOUT': 300,
+    },
+}
+
+# /metrics בפורמט Prometheus: פתוח לכתובות האלה (שרת הניטור) ולצוות.
+# הכתובת נקבעת לפי TRUSTED_PROXY_COUNT; בקשה עם X-Forwarded-For מפרוקסי לא מוגדר נחסמת.
+# תחת gunicorn הערכים מכל ה-workers נאספים דרך PROMETHEUS_MULTIPROC_DIR (ראו gunicorn.conf.py)
+METRICS_ALLOWED_IPS = [ip.strip() for ip in os.environ.get('METRICS_ALLOWED_IPS', '127.0.0.1,::1').split(',') if ip.strip()]
+
+# יומן שאילתות איטיות (JSONL, מסתובב לפי גודל) - ראו catalog/slowlog.py ו-manage.py slow_queries_report.
+# SLOW_QUERY_THRESHOLD_MS ריק מכבה את הרישום; SLOW_QUERY_EXPLAIN=1 שומר גם את תוכנית הביצוע
+SLOW_QUERY_THRESHOLD_MS = os.environ.get('SLOW_QUERY_THRESHOLD_MS', '200')
+SLOW_QUERY_THRESHOLD_MS = float(SLOW_QUERY_THRESHOLD_MS) if SLOW_QUERY_THRESHOLD_MS else None
+SLOW_QUERY_EXPLAIN = os.environ.get('SLOW_QUERY_EXPLAIN', '0') == '1'
+SLOW_QUERY_LOG = os.environ.get('SLOW_QUERY_LOG', str(BASE_DIR / 'var' / 'log' / 'slow_queries.jsonl'))
+SLOW_QUERY_LOG_MAX_BYTES = int(os.environ.get('SLOW_QUERY_LOG_MAX_BYTES', 10 * 1024 * 1024))
+SLOW_QUERY_LOG_BACKUPS = int(os.environ.get('SLOW_QUERY_LOG_BACKUPS', 5))
+
+# פרופיילינג של בקשות בסביבת הייצור (catalog/profiling.py): שיעור דגימה אקראי (0 = כבוי),
+# או כותרת X-Profile מצוות. הקבצים נשמרים ב-PROFILE_DIR ומוצגים ב-/admin/profiles/
+PROFILE_SAMPLE_RATE = float(os.environ.get('PROFILE_SAMPLE_RATE', 0))
+PROFILE_HEADER = os.environ.get('PROFILE_HEADER', 'X-Profile')
+PROFILE_FORMAT = os.environ.get('PROFILE_FORMAT', 'collapsed')   # collapsed או pstats
+PROFILE_INTERVAL_MS = float(os.environ.get('PROFILE_INTERVAL_MS', 5))
+PROFILE_DIR = os.environ.get('PROFILE_DIR', str(BASE_DIR / 'var' / 'profiles'))
+PROFILE_MAX_FILES = int(os.environ.get('PROFILE_MAX_FILES', 500))
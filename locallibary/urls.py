@@ -14,18 +14,49 @@ Including another URLconf
     1. Import the include() function: from django.urls import include, path
     2. Add a URL to urlpatterns:  path('blog/', include('blog.urls'))
 """
-from django.contrib import admin
 from django.urls import path, include
+from django.urls.resolvers import RoutePattern, URLResolver
 from django.views.generic import RedirectView
 from django.conf.urls.static import static
 
+from catalog.metrics import metrics_view
+
+
+class LazyURLResolver(URLResolver):
+    """Resolver that imports its urlconf on first use.
+
+    A plain include() imports the module when this file is loaded, and the
+    root resolver populates every nested resolver on the first reverse().
+    This one stays empty until a URL under it is resolved or one of its
+    names is reversed, so the admin is not loaded by public pages.
+    """
+
+    def _populate(self):
+        if 'urlconf_module' in self.__dict__:
+            super()._populate()
+
+    @property
+    def reverse_dict(self):
+        self.urlconf_module
+        return super().reverse_dict
+
+    @property
+    def namespace_dict(self):
+        self.urlconf_module
+        return super().namespace_dict
+
+    @property
+    def app_dict(self):
+        self.urlconf_module
+        return super().app_dict
 
 
 urlpatterns = [
-    path("admin/", admin.site.urls),
+    LazyURLResolver(RoutePattern('admin/'), 'locallibary.admin_urls', app_name='admin', namespace='admin'),
     path('catalog/', include('catalog.urls')),
     path('', RedirectView.as_view(url='catalog/', permanent=True)),
     path('accounts/', include('django.contrib.auth.urls')),
+    path('metrics', metrics_view, name='metrics'),
 
 ]
 
@@ -0,0 +1,21 @@
+/* Turn every select rendered by catalog.widgets into a select2 box that
+   loads its options page by page from data-autocomplete-url. */
+document.addEventListener('DOMContentLoaded', function () {
+  var $ = window.jQuery;
+  $('select.catalog-autocomplete').each(function () {
+    var $select = $(this);
+    $select.select2({
+      width: '100%',
+      allowClear: !this.required,
+      placeholder: '',
+      ajax: {
+        url: $select.data('autocomplete-url'),
+        dataType: 'json',
+        delay: 250,
+        data: function (params) {
+          return {q: params.term || '', page: params.page || 1};
+        }
+      }
+    });
+  });
+});
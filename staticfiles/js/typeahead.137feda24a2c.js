@@ -0,0 +1,72 @@
+/* Suggestions under every input with data-typeahead-url, fetched as the
+   user types (debounced); arrow keys move through them, Enter opens one. */
+document.addEventListener('DOMContentLoaded', function () {
+  document.querySelectorAll('input[data-typeahead-url]').forEach(function (input) {
+    var menu = document.createElement('div');
+    menu.className = 'dropdown-menu w-100';
+    input.parentNode.classList.add('position-relative');
+    input.parentNode.appendChild(menu);
+    var timer = null;
+    var active = -1;
+    var request = 0;
+
+    function close() {
+      menu.classList.remove('show');
+      active = -1;
+    }
+
+    function render(results) {
+      menu.innerHTML = '';
+      results.forEach(function (result) {
+        var link = document.createElement('a');
+        link.className = 'dropdown-item';
+        link.href = result.url;
+        var icon = document.createElement('i');
+        icon.className = 'bi me-2 ' + (result.type === 'author' ? 'bi-person' : 'bi-book');
+        link.appendChild(icon);
+        link.appendChild(document.createTextNode(result.label));
+        menu.appendChild(link);
+      });
+      active = -1;
+      menu.classList.toggle('show', results.length > 0);
+    }
+
+    function fetchSuggestions() {
+      var term = input.value.trim();
+      if (!term) {
+        close();
+        return;
+      }
+      var current = ++request;
+      fetch(input.dataset.typeaheadUrl + '?q=' + encodeURIComponent(term))
+        .then(function (response) { return response.json(); })
+        .then(function (data) {
+          if (current === request) {
+            render(data.results);
+          }
+        });
+    }
+
+    input.addEventListener('input', function () {
+      clearTimeout(timer);
+      timer = setTimeout(fetchSuggestions, 120);
+    });
+    input.addEventListener('keydown', function (event) {
+      var items = menu.querySelectorAll('.dropdown-item');
+      if (!menu.classList.contains('show') || !items.length) {
+        return;
+      }
+      if (event.key === 'ArrowDown' || event.key === 'ArrowUp') {
+        event.preventDefault();
+        active = (active + (event.key === 'ArrowDown' ? 1 : items.length - 1)) % items.length;
+        items.forEach(function (item, index) { item.classList.toggle('active', index === active); });
+      } else if (event.key === 'Enter' && active >= 0) {
+        event.preventDefault();
+        window.location = items[active].href;
+      } else if (event.key === 'Escape') {
+        close();
+      }
+    });
+    input.addEventListener('blur', function () { setTimeout(close, 150); });
+  });
+});